@@ -46,6 +46,7 @@
 
 #include <memory>
 #include <string>
+#include <vector>
 
 #include "lsst/base.h"
 #include "lsst/daf/base/Citizen.h"
@@ -67,6 +68,9 @@ public:
 
     static void setLocationMap(PTR(dafBase::PropertySet) map);
 
+    static std::vector<std::string> expandBatch(
+        std::string const& locString, std::vector<CONST_PTR(dafBase::PropertySet)> const& additionalData);
+
 private:
     std::string _locString; ///< The location string.
     static PTR(dafBase::PropertySet) _map; ///< The logical-to-less-logical map.
@@ -42,6 +42,10 @@ from .registries import *
 from .dataId import *
 from .butlerLocation import *
 from .readProxy import *
+from .objectCache import *
+from .sharedCache import *
+from .initProfile import *
+from .pathTemplate import *
 from .butlerSubset import *
 from .access import *
 from .repositoryCfg import *
@@ -55,3 +59,10 @@ from .butlerFactory import *
 from .butlerHelpers import *
 from .version import *
 
+
+def __getattr__(name):
+    # registries.havePgsql imports psycopg2 to tell if it can be imported, so it is only looked up when used.
+    if name == "havePgsql":
+        from . import registries
+        return registries.havePgsql
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -29,8 +29,17 @@ from builtins import str, super
 from past.builtins import basestring
 from builtins import object
 
+import collections
+import concurrent.futures
 import copy
+import fnmatch
+import functools
 import inspect
+import os
+import sys
+import threading
+import uuid
+import weakref
 
 import yaml
 
@@ -38,7 +47,8 @@ from lsst.log import Log
 from . import ReadProxy, ButlerSubset, ButlerDataRef, \
     Storage, Policy, NoResults, Repository, DataId, RepositoryCfg, \
     RepositoryArgs, listify, setify, sequencify, doImport, ButlerComposite, genericAssembler, \
-    genericDisassembler, PosixStorage, ParentsMismatch
+    genericDisassembler, PosixStorage, ParentsMismatch, ObjectCache, \
+    ButlerLocation, safeFileIo, InitProfile, resetAfterFork, callAfterFork
 
 preinitedMapperWarning = ("Passing an instantiated mapper into " +
                           "Butler.__init__ will prevent Butler from passing " +
@@ -504,36 +514,105 @@ class Butler(object):
     """This is a Generation 2 Butler.
     """
 
+    profileInit = os.environ.get("DAF_PERSISTENCE_PROFILE_INIT", "") not in ("", "0")
+    """If True, record the time taken by each phase of constructing each Butler; see `getInitProfile`.
+    Defaults to True if the environment variable DAF_PERSISTENCE_PROFILE_INIT is set (and not '0').
+    """
+
+    cfgPrefetchWorkers = 8
+    """The number of threads used to read the RepositoryCfgs of the repositories and their parents before the
+    repository DAG is assembled. If 1, cfgs are read one at a time as the DAG is assembled.
+    """
+
     def __init__(self, root=None, mapper=None, inputs=None, outputs=None, **mapperArgs):
         self._initArgs = {'root': root, 'mapper': mapper, 'inputs': inputs, 'outputs': outputs,
                           'mapperArgs': mapperArgs}
 
-        self.log = Log.getLogger("daf.persistence.butler")
+        self._initAttributes()
+        timer = self._initProfile.timer
 
-        inputs, outputs = self._processInputArguments(
-            root=root, mapper=mapper, inputs=inputs, outputs=outputs, **mapperArgs)
+        with timer('total'):
+            with timer('processInputArguments'):
+                inputs, outputs = self._processInputArguments(
+                    root=root, mapper=mapper, inputs=inputs, outputs=outputs, **mapperArgs)
 
-        # convert the RepoArgs into RepoData
-        inputs = [RepoData(args, 'input') for args in inputs]
-        outputs = [RepoData(args, 'output') for args in outputs]
-        repoDataList = outputs + inputs
+            # convert the RepoArgs into RepoData
+            inputs = [RepoData(args, 'input') for args in inputs]
+            outputs = [RepoData(args, 'output') for args in outputs]
+            repoDataList = outputs + inputs
 
-        self._getCfgs(repoDataList)
+            with timer('prefetchCfgs'):
+                self._prefetchCfgs(repoDataList)
 
-        self._addParents(repoDataList)
+            with timer('getCfgs'):
+                self._getCfgs(repoDataList)
 
-        self._setAndVerifyParentsLists(repoDataList)
+            with timer('addParents'):
+                self._addParents(repoDataList)
+            self._oldButlerProbes.clear()
 
-        self._setDefaultMapper(repoDataList)
+            with timer('setAndVerifyParentsLists'):
+                self._setAndVerifyParentsLists(repoDataList)
 
-        self._connectParentRepoDatas(repoDataList)
+            with timer('setDefaultMapper'):
+                self._setDefaultMapper(repoDataList)
 
-        self._repos = RepoDataContainer(repoDataList)
+            with timer('connectParentRepoDatas'):
+                self._connectParentRepoDatas(repoDataList)
 
-        self._setRepoDataTags()
+            self._repos = RepoDataContainer(repoDataList)
 
-        for repoData in repoDataList:
-            self._initRepo(repoData)
+            self._setRepoDataTags()
+
+            with timer('initRepos'):
+                for repoData in repoDataList:
+                    self._initRepo(repoData)
+
+        if self._initProfile.enabled:
+            self.log.debug("Butler init profile:\n%s", self._initProfile)
+
+    def _initAttributes(self):
+        """Initialize the attributes that do not depend on the repositories, for __init__ and unpickling."""
+        self.log = Log.getLogger("daf.persistence.butler")
+
+        self._pickleToken = None
+        self._oldButlerProbes = {}
+        self._lazyComponents = False
+        self._componentWorkers = 1
+        self._componentCache = None
+        self._objectCache = None
+        self._objectCacheAllow = None
+        self._objectCacheDeny = ()
+        self._objectCacheStats = {}
+        self._objectCacheLock = threading.Lock()
+        self._writePool = None
+        self._writeBehindArgs = None
+        self._writeSlots = None
+        self._pendingWrites = set()
+        self._lastWrites = {}
+        self._writeErrors = []
+        self._writeLock = threading.Lock()
+        self._initProfile = InitProfile(enabled=self.profileInit)
+
+    def getInitProfile(self):
+        """Get the time taken by each phase of constructing this Butler and its repositories.
+
+        Profiling is enabled by `Butler.profileInit` (or the DAF_PERSISTENCE_PROFILE_INIT environment
+        variable) when the Butler is constructed. The Butler phases are 'processInputArguments',
+        'prefetchCfgs', 'getCfgs', 'addParents', 'setAndVerifyParentsLists', 'setDefaultMapper',
+        'connectParentRepoDatas' and 'initRepos', all contained in 'total'. Phases for one repository are
+        'cfgPrefetch' (contained in 'prefetchCfgs'; it reads the cfgs or probes for V1 repositories,
+        concurrently, unless `Butler.cfgPrefetchWorkers` is 1), 'cfgRead' and 'v1Probe' (contained in the
+        Butler phases that find cfgs; they use the prefetched cfgs and probes), and 'storage', 'cfgWrite',
+        'mapperImport' and 'mapperInit' (contained in 'initRepos').
+
+        Returns
+        -------
+        InitProfile or None
+            The profile, or None if profiling was not enabled; use its `report` method to get the
+            wall time and number of calls of each phase.
+        """
+        return self._initProfile if self._initProfile.enabled else None
 
     def _initRepo(self, repoData):
         if repoData.repo is not None:
@@ -549,7 +628,7 @@ class Butler(object):
             repoData.parentRegistry = parentRegistry if parentRegistry else parentRepoData.parentRegistry
             if repoData.parentRegistry:
                 break
-        repoData.repo = Repository(repoData)
+        repoData.repo = Repository(repoData, profile=self._initProfile)
 
     def _processInputArguments(self, root=None, mapper=None, inputs=None, outputs=None, **mapperArgs):
         """Process, verify, and standardize the input arguments.
@@ -679,17 +758,42 @@ class Butler(object):
         return parents
 
     @staticmethod
-    def _getOldButlerRepositoryCfg(repositoryArgs):
-        if not Storage.isPosix(repositoryArgs.cfgRoot):
-            return None
-        if not PosixStorage.v1RepoExists(repositoryArgs.cfgRoot):
+    def _probeOldButlerRepository(root):
+        """Look for an Old Butler (V1) repository at root.
+
+        Parameters
+        ----------
+        root : string
+            The location to look at.
+
+        Returns
+        -------
+        _OldButlerProbe
+            Whether a V1 repository exists at root and, if it does, its mapper class and the location of its
+            _parent link (None if there is no link).
+        """
+        if not Storage.isPosix(root) or not PosixStorage.v1RepoExists(root):
+            return _OldButlerProbe(exists=False, mapper=None, parent=None)
+        return _OldButlerProbe(exists=True, mapper=PosixStorage.getMapperClass(root),
+                               parent=PosixStorage.getParentSymlinkPath(root))
+
+    @staticmethod
+    def _getOldButlerRepositoryCfg(repositoryArgs, probes=None):
+        root = repositoryArgs.cfgRoot
+        probe = probes.get(root) if probes else None
+        if probe is None:
+            if not Storage.isPosix(root):
+                return None
+            if not PosixStorage.v1RepoExists(root):
+                return None
+        elif not probe.exists:
             return None
         if not repositoryArgs.mapper:
-            repositoryArgs.mapper = PosixStorage.getMapperClass(repositoryArgs.cfgRoot)
+            repositoryArgs.mapper = PosixStorage.getMapperClass(root) if probe is None else probe.mapper
         cfg = RepositoryCfg.makeFromArgs(repositoryArgs)
-        parent = PosixStorage.getParentSymlinkPath(repositoryArgs.cfgRoot)
+        parent = PosixStorage.getParentSymlinkPath(root) if probe is None else probe.parent
         if parent:
-            parent = Butler._getOldButlerRepositoryCfg(RepositoryArgs(cfgRoot=parent, mode='r'))
+            parent = Butler._getOldButlerRepositoryCfg(RepositoryArgs(cfgRoot=parent, mode='r'), probes)
             if parent is not None:
                 cfg.addParents([parent])
         return cfg
@@ -712,14 +816,59 @@ class Butler(object):
         if not isinstance(repositoryArgs, RepositoryArgs):
             repositoryArgs = RepositoryArgs(cfgRoot=repositoryArgs, mode='r')
 
-        cfg = self.storage.getRepositoryCfg(repositoryArgs.cfgRoot)
+        with self._initProfile.timer('cfgRead', repositoryArgs.cfgRoot):
+            cfg = self.storage.getRepositoryCfg(repositoryArgs.cfgRoot)
         isOldButlerRepository = False
         if cfg is None:
-            cfg = Butler._getOldButlerRepositoryCfg(repositoryArgs)
+            with self._initProfile.timer('v1Probe', repositoryArgs.cfgRoot):
+                cfg = Butler._getOldButlerRepositoryCfg(repositoryArgs, self._oldButlerProbes)
             if cfg is not None:
                 isOldButlerRepository = True
         return cfg, isOldButlerRepository
 
+    def _prefetchCfgs(self, repoDataList):
+        """Read the RepositoryCfgs of the repositories and all their parents into the cache of self.storage,
+        so that `_getCfgs` and `_addParents` find them there.
+
+        The parent DAG is read a level at a time, with the cfgs in each level read concurrently. Locations
+        without a cfg are probed for Old Butler (V1) repositories in the same way, following their _parent
+        links; the probes are kept in self._oldButlerProbes for `_getRepositoryCfg`. Errors are ignored here;
+        they are raised when the cfgs are gotten again while the DAG is assembled.
+
+        Parameters
+        ----------
+        repoDataList : list of RepoData
+            The RepoData that are output and inputs of this Butler
+        """
+        if self.cfgPrefetchWorkers <= 1:
+            return
+
+        def getParents(uri):
+            with self._initProfile.timer('cfgPrefetch', uri):
+                try:
+                    cfg = self.storage.getRepositoryCfg(uri)
+                    if cfg is not None:
+                        return [parent for parent in cfg.parents or []
+                                if not isinstance(parent, RepositoryCfg)]
+                    probe = Butler._probeOldButlerRepository(uri)
+                except Exception:
+                    return []
+                self._oldButlerProbes[uri] = probe
+                return [probe.parent] if probe.parent else []
+
+        seen = set()
+        level = [repoData.repoArgs.cfgRoot for repoData in repoDataList]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.cfgPrefetchWorkers) as pool:
+            while level:
+                level = [uri for uri in collections.OrderedDict.fromkeys(level)
+                         if isinstance(uri, basestring) and uri and uri not in seen]
+                seen.update(level)
+                if len(level) > 1:
+                    parents = pool.map(getParents, level)
+                else:
+                    parents = [getParents(uri) for uri in level]
+                level = [parent for uriParents in parents for parent in uriParents]
+
     def _getCfgs(self, repoDataList):
         """Get or make a RepositoryCfg for each RepoData, and add the cfg to the RepoData.
         If the cfg exists, compare values. If values match then use the cfg as an "existing" cfg. If the
@@ -1250,17 +1399,75 @@ class Butler(object):
             # If the location is a ButlerComposite (as opposed to a ButlerLocation),
             # verify the component objects exist.
             if isinstance(location, ButlerComposite):
-                for name, componentInfo in location.componentInfo.items():
-                    if componentInfo.subset:
-                        subset = self.subset(datasetType=componentInfo.datasetType, dataId=location.dataId)
-                        exists = all([obj.datasetExists() for obj in subset])
-                    else:
-                        exists = self.datasetExists(componentInfo.datasetType, location.dataId)
-                    if exists is False:
-                        return False
-            else:
-                if not location.repository.exists(location):
+                # Locating a component for read already checks that it exists in storage, except when
+                # the location has a bypass; those are checked together once every component is located.
+                componentLocations = self._locateComponents(location)
+                if componentLocations is None:
                     return False
+                unverified = [loc for loc in componentLocations if hasattr(loc, 'bypass')]
+                if not self._locationsExist(unverified):
+                    return False
+        locations = [location for location in locations if not isinstance(location, ButlerComposite)]
+        if not write:
+            # Locating for read already checked that the location exists, unless it has a bypass.
+            locations = [location for location in locations if hasattr(location, 'bypass')]
+        return self._locationsExist(locations)
+
+    def _locateComponents(self, location):
+        """Resolve the locations of all the components of a composite, including the elements of `subset`
+        components and the components of nested composites.
+
+        Parameters
+        ----------
+        location : ButlerComposite
+            The composite whose components are to be located.
+
+        Returns
+        -------
+        list of ButlerLocation or None
+            The component locations, or None as soon as any component can not be located.
+        """
+        requests = []
+        for name, componentInfo in location.componentInfo.items():
+            if componentInfo.subset:
+                subset = self.subset(datasetType=componentInfo.datasetType, dataId=location.dataId)
+                dataIds = [DataId(dataRef.dataId) for dataRef in subset]
+            else:
+                dataIds = [DataId(location.dataId)]
+            requests.extend((componentInfo.datasetType, dataId) for dataId in dataIds)
+        componentLocations = []
+        for componentLocation in self._locateMany(requests):
+            if componentLocation is None:
+                return None
+            if isinstance(componentLocation, ButlerComposite):
+                nestedLocations = self._locateComponents(componentLocation)
+                if nestedLocations is None:
+                    return None
+                componentLocations.extend(nestedLocations)
+            else:
+                componentLocations.append(componentLocation)
+        return componentLocations
+
+    @staticmethod
+    def _locationsExist(locations):
+        """Check that all of a list of locations exist, with one batched call per repository.
+
+        Parameters
+        ----------
+        locations : list of ButlerLocation
+            The locations to check.
+
+        Returns
+        -------
+        bool
+            True if every location exists, False as soon as one is found that does not.
+        """
+        byRepository = collections.OrderedDict()
+        for location in locations:
+            byRepository.setdefault(id(location.repository), (location.repository, []))[1].append(location)
+        for repository, repositoryLocations in byRepository.values():
+            if not repository.existsAll(repositoryLocations):
+                return False
         return True
 
     def _locate(self, datasetType, dataId, write):
@@ -1284,12 +1491,10 @@ class Butler(object):
         If write is False, will return either a single object or None. If write is True, will return a list
         (which may be empty)
         """
-        repos = self._repos.outputs() if write else self._repos.inputs()
+        if not write:
+            return self._locateMany([(datasetType, dataId)])[0]
         locations = []
-        for repoData in repos:
-            # enforce dataId & repository tags when reading:
-            if not write and dataId.tag and len(dataId.tag.intersection(repoData.tags)) == 0:
-                continue
+        for repoData in self._repos.outputs():
             components = datasetType.split('.')
             datasetType = components[0]
             components = components[1:]
@@ -1311,45 +1516,120 @@ class Butler(object):
                 # if a component location is not found, we can not continue with this repo, move to next repo.
                 if location is None:
                     break
-            # if reading, only one location is desired.
             if location:
-                if not write:
-                    # If there is a bypass function for this dataset type, we can't test to see if the object
-                    # exists in storage, because the bypass function may not actually use the location
-                    # according to the template. Instead, execute the bypass function and include its results
-                    # in the bypass attribute of the location. The bypass function may fail for any reason,
-                    # the most common case being that a file does not exist. If it raises an exception
-                    # indicating such, we ignore the bypass function and proceed as though it does not exist.
-                    if hasattr(location.mapper, "bypass_" + location.datasetType):
-                        bypass = self._getBypassFunc(location, dataId)
-                        try:
-                            bypass = bypass()
-                            location.bypass = bypass
-                        except (NoResults, IOError):
-                            self.log.debug("Continuing dataset search while evaluating "
-                                           "bypass function for Dataset type:{} Data ID:{} at "
-                                           "location {}".format(datasetType, dataId, location))
-                    # If a location was found but the location does not exist, keep looking in input
-                    # repositories (the registry may have had enough data for a lookup even thought the object
-                    # exists in a different repository.)
-                    if (isinstance(location, ButlerComposite) or hasattr(location, 'bypass') or
-                            location.repository.exists(location)):
-                        return location
-                else:
-                    try:
-                        locations.extend(location)
-                    except TypeError:
-                        locations.append(location)
-        if not write:
-            return None
+                try:
+                    locations.extend(location)
+                except TypeError:
+                    locations.append(location)
         return locations
 
+    def _locateMany(self, requests):
+        """Get the ButlerLocations and/or ButlerComposites to read a group of datasets from.
+
+        Each dataset is read from the first input repository in which its location exists. The input
+        repositories are searched in turn, and the locations found in each one for the datasets that are
+        still being searched for are checked with one batched call to the repository.
+
+        Parameters
+        ----------
+        requests : list of tuple
+            The (datasetType, dataId) of each dataset. The datasetType may be followed by a dot and a
+            component name, as for `_locate`; the dataId is a DataId class instance.
+
+        Returns
+        -------
+        list
+            For each request, the location to read the dataset from, or None if it was not found.
+        """
+        results = [None] * len(requests)
+        pending = list(range(len(requests)))
+        for repoData in self._repos.inputs():
+            if not pending:
+                break
+            unverified = []
+            for index in pending:
+                datasetType, dataId = requests[index]
+                # enforce dataId & repository tags when reading:
+                if dataId.tag and len(dataId.tag.intersection(repoData.tags)) == 0:
+                    continue
+                components = datasetType.split('.')
+                datasetType = components[0]
+                components = components[1:]
+                try:
+                    location = repoData.repo.map(datasetType, dataId, write=False)
+                except NoResults:
+                    continue
+                if location is None:
+                    continue
+                location.datasetType = datasetType  # todo is there a better way than monkey patching here?
+                if len(components) > 0:
+                    if not isinstance(location, ButlerComposite):
+                        raise RuntimeError("The location for a dotted datasetType must be a composite.")
+                    # replace the first component name with the datasetType
+                    components[0] = location.componentInfo[components[0]].datasetType
+                    # join components back into a dot-delimited string; the component is searched for in
+                    # all the input repositories, and if it is not found the search stops.
+                    results[index] = self._locate('.'.join(components), dataId, False)
+                    if results[index] is None:
+                        results[index] = _notFound
+                    continue
+                if not location:
+                    continue
+                # If there is a bypass function for this dataset type, we can't test to see if the object
+                # exists in storage, because the bypass function may not actually use the location
+                # according to the template. Instead, execute the bypass function and include its results
+                # in the bypass attribute of the location. The bypass function may fail for any reason,
+                # the most common case being that a file does not exist. If it raises an exception
+                # indicating such, we ignore the bypass function and proceed as though it does not exist.
+                if hasattr(location.mapper, "bypass_" + location.datasetType):
+                    bypass = self._getBypassFunc(location, dataId)
+                    try:
+                        bypass = bypass()
+                        location.bypass = bypass
+                    except (NoResults, IOError):
+                        self.log.debug("Continuing dataset search while evaluating "
+                                       "bypass function for Dataset type:{} Data ID:{} at "
+                                       "location {}".format(datasetType, dataId, location))
+                if isinstance(location, ButlerComposite) or hasattr(location, 'bypass'):
+                    results[index] = location
+                else:
+                    unverified.append((index, location))
+            # If a location was found but the location does not exist, keep looking in input
+            # repositories (the registry may have had enough data for a lookup even thought the object
+            # exists in a different repository.)
+            for (index, location), exists in zip(unverified,
+                                                 self._locationsExistEach([loc for _, loc in unverified])):
+                if exists:
+                    results[index] = location
+            pending = [index for index in pending if results[index] is None]
+        return [None if location is _notFound else location for location in results]
+
+    @staticmethod
+    def _locationsExistEach(locations):
+        """Check which of a list of locations exist, with one batched call per repository.
+
+        Parameters
+        ----------
+        locations : list of ButlerLocation
+            The locations to check.
+
+        Returns
+        -------
+        list of bool
+            For each location, True if it exists, else False.
+        """
+        byRepository = collections.OrderedDict()
+        for index, location in enumerate(locations):
+            byRepository.setdefault(id(location.repository), (location.repository, []))[1].append(index)
+        results = [False] * len(locations)
+        for repository, indices in byRepository.values():
+            for index, exists in zip(indices, repository.existsMany([locations[i] for i in indices])):
+                results[index] = exists
+        return results
+
     @staticmethod
     def _getBypassFunc(location, dataId):
-        pythonType = location.getPythonType()
-        if pythonType is not None:
-            if isinstance(pythonType, basestring):
-                pythonType = doImport(pythonType)
+        pythonType = location.getResolvedPythonType()
         bypassFunc = getattr(location.mapper, "bypass_" + location.datasetType)
         return lambda: bypassFunc(location.datasetType, pythonType, location, dataId)
 
@@ -1380,6 +1660,116 @@ class Butler(object):
             raise NoResults("No locations for get:", datasetType, dataId)
         self.log.debug("Get type=%s keys=%s from %s", datasetType, dataId, str(location))
 
+        callback = self._makeReadCallback(location, dataId)
+        if self._objectCache is not None and self._isObjectCacheable(datasetType, location):
+            callback = self._makeCachedReadCallback(datasetType, location, dataId, callback)
+        if immediate:
+            return callback()
+        return ReadProxy(callback)
+
+    def enableObjectCache(self, maxBytes, policy='lru', allow=None, deny=None, sizeFunc=None):
+        """Keep the objects returned by `get` in memory, so getting the same dataset again (e.g. a
+        calibration product used by many ccds) does not read it again.
+
+        Objects are cached by datasetType, data id, and the files they were read from, including the files'
+        modification times, so a dataset that is rewritten is read again (and the stale object is dropped
+        from the cache when that is found). Only datasets in storages that can
+        report modification times (e.g. posix storage) are cached; composite datasets are not cached (their
+        components are). Cached objects are returned to every caller that gets the dataset, so callers must
+        not modify them. Calling this again replaces the cache and resets the statistics.
+
+        Parameters
+        ----------
+        maxBytes : int
+            The maximum estimated size of all the cached objects, in bytes.
+        policy : string, optional
+            The eviction policy used when the cache is full, 'lru' (least recently used) or 'lfu' (least
+            frequently used).
+        allow : list of string, optional
+            If not None, only datasetTypes that match one of these names or shell-style patterns (e.g.
+            'bias', 'calexp*') are cached.
+        deny : list of string, optional
+            DatasetTypes that match one of these names or patterns are never cached.
+        sizeFunc : callable, optional
+            Function that takes an object and returns its size in bytes. Defaults to `estimateSize`.
+        """
+        cache = ObjectCache(maxBytes, sizeFunc, policy)
+        with self._objectCacheLock:
+            self._objectCache = cache
+            self._objectCacheAllow = tuple(allow) if allow is not None else None
+            self._objectCacheDeny = tuple(deny) if deny is not None else ()
+            self._objectCacheStats = {}
+
+    def disableObjectCache(self):
+        """Stop caching the objects returned by `get`, and release the objects that are cached."""
+        with self._objectCacheLock:
+            self._objectCache = None
+
+    def getCacheStats(self):
+        """Get the statistics of the object cache enabled by `enableObjectCache`.
+
+        Returns
+        -------
+        dict
+            For each datasetType that has been looked for in the cache, a dict with the number of 'hits' and
+            'misses' and the estimated 'bytes' of the objects of that type that are in the cache.
+        """
+        with self._objectCacheLock:
+            stats = {datasetType: dict(typeStats, bytes=0)
+                     for datasetType, typeStats in self._objectCacheStats.items()}
+            cache = self._objectCache
+        if cache is not None:
+            for key, size in cache.sizes():
+                stats.setdefault(key[0], {'hits': 0, 'misses': 0, 'bytes': 0})['bytes'] += size
+        return stats
+
+    def _isObjectCacheable(self, datasetType, location):
+        if hasattr(location, 'bypass') or not isinstance(location, ButlerLocation):
+            return False
+        if self._objectCacheAllow is not None and \
+                not any(fnmatch.fnmatchcase(datasetType, pattern) for pattern in self._objectCacheAllow):
+            return False
+        return not any(fnmatch.fnmatchcase(datasetType, pattern) for pattern in self._objectCacheDeny)
+
+    def _makeCachedReadCallback(self, datasetType, location, dataId, callback):
+        """Wrap a read callback so that it gets the object from the object cache, or reads it and adds it
+        to the cache.
+        """
+        cache = self._objectCache
+
+        def cachedCallback():
+            storage = location.getStorage()
+            token = storage.getModificationToken(location) if storage is not None else None
+            if token is None:
+                return callback()
+            # The object read from the files before they were rewritten is stale; getting it with the
+            # current token removes it from the cache.
+            key = (datasetType, _dataIdKey(dataId), tuple(location.getLocations()))
+            obj = cache.get(key, _notCached, token)
+            with self._objectCacheLock:
+                typeStats = self._objectCacheStats.setdefault(datasetType, {'hits': 0, 'misses': 0})
+                typeStats['hits' if obj is not _notCached else 'misses'] += 1
+            if obj is _notCached:
+                obj = callback()
+                cache.put(key, obj, token)
+            return obj
+        return cachedCallback
+
+    def _makeReadCallback(self, location, dataId):
+        """Make a function that reads (or takes from the bypass) and standardizes the object at a location.
+
+        Parameters
+        ----------
+        location : ButlerLocation or ButlerComposite
+            The location found for the dataset by `_locate`.
+        dataId : DataId
+            The data id used to find the location.
+
+        Returns
+        -------
+        callable
+            A function with no arguments that returns the object.
+        """
         if hasattr(location, 'bypass'):
             # this type loader block should get moved into a helper someplace, and duplications removed.
             def callback():
@@ -1392,9 +1782,67 @@ class Butler(object):
 
             def callback():
                 return location.mapper.standardize(location.datasetType, innerCallback(), dataId)
+        return callback
+
+    def enableComponentCache(self, maxBytes, sizeFunc=None):
+        """Cache the components read while assembling composite datasets, so that composites that share
+        components (e.g. the same wcs or psf) reuse the already-read objects.
+
+        Components are cached by datasetType, data id, and the repository they were found in. When the cache
+        is full the least recently used components are evicted. Cached components are shared by every
+        composite assembled from them and must not be modified by assemblers.
+
+        Parameters
+        ----------
+        maxBytes : int
+            The maximum estimated size of all the cached components, in bytes.
+        sizeFunc : callable, optional
+            Function that takes an object and returns its size in bytes. Defaults to `estimateSize`.
+        """
+        self._componentCache = ObjectCache(maxBytes, sizeFunc)
+
+    def disableComponentCache(self):
+        """Stop caching components, and release the components that are cached."""
+        self._componentCache = None
+
+    def _getComponent(self, datasetType, dataId, immediate):
+        """Get a component of a composite dataset, using the component cache if it is enabled.
+
+        Parameters
+        ----------
+        datasetType : string
+            The datasetType of the component.
+        dataId : dict or DataId
+            The data id of the component.
+        immediate : bool
+            If False and the component is not cached, return a proxy that reads it on first access.
+
+        Returns
+        -------
+        object
+            The component (or a proxy for it).
+        """
+        if self._componentCache is None:
+            return self.get(datasetType, dataId, immediate=immediate)
+        dataId = DataId(dataId)
+        location = self._locate(datasetType, dataId, write=False)
+        if location is None:
+            raise NoResults("No locations for get:", datasetType, dataId)
+        key = (datasetType, _dataIdKey(dataId), getattr(location, 'repository', None))
+        cache = self._componentCache
+        obj = cache.get(key, _notCached)
+        if obj is not _notCached:
+            self.log.debug("Get cached component type=%s keys=%s", datasetType, dataId)
+            return obj
+        callback = self._makeReadCallback(location, dataId)
+
+        def cachingCallback():
+            obj = callback()
+            cache.put(key, obj)
+            return obj
         if immediate:
-            return callback()
-        return ReadProxy(callback)
+            return cachingCallback()
+        return ReadProxy(cachingCallback)
 
     def put(self, obj, datasetType, dataId={}, doBackup=False, **rest):
         """Persists a dataset given an output collection data id.
@@ -1418,20 +1866,287 @@ class Butler(object):
         dataId = DataId(dataId)
         dataId.update(**rest)
 
+        for location, locationObj, locationDataId in self._locateWrites(obj, datasetType, dataId):
+            if self._writePool is not None:
+                self._writeBehind(location, locationObj, locationDataId, doBackup)
+            else:
+                self._write(location, locationObj, locationDataId, doBackup)
+
+    def putMany(self, items, doBackup=False, workers=4):
+        """Persist many datasets, writing them concurrently.
+
+        All the datasets are located (and composites disassembled) first, then the directories they are
+        written to are created, once each, and then the datasets are written in a pool of threads. A failure
+        to locate one dataset, create its directory or write it (or a malformed item) does not stop the
+        others from being written.
+
+        Parameters
+        ----------
+        items : iterable of tuple
+            An (obj, datasetType, dataId) tuple for each dataset to persist.
+        doBackup : bool, optional
+            If True, rename existing instead of overwriting.
+            WARNING: Setting doBackup=True is not safe for parallel processing, as it may be subject to race
+            conditions.
+        workers : int, optional
+            The number of threads that write datasets.
+
+        Returns
+        -------
+        list
+            For each item, in order, None if the dataset was written or the exception raised persisting it.
+        """
+        if workers < 1:
+            raise RuntimeError("Number of putMany workers must be at least 1, not {}".format(workers))
+        results = []
+        writes = []  # (item index, location, obj, dataId)
+        for item in items:
+            results.append(None)
+            try:
+                obj, datasetType, dataId = item
+                datasetType = self._resolveDatasetTypeAlias(datasetType)
+                dataId = DataId(dataId)
+                for location, locationObj, locationDataId in self._locateWrites(obj, datasetType, dataId):
+                    writes.append((len(results) - 1, location, locationObj, locationDataId))
+            except Exception as e:
+                results[-1] = e
+
+        # Create the directories; an item that can not be written is not written at all.
+        byStorage = collections.OrderedDict()
+        for index, location, obj, dataId in writes:
+            storage = location.getStorage()
+            byStorage.setdefault(id(storage), (storage, [], []))
+            byStorage[id(storage)][1].append(location)
+            byStorage[id(storage)][2].append(index)
+        for storage, locations, indices in byStorage.values():
+            errors = storage.prepareWrites(locations)
+            for index, error in zip(indices, errors or ()):
+                if error is not None and results[index] is None:
+                    results[index] = error
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [(index, pool.submit(self._write, location, obj, dataId, doBackup))
+                       for index, location, obj, dataId in writes if results[index] is None]
+            for index, future in futures:
+                if future.exception() is not None and results[index] is None:
+                    results[index] = future.exception()
+        safeFileIo.syncDirectories()
+        return results
+
+    def _locateWrites(self, obj, datasetType, dataId):
+        """Find the locations to write a dataset to, disassembling composites into their components.
+
+        Parameters
+        ----------
+        obj : object
+            The object to persist.
+        datasetType : string
+            The type of dataset to persist, with aliases resolved.
+        dataId : DataId
+            The data id.
+
+        Returns
+        -------
+        list of tuple
+            A (ButlerLocation, obj, dataId) tuple for each object to write.
+        """
         locations = self._locate(datasetType, dataId, write=True)
         if not locations:
             raise NoResults("No locations for put:", datasetType, dataId)
+        writes = []
         for location in locations:
             if isinstance(location, ButlerComposite):
                 disassembler = location.disassembler if location.disassembler else genericDisassembler
                 disassembler(obj=obj, dataId=location.dataId, componentInfo=location.componentInfo)
                 for name, info in location.componentInfo.items():
                     if not info.inputOnly:
-                        self.put(info.obj, info.datasetType, location.dataId, doBackup=doBackup)
+                        componentType = self._resolveDatasetTypeAlias(info.datasetType)
+                        writes.extend(self._locateWrites(info.obj, componentType, DataId(location.dataId)))
             else:
-                if doBackup:
-                    location.getRepository().backup(location.datasetType, dataId)
-                location.getRepository().write(location, obj)
+                writes.append((location, obj, dataId))
+        return writes
+
+    def _write(self, location, obj, dataId, doBackup):
+        if doBackup:
+            location.getRepository().backup(location.datasetType, dataId)
+        location.getRepository().write(location, obj)
+
+    def warmUp(self, datasetTypes=None):
+        """Open the registries of the repositories, let the mappers prepare the dataset types, and make the
+        Butler safe to use in processes forked from this one.
+
+        Call this before forking a pool of worker processes that use the Butler, so that the registries are
+        opened once instead of by each worker. Each mapper's `Mapper.warmUp` is called with the dataset
+        types; the base Mapper does nothing.
+
+        After a fork, the child process reopens the registry database connections (see
+        `Registry.afterFork`), which can not be shared with the parent, and replaces the Butler's locks and
+        write-behind threads (see `setWriteBehind`), which do not survive the fork. (The locks this package
+        keeps for the whole process are replaced in every child, whether or not warmUp was called.)
+
+        Parameters
+        ----------
+        datasetTypes : list of string, optional
+            The dataset types that will be read or written. If None, mappers prepare all the dataset types
+            they know.
+        """
+        if datasetTypes is not None:
+            datasetTypes = [self._resolveDatasetTypeAlias(datasetType)
+                            for datasetType in listify(datasetTypes)]
+        for mapper in self._getMappers():
+            mapper.warmUp(datasetTypes)
+        self._getRegistries()
+        _warmButlers.add(self)
+
+    def _getMappers(self):
+        """Get the mappers of all the repositories, without duplicates."""
+        mappers = []
+        for repoData in self._repos.all():
+            if repoData.repo is None:
+                continue
+            for mapper in repoData.repo.mappers():
+                if mapper is not None and not any(mapper is other for other in mappers):
+                    mappers.append(mapper)
+        return mappers
+
+    def _getRegistries(self):
+        """Get the registries of all the repositories, without duplicates, opening them if needed."""
+        registries = []
+        for repoData in self._repos.all():
+            for registry in (repoData.repo.getRegistry() if repoData.repo is not None else None,
+                             repoData.parentRegistry):
+                if registry is not None and not any(registry is other for other in registries):
+                    registries.append(registry)
+        return registries
+
+    def _afterFork(self):
+        """Make this Butler usable in a child process, after a fork: reopen the registry connections, and
+        replace the locks and threads, which may have been in use by other threads of the parent."""
+        for registry in self._getRegistries():
+            registry.afterFork()
+        self._objectCacheLock = threading.Lock()
+        if self._objectCache is not None:
+            self._objectCache.afterFork()
+        if self._componentCache is not None:
+            self._componentCache.afterFork()
+        self._writeLock = threading.Lock()
+        self._pendingWrites = set()
+        self._lastWrites = {}
+        self._writeErrors = []
+        self._writePool = None
+        self._writeSlots = None
+        if self._writeBehindArgs is not None:
+            workers, maxPending = self._writeBehindArgs
+            self._writeSlots = threading.BoundedSemaphore(maxPending)
+            self._writePool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+    def setWriteBehind(self, enabled=True, workers=2, maxPending=16):
+        """Set whether `put` writes datasets in background threads.
+
+        With write-behind enabled, `put` finds the locations of the dataset (and disassembles composites)
+        before it returns, but the dataset is written to storage later, in a pool of threads. The object
+        must not be modified after it is put until the write is complete. Puts of the same dataset are
+        written in the order they were made. Call `flush` (or use the butler as a context manager) to wait
+        for all the writes to complete; errors raised by the writes are raised by `flush`. Datasets are not
+        guaranteed to be readable until they have been flushed.
+
+        Parameters
+        ----------
+        enabled : bool, optional
+            If True write datasets in background threads, if False flush any pending writes and write
+            datasets in `put` again.
+        workers : int, optional
+            The number of threads that write datasets.
+        maxPending : int, optional
+            The maximum number of writes that may be waiting or in progress; `put` blocks until there is room
+            for another.
+        """
+        if workers < 1 or maxPending < 1:
+            raise RuntimeError("Write-behind workers ({}) and maxPending ({}) must be at least 1".format(
+                workers, maxPending))
+        pool = self._writePool
+        self._writePool = None
+        if pool is not None:
+            try:
+                self.flush()
+            finally:
+                pool.shutdown(wait=True)
+        self._writeBehindArgs = (workers, maxPending) if enabled else None
+        if enabled:
+            self._writeSlots = threading.BoundedSemaphore(maxPending)
+            self._writePool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+    def flush(self):
+        """Wait for all the writes started by `put` with write-behind enabled (see `setWriteBehind`) to
+        complete, and sync the directories written to if directory syncs are batched (see
+        `safeFileIo.setDurability`).
+
+        Raises
+        ------
+        Exception
+            The first error raised by a pending write, if any. Errors are reported only once.
+        """
+        while True:
+            with self._writeLock:
+                pending = list(self._pendingWrites)
+            if not pending:
+                break
+            concurrent.futures.wait(pending)
+        with self._writeLock:
+            errors = self._writeErrors
+            self._writeErrors = []
+        safeFileIo.syncDirectories()
+        if errors:
+            for error in errors[1:]:
+                self.log.warn("Error in write-behind put: %s", error)
+            raise errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.flush()
+        else:
+            # Do not hide the exception that is already being raised.
+            try:
+                self.flush()
+            except Exception as e:
+                self.log.warn("Error in write-behind put: %s", e)
+        return False
+
+    def _writeBehind(self, location, obj, dataId, doBackup):
+        """Write an object to a location in the write-behind pool, after any pending write to the same
+        location.
+        """
+        key = (id(location.getRepository()), tuple(location.getLocations()))
+        slots = self._writeSlots
+        slots.acquire()
+        with self._writeLock:
+            previous = self._lastWrites.get(key)
+
+            def write():
+                if previous is not None:
+                    concurrent.futures.wait([previous])
+                self._write(location, obj, dataId, doBackup)
+
+            try:
+                future = self._writePool.submit(write)
+            except Exception:
+                slots.release()
+                raise
+            self._pendingWrites.add(future)
+            self._lastWrites[key] = future
+        future.add_done_callback(functools.partial(self._writeDone, key, slots))
+
+    def _writeDone(self, key, slots, future):
+        with self._writeLock:
+            self._pendingWrites.discard(future)
+            if self._lastWrites.get(key) is future:
+                del self._lastWrites[key]
+            if future.exception() is not None:
+                self._writeErrors.append(future.exception())
+        slots.release()
 
     def subset(self, datasetType, level=None, dataId={}, **rest):
         """Return complete dataIds for a dataset type that match a partial (or empty) dataId.
@@ -1559,6 +2274,34 @@ class Butler(object):
             # Follow the read path, only return the first valid read
             return locations.getLocationsWithRoot()[0]
 
+    def setLazyComponents(self, lazy=True, workers=4):
+        """Set how the components of composite datasets are read.
+
+        By default every component of a composite (and every element of a `subset` component) is read before
+        the assembler is called. When lazy, the assembler is instead given a ReadProxy for each component,
+        which reads the component the first time it is accessed; components the assembler does not use are
+        never read. The elements of a `subset` component are read together, concurrently, the first time any
+        one of them is accessed. Other components are not part of any group: each is read by itself, in the
+        thread that accesses it, so that using one component (e.g. the WCS of an exposure) never reads the
+        others (e.g. the pixels). An assembler that uses several such components reads them one at a time.
+
+        Lazy components only work with assemblers that accept proxies for the objects they assemble, e.g.
+        assemblers that keep references to their components or only use some of them. Assemblers that pass
+        components to C++ code usually need the real objects.
+
+        Parameters
+        ----------
+        lazy : bool, optional
+            If True read components lazily, if False read all components before assembling.
+        workers : int, optional
+            The maximum number of threads used to read the elements of a `subset` component; other
+            components are always read one at a time.
+        """
+        if workers < 1:
+            raise RuntimeError("Number of component workers must be at least 1, not {}".format(workers))
+        self._lazyComponents = lazy
+        self._componentWorkers = workers
+
     def _read(self, location):
         """Unpersist an object using data inside a ButlerLocation or ButlerComposite object.
 
@@ -1578,9 +2321,15 @@ class Butler(object):
             for name, componentInfo in location.componentInfo.items():
                 if componentInfo.subset:
                     subset = self.subset(datasetType=componentInfo.datasetType, dataId=location.dataId)
-                    componentInfo.obj = [obj.get() for obj in subset]
+                    objs = [self._getComponent(componentInfo.datasetType, obj.dataId,
+                                               immediate=not self._lazyComponents) for obj in subset]
+                    if self._lazyComponents:
+                        objs = _LazyComponentGroup(objs, self._componentWorkers).proxies()
+                    componentInfo.obj = objs
                 else:
-                    obj = self.get(componentInfo.datasetType, location.dataId, immediate=True)
+                    # Not grouped with the other components: a lazy component is only read if it is used.
+                    obj = self._getComponent(componentInfo.datasetType, location.dataId,
+                                             immediate=not self._lazyComponents)
                     componentInfo.obj = obj
                 assembler = location.assembler or genericAssembler
             results = assembler(dataId=location.dataId, componentInfo=location.componentInfo,
@@ -1594,9 +2343,65 @@ class Butler(object):
         return results
 
     def __reduce__(self):
-        ret = (_unreduce, (self._initArgs, self.datasetTypeAliasDict))
+        ret = (_unreduce, (self._initArgs, self.datasetTypeAliasDict, self._getPickleState()))
         return ret
 
+    def _getPickleState(self):
+        """Get the resolved repository DAG of this Butler, so that it can be unpickled without finding and
+        reading the RepositoryCfgs again.
+
+        Returns
+        -------
+        dict
+            'token' identifies this Butler and the process that pickled it, for the unpickle memo.
+            'repoDatas' has a dict for each RepoData in search order, with the RepoData's arguments, role,
+            cfg, and the indices of its parents.
+        """
+        if self._pickleToken is None:
+            self._pickleToken = (os.getpid(), uuid.uuid4().hex)
+        repoDataList = self._repos.all()
+        indices = {id(repoData): i for i, repoData in enumerate(repoDataList)}
+        repoDatas = []
+        for repoData in repoDataList:
+            repoDatas.append({'repoArgs': repoData.repoArgs,
+                              'role': repoData.role,
+                              'cfg': repoData.cfg,
+                              'cfgOrigin': repoData.cfgOrigin,
+                              'cfgRoot': repoData.cfgRoot,
+                              'isV1Repository': repoData.isV1Repository,
+                              'tags': repoData.tags,
+                              'parents': [indices[id(parent)] for parent in repoData.parentRepoDatas]})
+        return {'token': self._pickleToken, 'repoDatas': repoDatas}
+
+    @classmethod
+    def _fromPickleState(cls, initArgs, state):
+        """Make a Butler from the state returned by `_getPickleState`, without finding and reading the
+        RepositoryCfgs of its repositories. The repositories (and their mappers) are initialized as in
+        `__init__`.
+        """
+        butler = cls.__new__(cls)
+        butler._initArgs = initArgs
+        butler._initAttributes()
+        butler.datasetTypeAliasDict = {}
+        butler.storage = Storage()
+        timer = butler._initProfile.timer
+        with timer('total'):
+            repoDataList = []
+            for item in state['repoDatas']:
+                repoData = RepoData(item['repoArgs'], item['role'])
+                repoData.setCfg(item['cfg'], item['cfgOrigin'], item['cfgRoot'], item['isV1Repository'])
+                repoData.tags = set(item['tags'])
+                repoDataList.append(repoData)
+            for repoData, item in zip(repoDataList, state['repoDatas']):
+                for parentIdx in item['parents']:
+                    repoData.addParentRepoData(repoDataList[parentIdx])
+            butler._repos = RepoDataContainer(repoDataList)
+            with timer('initRepos'):
+                for repoData in repoDataList:
+                    butler._initRepo(repoData)
+        butler._pickleToken = state['token']
+        return butler
+
     def _resolveDatasetTypeAlias(self, datasetType):
         """Replaces all the known alias keywords in the given string with the alias value.
 
@@ -1623,9 +2428,103 @@ class Butler(object):
         return datasetType
 
 
-def _unreduce(initArgs, datasetTypeAliasDict):
-    mapperArgs = initArgs.pop('mapperArgs')
-    initArgs.update(mapperArgs)
-    butler = Butler(**initArgs)
-    butler.datasetTypeAliasDict = datasetTypeAliasDict
+class _LazyComponentGroup(object):
+    """Reads a group of lazily-read components concurrently, the first time any one of them is accessed.
+
+    Only the elements of a `subset` component are grouped; see `Butler.setLazyComponents`.
+
+    Parameters
+    ----------
+    objs : list of ReadProxy or object
+        Proxies for the components in the group, as returned by `Butler.get` with immediate=False. Components
+        that were already read (e.g. found in the component cache) may be passed as the objects themselves.
+    workers : int
+        The maximum number of threads used to read the components.
+    """
+
+    def __init__(self, objs, workers):
+        self._objs = objs
+        self._workers = workers
+        self._objects = None
+        self._lock = threading.Lock()
+
+    def proxies(self):
+        """Get a list of proxies, one for each component in the group, that read the whole group on first
+        access."""
+        return [ReadProxy(functools.partial(self._get, i)) for i in range(len(self._objs))]
+
+    @staticmethod
+    def _resolve(obj):
+        return obj.__subject__ if isinstance(obj, ReadProxy) else obj
+
+    def _get(self, index):
+        with self._lock:
+            if self._objects is None:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=self._workers) as pool:
+                    self._objects = list(pool.map(self._resolve, self._objs))
+        return self._objects[index]
+
+
+_notCached = object()
+
+# The result of Butler._probeOldButlerRepository.
+_OldButlerProbe = collections.namedtuple('_OldButlerProbe', ['exists', 'mapper', 'parent'])
+
+# Marks a dataset that Butler._locateMany stopped searching for without finding it.
+_notFound = object()
+
+
+def _dataIdKey(dataId):
+    """Make a hashable key from the items of a data id."""
+    key = tuple(sorted(dataId.items()))
+    try:
+        hash(key)
+    except TypeError:
+        key = repr(key)
+    return key
+
+
+# Butlers unpickled in this process, by the token of the pickled Butler and its aliases.
+_unpickledButlers = weakref.WeakValueDictionary()
+_unpickledButlersLock = threading.Lock()
+resetAfterFork(sys.modules[__name__], '_unpickledButlersLock', threading.Lock)
+
+# Butlers that have been warmed up, to be made usable in child processes after a fork.
+_warmButlers = weakref.WeakSet()
+
+
+def _afterForkInChild():
+    for butler in list(_warmButlers):
+        butler._afterFork()
+
+
+callAfterFork(_afterForkInChild)
+
+
+def _unreduce(initArgs, datasetTypeAliasDict, state=None):
+    """Unpickle a Butler.
+
+    Butlers pickled with their repository DAG (state) are rebuilt from it without reading the
+    RepositoryCfgs, and a Butler that is unpickled more than once in a process other than the one that
+    pickled it (e.g. by each task sent to a multiprocessing worker) is only rebuilt the first time; later
+    unpickles return the same instance while it is in use. Butlers pickled without state are
+    constructed from their init arguments.
+    """
+    if state is None:
+        mapperArgs = initArgs.pop('mapperArgs')
+        initArgs.update(mapperArgs)
+        butler = Butler(**initArgs)
+        butler.datasetTypeAliasDict = datasetTypeAliasDict
+        return butler
+    pid = state['token'][0]
+    key = (state['token'], _dataIdKey(datasetTypeAliasDict))
+    with _unpickledButlersLock:
+        if pid != os.getpid():
+            butler = _unpickledButlers.get(key)
+            if butler is not None:
+                return butler
+        butler = Butler._fromPickleState(initArgs, state)
+        butler.datasetTypeAliasDict = datasetTypeAliasDict
+        if pid != os.getpid():
+            _unpickledButlers[key] = butler
     return butler
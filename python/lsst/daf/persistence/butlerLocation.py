@@ -216,13 +216,66 @@ class ButlerLocation(yaml.YAMLObject):
         self.mapper = mapper
         self.storage = storage
         self.locationList = iterify(locationList)
-        self.additionalData = additionalData if additionalData else dafBase.PropertySet()
-        for k, v in dataId.items():
-            self.additionalData.set(k, v)
+        # The additionalData PropertySet, a copy of the additionalData argument with the items of the dataId
+        # added, is made when it is first used.
+        self._extraData = additionalData
+        self._dataIdItems = list(dataId.items())
+        self._additionalData = None
         self.dataId = dataId
         self.usedDataId = usedDataId
         self.datasetType = datasetType
 
+    @property
+    def additionalData(self):
+        """The additional data (`lsst.daf.base.PropertySet`), including the items of the dataId the location
+        was made with. It is made the first time it is used; most locations are fully expanded by the mapper
+        and never need it."""
+        if self._additionalData is None:
+            additionalData = self._extraData.deepCopy() if self._extraData else dafBase.PropertySet()
+            for k, v in self._dataIdItems:
+                additionalData.set(k, v)
+            self._additionalData = additionalData
+        return self._additionalData
+
+    @additionalData.setter
+    def additionalData(self, additionalData):
+        self._extraData = additionalData
+        self._dataIdItems = []
+        self._additionalData = additionalData
+
+    def hasAdditionalData(self, name):
+        """Test if the additional data has an item, without making the additional data.
+
+        Parameters
+        ----------
+        name : string
+            The name of the item.
+
+        Returns
+        -------
+        bool
+            True if `getAdditionalData` has an item with the name.
+        """
+        if self._additionalData is not None:
+            return self._additionalData.exists(name)
+        if self._extraData and self._extraData.exists(name):
+            return True
+        return any(k == name for k, v in self._dataIdItems)
+
+    def describeAdditionalData(self):
+        """Describe the additional data without making it.
+
+        Returns
+        -------
+        string
+            A description that is the same for locations with the same additional data (e.g. for use in cache
+            keys).
+        """
+        extraData = self._extraData
+        if hasattr(extraData, 'toString'):
+            extraData = extraData.toString()
+        return repr((extraData, sorted(self._dataIdItems, key=lambda item: item[0])))
+
     def __str__(self):
         s = "%s at %s(%s)" % (self.pythonType, self.storageName,
                               ", ".join(self.locationList))
@@ -255,6 +308,63 @@ class ButlerLocation(yaml.YAMLObject):
     def getPythonType(self):
         return self.pythonType
 
+    def getResolvedPythonType(self):
+        """Get the python type, importing it if it is a string.
+
+        The imported type is kept, so the string is only imported once for each location.
+
+        Returns
+        -------
+        class object or None
+            The python type, or None if the location has no python type.
+        """
+        pythonType = self.pythonType
+        if not isinstance(pythonType, basestring):
+            return pythonType
+        resolved = self.__dict__.get('_resolvedPythonType')
+        if resolved is None or resolved[0] != pythonType:
+            resolved = (pythonType, doImport(pythonType))
+            self._resolvedPythonType = resolved
+        return resolved[1]
+
+    def getFormatters(self, storageInterface):
+        """Get the formatters for this location's storage name and python type from a StorageInterface.
+
+        The formatters are kept, so they are only looked up again if the storage name or python type
+        change, or formatters are registered with the StorageInterface.
+
+        Parameters
+        ----------
+        storageInterface : StorageInterface subclass or instance
+            The storage to get the formatters of.
+
+        Returns
+        -------
+        Formatters
+            The read, write and exists formatters; see `StorageInterface.getFormatters`.
+        """
+        table = storageInterface._formatterTable()
+        key = (self.storageName, self.pythonType)
+        cached = self.__dict__.get('_formatters')
+        if cached is None or cached[0] is not table or cached[1] != key:
+            cached = (table, key, storageInterface.getFormatters(*key))
+            self._formatters = cached
+        return cached[2]
+
+    def __getstate__(self):
+        # The formatters may not be picklable; they are looked up again when needed.
+        state = self.__dict__.copy()
+        state.pop('_formatters', None)
+        return state
+
+    def __setstate__(self, state):
+        if 'additionalData' in state:
+            # Pickled by an older version, which made the additionalData (with the dataId items) in __init__.
+            state = state.copy()
+            additionalData = state.pop('additionalData')
+            state.update(_extraData=additionalData, _dataIdItems=[], _additionalData=additionalData)
+        self.__dict__.update(state)
+
     def getCppType(self):
         return self.cppType
 
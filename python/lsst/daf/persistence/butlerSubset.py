@@ -30,7 +30,10 @@ from builtins import next
 from builtins import range
 from builtins import object
 
-from . import DataId
+import collections
+import concurrent.futures
+
+from . import DataId, estimateSize
 
 
 class ButlerSubset(object):
@@ -58,6 +61,8 @@ class ButlerSubset(object):
 
     __iter__(self)
 
+    prefetch(self, datasetType=None, depth=4, workers=2, maxBytes=None, sizeFunc=None)
+
     """
 
     GENERATION = 2
@@ -129,6 +134,73 @@ class ButlerSubset(object):
 
         return ButlerSubsetIterator(self)
 
+    def prefetch(self, datasetType=None, depth=4, workers=2, maxBytes=None, sizeFunc=None):
+        """
+        Iterate over the ButlerDataRefs in the ButlerSubset together with
+        their datasets, reading the datasets of the next ButlerDataRefs in
+        background threads while the caller processes the current one.
+
+        Datasets are located in the calling thread (registry lookups are not
+        thread-safe); only reading and standardizing them happens in the
+        background. An exception raised reading a dataset is raised when the
+        iteration reaches that dataset.
+
+        @param datasetType (str)  dataset type to read (or the type used when
+                                  creating the ButlerSubset, if None).
+        @param depth (int)        the maximum number of datasets read ahead of
+                                  the one being processed.
+        @param workers (int)      the number of threads reading datasets.
+        @param maxBytes (int)     if not None, stop reading ahead while the
+                                  estimated size of the datasets that have
+                                  been read but not yet returned is larger
+                                  than this.
+        @param sizeFunc (callable) function that takes an object and returns
+                                  its size in bytes, used with maxBytes.
+                                  Defaults to estimateSize.
+        @returns iterator of (ButlerDataRef, object) tuples, in the order of
+                 the ButlerSubset.
+        """
+        if depth < 1 or workers < 1:
+            raise RuntimeError("Prefetch depth ({}) and workers ({}) must be at least 1".format(
+                depth, workers))
+        if datasetType is None:
+            datasetType = self.datasetType
+        if sizeFunc is None:
+            sizeFunc = estimateSize
+        return self._prefetch(datasetType, depth, workers, maxBytes, sizeFunc)
+
+    def _prefetch(self, datasetType, depth, workers, maxBytes, sizeFunc):
+        def read(proxy):
+            obj = proxy.__subject__
+            return obj, sizeFunc(obj) if maxBytes is not None else 0
+
+        def bufferedBytes():
+            return sum(future.result()[1] for dataRef, future in pending
+                       if future.done() and future.exception() is None)
+
+        dataRefs = iter(self)
+        pending = collections.deque()
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        try:
+            while True:
+                # Always read the next dataset; read further ahead only within the depth and memory limits.
+                while not pending or (len(pending) <= depth and
+                                      (maxBytes is None or bufferedBytes() < maxBytes)):
+                    dataRef = next(dataRefs, None)
+                    if dataRef is None:
+                        break
+                    proxy = self.butler.get(datasetType, dataRef.dataId, immediate=False)
+                    pending.append((dataRef, pool.submit(read, proxy)))
+                if not pending:
+                    return
+                dataRef, future = pending.popleft()
+                obj = future.result()[0]
+                yield dataRef, obj
+        finally:
+            for dataRef, future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+
 
 class ButlerSubsetIterator(object):
     """
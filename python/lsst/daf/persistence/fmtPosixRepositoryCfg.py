@@ -22,6 +22,7 @@
 
 import copy
 import errno
+import hashlib
 import yaml
 import os
 import urllib
@@ -38,6 +39,43 @@ try:
 except AttributeError:
     Loader = yaml.Loader
 
+# Cfg files written by _write end with a trailer comment that holds a generation number and the sha256 of the
+# rest of the file. A reader that finds a valid trailer knows it has read a complete file, and does not need
+# to lock the file.
+_trailerPrefix = "# repositoryCfg generation="
+
+
+def _stamp(text, generation):
+    """Add a trailer with a generation number and digest to serialized cfg text."""
+    if not text.endswith("\n"):
+        text += "\n"
+    return "{}{}{} sha256={}\n".format(text, _trailerPrefix, generation,
+                                       hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+
+def _unstamp(text):
+    """Remove and verify the trailer added by _stamp.
+
+    Returns
+    -------
+    tuple or None
+        The cfg text and the generation number, or None if the text has no trailer or the trailer does not
+        match the text (e.g. the file was written by an older version, or is being written in place).
+    """
+    start = text.rfind("\n", 0, len(text) - 1) + 1
+    trailer = text[start:]
+    if not trailer.startswith(_trailerPrefix) or not trailer.endswith("\n"):
+        return None
+    try:
+        generation, digest = trailer[len(_trailerPrefix):].split(" sha256=")
+        generation = int(generation)
+    except ValueError:
+        return None
+    body = text[:start]
+    if hashlib.sha256(body.encode("utf-8")).hexdigest() != digest.strip():
+        return None
+    return body, generation
+
 
 def _write(butlerLocation, cfg):
     """Serialize a RepositoryCfg to a location.
@@ -65,17 +103,16 @@ def _write(butlerLocation, cfg):
     loc = butlerLocation.storage.root
     parseRes = urllib.parse.urlparse(loc if loc is not None else cfg.root)
     loc = os.path.join(parseRes.path, butlerLocation.getLocations()[0])
-    try:
-        with safeFileIo.SafeLockedFileForRead(loc) as f:
-            existingCfg = _doRead(f, parseRes.path)
-            if existingCfg == cfg:
-                cfg.dirty = False
-                return
-    except IOError as e:
-        if e.errno != errno.ENOENT:  # ENOENT is 'No such file or directory'
-            raise
-    with safeFileIo.SafeLockedFileForWrite(loc) as f:
-        existingCfg = _doRead(f, parseRes.path)
+    if _readFile(loc, parseRes.path) == cfg:
+        cfg.dirty = False
+        return
+    with safeFileIo.SafeLockedFileForReplace(loc) as f:
+        text = f.read()
+        stamped = _unstamp(text)
+        generation = 0
+        if stamped is not None:
+            text, generation = stamped
+        existingCfg = _doRead(text, parseRes.path)
         if existingCfg is None:
             cfgToWrite = setRoot(cfg, loc)
         else:
@@ -87,7 +124,7 @@ def _write(butlerLocation, cfg):
                 cfgToWrite = setRoot(existingCfg, loc)
             except ParentsMismatch as e:
                 raise RuntimeError("Can not extend existing repository cfg because: {}".format(e))
-        yaml.dump(cfgToWrite, f)
+        f.replace(_stamp(yaml.dump(cfgToWrite), generation + 1))
         cfg.dirty = False
 
 
@@ -96,8 +133,8 @@ def _doRead(fileObject, uri):
 
     Parameters
     ----------
-    fileObject : an open file object
-        the file that contains the RepositoryCfg.
+    fileObject : an open file object or string
+        the file (or the text of the file) that contains the RepositoryCfg.
     uri : string
         path to the repositoryCfg
 
@@ -130,16 +167,48 @@ def _read(butlerLocation):
     IOError
         Raised if no repositoryCfg exists at the location.
     """
-    repositoryCfg = None
     loc = butlerLocation.storage.root
     fileLoc = os.path.join(loc, butlerLocation.getLocations()[0])
+    return _readFile(fileLoc, loc)
+
+
+def _readFile(fileLoc, uri):
+    """Read a RepositoryCfg from a file, without locking it if it was written by _write.
+
+    Parameters
+    ----------
+    fileLoc : string
+        Path to the repositoryCfg file.
+    uri : string
+        Path to the repository.
+
+    Returns
+    -------
+    A RepositoryCfg instance or None if there is no cfg in the file or the file does not exist.
+    """
     try:
-        with safeFileIo.SafeLockedFileForRead(fileLoc) as f:
-            repositoryCfg = _doRead(f, loc)
+        with open(fileLoc, 'r') as f:
+            text = f.read()
     except IOError as e:
         if e.errno != errno.ENOENT:  # ENOENT is 'No such file or directory'
             raise
-    return repositoryCfg
+        return None
+    stamped = _unstamp(text)
+    if stamped is not None:
+        return _doRead(stamped[0], uri)
+    # The file has no valid trailer, so it may be being written in place by a writer that holds a lock, or
+    # be the empty file that _write creates and holds a lock on while it replaces it; read it with a lock.
+    # If the file was replaced while this waited for the lock, read the new one.
+    while True:
+        try:
+            with safeFileIo.SafeLockedFileForRead(fileLoc) as f:
+                if os.fstat(f.fileno()).st_ino != os.stat(fileLoc).st_ino:
+                    continue
+                return _doRead(f, uri)
+        except IOError as e:
+            if e.errno != errno.ENOENT:  # ENOENT is 'No such file or directory'
+                raise
+            return None
 
 
 PosixStorage.registerFormatters(RepositoryCfg, _read, _write)
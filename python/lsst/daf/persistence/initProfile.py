@@ -0,0 +1,123 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""This module defines the InitProfile class, used to record where the time to construct a Butler goes."""
+
+import collections
+from contextlib import contextmanager
+import threading
+import time
+
+__all__ = ["InitProfile"]
+
+
+class InitProfile(object):
+    """Records the wall time and number of calls of the phases of constructing a Butler and its
+    Repositories.
+
+    Parameters
+    ----------
+    enabled : bool, optional
+        If False, `timer` does not record anything.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._entries = collections.OrderedDict()  # (phase, repository): [calls, seconds]
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "InitProfile(enabled=%s, entries=%s)" % (self.enabled, len(self._entries))
+
+    def __str__(self):
+        lines = ["{:>10} {:>6}  {}".format("seconds", "calls", "phase")]
+        for entry in self.report():
+            phase = entry['phase']
+            if entry['repository'] is not None:
+                phase = "{} ({})".format(phase, entry['repository'])
+            lines.append("{:>10.4f} {:>6}  {}".format(entry['seconds'], entry['calls'], phase))
+        return "\n".join(lines)
+
+    @contextmanager
+    def timer(self, phase, repository=None):
+        """Context manager that records the wall time of the code it contains as one call of a phase.
+
+        Parameters
+        ----------
+        phase : string
+            The name of the phase, e.g. 'getCfgs' or 'mapperInit'.
+        repository : string, optional
+            The root of the repository the phase is for, if it is for one repository.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start, repository)
+
+    def record(self, phase, seconds, repository=None):
+        """Record one call of a phase.
+
+        Parameters
+        ----------
+        phase : string
+            The name of the phase.
+        seconds : float
+            The wall time of the call.
+        repository : string, optional
+            The root of the repository the phase is for, if it is for one repository.
+        """
+        with self._lock:
+            entry = self._entries.setdefault((phase, repository), [0, 0.])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def report(self):
+        """Get the recorded phases, in the order they were first recorded.
+
+        Returns
+        -------
+        list of dict
+            A dict for each phase (and repository) with keys 'phase', 'repository' (None for phases that are
+            not for one repository), 'calls' and 'seconds'.
+        """
+        with self._lock:
+            return [{'phase': phase, 'repository': repository, 'calls': calls, 'seconds': seconds}
+                    for (phase, repository), (calls, seconds) in self._entries.items()]
+
+    def totals(self):
+        """Get the total calls and wall time of each phase, over all repositories.
+
+        Returns
+        -------
+        dict
+            For each phase, a dict with keys 'calls' and 'seconds'.
+        """
+        totals = collections.OrderedDict()
+        for entry in self.report():
+            total = totals.setdefault(entry['phase'], {'calls': 0, 'seconds': 0.})
+            total['calls'] += entry['calls']
+            total['seconds'] += entry['seconds']
+        return totals
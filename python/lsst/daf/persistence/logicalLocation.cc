@@ -17,6 +17,7 @@ PYBIND11_MODULE(logicalLocation, mod) {
     cls.def(py::init<std::string const&, CONST_PTR(dafBase::PropertySet)>());
     cls.def("locString", &LogicalLocation::locString);
     cls.def_static("setLocationMap", LogicalLocation::setLocationMap);
+    cls.def_static("expandBatch", &LogicalLocation::expandBatch);
 }
 
 }  // persistence
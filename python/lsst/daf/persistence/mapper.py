@@ -199,3 +199,15 @@ class Mapper(object):
     def getRegistry(self):
         """Get the registry"""
         return None
+
+    def warmUp(self, datasetTypes=None):
+        """Load what is needed to map and read the given dataset types, so that the first reads are not
+        slower than the others; called by `Butler.warmUp`.
+
+        Mappers that load their dataset definitions lazily should override this to load them, e.g. to parse
+        the templates (see `PathTemplate`) and import the python types of the datasets with `doImport`,
+        which remembers them. The base class does nothing.
+
+        :param datasetTypes: list of the dataset types to prepare, or None for all of them.
+        """
+        pass
@@ -0,0 +1,221 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""This module defines the ObjectCache class, used by Butler to keep deserialized objects in memory."""
+
+import collections
+import sys
+import threading
+
+__all__ = ["ObjectCache", "estimateSize"]
+
+
+def estimateSize(obj):
+    """Estimate the memory used by an object, in bytes.
+
+    Objects with an integer `nbytes` attribute (e.g. numpy arrays) count their data size. Lists, tuples,
+    sets, dicts, and the instance dicts of python objects are walked, and everything else counts its
+    `sys.getsizeof`. The estimate is low for objects that keep their data in C++; use a custom size function
+    with `ObjectCache` for those.
+
+    Parameters
+    ----------
+    obj : object
+        The object to measure.
+
+    Returns
+    -------
+    int
+        The estimated size of the object in bytes.
+    """
+    seen = set()
+    size = 0
+    todo = [obj]
+    while todo:
+        item = todo.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        nbytes = getattr(item, 'nbytes', None)
+        if isinstance(nbytes, int):
+            size += nbytes
+            continue
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            todo.extend(item.keys())
+            todo.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            todo.extend(item)
+        elif hasattr(item, '__dict__') and not isinstance(item, type):
+            todo.append(item.__dict__)
+    return size
+
+
+class ObjectCache(object):
+    """A thread-safe cache of objects, bounded by the estimated total size of the objects it holds.
+
+    When adding an object would put the cache over its size limit, objects are evicted until it fits: the
+    least recently used objects with the 'lru' policy, or the least frequently used objects (least recently
+    used first among equals) with the 'lfu' policy. Objects larger than the limit are not cached.
+
+    An object may be cached with a token that identifies the version of the data it was made from, e.g. the
+    modification time of a file. Getting it with a different token finds it stale and removes it.
+
+    Parameters
+    ----------
+    maxBytes : int
+        The maximum estimated size of all the cached objects, in bytes.
+    sizeFunc : callable, optional
+        Function that takes an object and returns its size in bytes. Defaults to `estimateSize`.
+    policy : string, optional
+        The eviction policy, 'lru' or 'lfu'.
+    """
+
+    policies = ('lru', 'lfu')
+
+    def __init__(self, maxBytes, sizeFunc=None, policy='lru'):
+        if maxBytes < 0:
+            raise RuntimeError("Cache size must not be negative, not {}".format(maxBytes))
+        if policy not in self.policies:
+            raise RuntimeError("Unknown cache eviction policy {}, must be one of {}".format(
+                policy, self.policies))
+        self.maxBytes = maxBytes
+        self.policy = policy
+        self._sizeFunc = sizeFunc if sizeFunc is not None else estimateSize
+        self._entries = collections.OrderedDict()  # key: [obj, size, uses, token], least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "ObjectCache(maxBytes=%s, policy=%r, bytes=%s, len=%s)" % (self.maxBytes, self.policy,
+                                                                          self.bytes, len(self))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def bytes(self):
+        """The estimated size of all the cached objects, in bytes."""
+        return self._bytes
+
+    def get(self, key, default=None, token=None):
+        """Get a cached object and mark it as the most recently used.
+
+        Parameters
+        ----------
+        key : hashable
+            The key the object was cached with.
+        default : object, optional
+            Value to return if no object is cached with key.
+        token : object, optional
+            If not None, the current token of the object's data. An object cached with a different token is
+            stale; it is removed from the cache and default is returned.
+
+        Returns
+        -------
+        object
+            The cached object, or default.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if token is not None and entry[3] != token:
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+            entry[2] += 1
+            return entry[0]
+
+    def put(self, key, obj, token=None):
+        """Add an object to the cache, evicting the least recently used objects as needed to make room.
+
+        Parameters
+        ----------
+        key : hashable
+            The key to cache the object with. Replaces any object already cached with the same key.
+        obj : object
+            The object to cache.
+        token : object, optional
+            The token of the data the object was made from; see `get`.
+
+        Returns
+        -------
+        bool
+            True if the object was cached, False if it is too large to be cached.
+        """
+        size = self._sizeFunc(obj)
+        with self._lock:
+            self._remove(key)
+            if size > self.maxBytes:
+                return False
+            while self._entries and self._bytes + size > self.maxBytes:
+                self._remove(self._victim())
+            self._entries[key] = [obj, size, 1, token]
+            self._bytes += size
+            return True
+
+    def remove(self, key):
+        """Remove an object from the cache, if it is there.
+
+        Parameters
+        ----------
+        key : hashable
+            The key the object was cached with.
+        """
+        with self._lock:
+            self._remove(key)
+
+    def sizes(self):
+        """Get the estimated sizes of the cached objects.
+
+        Returns
+        -------
+        list of tuple
+            A (key, size) tuple for each cached object, least recently used first.
+        """
+        with self._lock:
+            return [(key, entry[1]) for key, entry in self._entries.items()]
+
+    def clear(self):
+        """Remove all the objects from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def afterFork(self):
+        """Replace the lock of the cache in a child process after a fork, in case another thread of the
+        parent held it."""
+        self._lock = threading.Lock()
+
+    def _victim(self):
+        if self.policy == 'lfu':
+            return min(self._entries, key=lambda key: self._entries[key][2])
+        return next(iter(self._entries))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
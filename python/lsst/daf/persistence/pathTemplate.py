@@ -0,0 +1,162 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""This module defines the PathTemplate class, used to expand a path template for many data ids at once."""
+
+import collections
+import collections.abc
+import itertools
+import re
+
+from past.builtins import basestring
+
+__all__ = ["PathTemplate"]
+
+
+class PathTemplate(object):
+    """A path template that uses python %-formatting with named keys, e.g. '%(visit)07d/raw_%(ccd)03d.fits',
+    compiled once so that it can be expanded for many data ids.
+
+    Expanding the template for a data id gives the same result as ``template % dataId``.
+
+    Parameters
+    ----------
+    template : string
+        The template. Each substitution must name a key; '%%' is a literal '%'.
+
+    Raises
+    ------
+    RuntimeError
+        If the template contains a substitution that does not name a key.
+    """
+
+    _substitution = re.compile(
+        r'%(?:%|\((?P<key>[^)]*)\)(?P<spec>[#0\- +]*\d*(?:\.\d+)?[hlL]?[diouxXeEfFgGcrsa]))')
+
+    def __init__(self, template):
+        self.template = template
+        pieces = []
+        argKeys = []
+        end = 0
+        for match in self._substitution.finditer(template):
+            self._checkLiteral(template[end:match.start()])
+            pieces.append(template[end:match.start()])
+            if match.group('key') is None:
+                pieces.append('%%')
+            else:
+                pieces.append('%' + match.group('spec'))
+                argKeys.append(match.group('key'))
+            end = match.end()
+        self._checkLiteral(template[end:])
+        pieces.append(template[end:])
+        self._format = ''.join(pieces)
+        self._argKeys = tuple(argKeys)
+        self.keys = tuple(collections.OrderedDict.fromkeys(argKeys))
+
+    def __repr__(self):
+        return "PathTemplate(%r)" % (self.template,)
+
+    def _checkLiteral(self, text):
+        if '%' in text:
+            raise RuntimeError("Unsupported substitution in path template {!r}: substitutions must be of the "
+                               "form %(key)fmt".format(self.template))
+
+    def format(self, dataId):
+        """Expand the template for one data id.
+
+        Parameters
+        ----------
+        dataId : dict
+            Must have a value for each of the template's keys.
+
+        Returns
+        -------
+        string
+            The expanded template.
+        """
+        return self._format % tuple(dataId[key] for key in self._argKeys)
+
+    def expand(self, columns):
+        """Expand the template for a batch of data ids given as columns.
+
+        Parameters
+        ----------
+        columns : dict
+            For each of the template's keys, a sequence (e.g. a list or numpy array) with the value of the
+            key for each data id, or a single value (e.g. a string, or a 0-d numpy array) to use for all of
+            them. The sequences must all have the same length.
+
+        Returns
+        -------
+        list of string
+            The expanded template for each data id, in the order of the columns.
+
+        Raises
+        ------
+        RuntimeError
+            If the sequences do not all have the same length, or a column is an iterable without a length
+            (e.g. an iterator or generator).
+        """
+        length = None
+        values = {}
+        scalars = {}
+        for key in self.keys:
+            column = columns[key]
+            if hasattr(column, 'tolist'):
+                # Formatting python numbers is faster than formatting numpy scalars. A 0-d array becomes a
+                # single value.
+                column = column.tolist()
+            if isinstance(column, basestring) or not isinstance(column, collections.abc.Iterable):
+                scalars[key] = column
+                continue
+            if not isinstance(column, collections.abc.Sized):
+                raise RuntimeError("Column {} for path template {!r} has no length; columns must be "
+                                   "sequences, not iterators".format(key, self.template))
+            if length is None:
+                length = len(column)
+            elif len(column) != length:
+                raise RuntimeError("Columns for path template {!r} have different lengths: {} has {}, not "
+                                   "{}".format(self.template, key, len(column), length))
+            values[key] = column
+        if length is None:
+            return [self.format(scalars)]
+        args = [values[key] if key in values else itertools.repeat(scalars[key], length)
+                for key in self._argKeys]
+        fmt = self._format
+        return [fmt % row for row in zip(*args)]
+
+    def expandRows(self, dataIds):
+        """Expand the template for each of a sequence of data ids.
+
+        Parameters
+        ----------
+        dataIds : iterable of dict
+            Each must have a value for each of the template's keys.
+
+        Returns
+        -------
+        list of string
+            The expanded template for each data id.
+        """
+        fmt = self._format
+        argKeys = self._argKeys
+        return [fmt % tuple(dataId[key] for key in argKeys) for dataId in dataIds]
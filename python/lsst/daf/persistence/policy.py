@@ -33,7 +33,6 @@ import sys
 import warnings
 import yaml
 
-import lsst.pex.policy as pexPolicy
 import lsst.utils
 
 from yaml.representer import Representer
@@ -55,6 +54,13 @@ else:
         pass
 
 
+def _isPexPolicy(obj):
+    """Test if obj is an lsst.pex.policy.Policy, without importing lsst.pex.policy: if it has not been
+    imported there can not be an instance of one."""
+    pexPolicy = sys.modules.get('lsst.pex.policy')
+    return pexPolicy is not None and isinstance(obj, pexPolicy.Policy)
+
+
 class Policy(_PolicyBase):
     """Policy implements a datatype that is used by Butler for configuration parameters.
     It is essentially a dict with key/value pairs, including nested dicts (as values). In fact, it can be
@@ -87,7 +93,7 @@ class Policy(_PolicyBase):
         elif isinstance(other, basestring):
             # if other is a string, assume it is a file path.
             self.__initFromFile(other)
-        elif isinstance(other, pexPolicy.Policy):
+        elif _isPexPolicy(other):
             # if other is an instance of a Pex Policy, load it accordingly.
             self.__initFromPexPolicy(other)
         else:
@@ -119,6 +125,7 @@ class Policy(_PolicyBase):
         if path.endswith('yaml'):
             self.__initFromYamlFile(path)
         elif path.endswith('paf'):
+            import lsst.pex.policy as pexPolicy
             policy = pexPolicy.Policy.createPolicy(path)
             self.__initFromPexPolicy(policy)
         else:
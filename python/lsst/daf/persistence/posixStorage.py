@@ -21,7 +21,7 @@
 # the GNU General Public License along with this program.  If not,
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
-from past.builtins import basestring
+import collections
 import sys
 import pickle
 import importlib
@@ -34,9 +34,8 @@ import yaml
 
 from . import (LogicalLocation, Policy,
                StorageInterface, Storage, ButlerLocation,
-               NoRepositroyAtRoot, RepositoryCfg, doImport)
+               NoRepositroyAtRoot, RepositoryCfg)
 from lsst.log import Log
-import lsst.pex.policy as pexPolicy
 from .safeFileIo import SafeFilename, safeMakeDir
 
 
@@ -61,6 +60,9 @@ class PosixStorage(StorageInterface):
         specified by uri then NoRepositroyAtRoot is raised.
     """
 
+    # The SharedCache used by read for every PosixStorage in the process, if any; see setSharedCache.
+    sharedCache = None
+
     def __init__(self, uri, create):
         self.log = Log.getLogger("daf.persistence.butler")
         self.root = self._pathFromURI(uri)
@@ -147,6 +149,27 @@ class PosixStorage(StorageInterface):
                                   datasetType=None)
         return storage.read(location)
 
+    @staticmethod
+    def getRepositoryCfgToken(uri):
+        """Get a value that changes when the RepositoryCfg at a location is
+        rewritten.
+
+        Parameters
+        ----------
+        uri : URI or path to a RepositoryCfg
+
+        Returns
+        -------
+        tuple or None
+            The modification time, inode and size of the cfg file, or None if
+            there is no cfg file.
+        """
+        try:
+            stat = os.stat(os.path.join(PosixStorage._pathFromURI(uri), 'repositoryCfg.yaml'))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
     @staticmethod
     def putRepositoryCfg(cfg, loc=None):
         storage = Storage.makeFromURI(cfg.root if loc is None else loc, create=True)
@@ -160,6 +183,7 @@ class PosixStorage(StorageInterface):
                                   usedDataId=None,
                                   datasetType=None)
         storage.write(location, cfg)
+        Storage.clearRepositoryCfgCache(cfg.root if loc is None else loc)
 
     @staticmethod
     def getMapperClass(root):
@@ -251,9 +275,7 @@ class PosixStorage(StorageInterface):
         """
         self.log.debug("Put location=%s obj=%s", butlerLocation, obj)
 
-        writeFormatter = self.getWriteFormatter(butlerLocation.getStorageName())
-        if not writeFormatter:
-            writeFormatter = self.getWriteFormatter(butlerLocation.getPythonType())
+        writeFormatter = butlerLocation.getFormatters(self).write
         if writeFormatter:
             writeFormatter(butlerLocation, obj)
             return
@@ -273,25 +295,45 @@ class PosixStorage(StorageInterface):
         A list of objects as described by the butler location. One item for
         each location in butlerLocation.getLocations()
         """
-        readFormatter = self.getReadFormatter(butlerLocation.getStorageName())
-        if not readFormatter:
-            readFormatter = self.getReadFormatter(butlerLocation.getPythonType())
+        readFormatter = butlerLocation.getFormatters(self).read
         if readFormatter:
+            sharedCache = PosixStorage.sharedCache
+            if sharedCache is not None:
+                return sharedCache.read(self, butlerLocation, readFormatter)
             return readFormatter(butlerLocation)
 
         raise(RuntimeError("No formatter for location:{}".format(butlerLocation)))
 
+    @staticmethod
+    def setSharedCache(sharedCache):
+        """Set the node-local cache shared by processes that is used to read datasets from every
+        PosixStorage in this process.
+
+        Only the storages named by the cache's ``storageNames`` are cached, by default only 'PickleStorage';
+        e.g. FITS datasets (afw images) are only cached if 'FitsStorage' is named when the cache is made. See
+        `SharedCache`.
+
+        Parameters
+        ----------
+        sharedCache : SharedCache or None
+            The cache to use, or None to stop using a cache.
+        """
+        PosixStorage.sharedCache = sharedCache
+
     def butlerLocationExists(self, location):
         """Implementation of PosixStorage.exists for ButlerLocation objects.
+
+        Uses the exists formatter registered for the location if there is one, otherwise searches for the
+        location's files.
         """
-        storageName = location.getStorageName()
-        if storageName not in ('FitsStorage', 'PafStorage',
-                               'PickleStorage', 'ConfigStorage', 'FitsCatalogStorage',
-                               'YamlStorage', 'ParquetStorage', 'MatplotlibStorage'):
+        formatters = location.getFormatters(self)
+        if formatters.read is None and formatters.write is None:
             self.log.warn("butlerLocationExists for non-supported storage %s" % location)
             return False
+        if formatters.exists is not None:
+            return formatters.exists(self, location)
         for locationString in location.getLocations():
-            logLoc = LogicalLocation(locationString, location.getAdditionalData()).locString()
+            logLoc = _logicalLocation(locationString, location).locString()
             obj = self.instanceSearch(path=logLoc)
             if obj:
                 return True
@@ -317,6 +359,160 @@ class PosixStorage(StorageInterface):
         obj = self.instanceSearch(path=location)
         return bool(obj)
 
+    def existsAll(self, locations):
+        """Check if all of a group of locations exist, looking up the files of the group together.
+
+        Parameters
+        ----------
+        locations : list of ButlerLocation or string
+            The locations to check.
+
+        Returns
+        -------
+        bool
+            True if every location exists, else False.
+        """
+        return all(self.existsMany(locations))
+
+    def existsMany(self, locations):
+        """Check which of a group of locations exist.
+
+        The files of the locations checked with the default exists formatter (existsPosixFile) are grouped
+        by directory: a directory that holds more than one of them is listed once, and a file that is alone
+        in its directory is looked up with one stat. Other locations are checked with `exists`.
+
+        Parameters
+        ----------
+        locations : list of ButlerLocation or string
+            The locations to check.
+
+        Returns
+        -------
+        list of bool
+            For each location, True if it exists, else False.
+        """
+        results = [False] * len(locations)
+        pending = []
+        byDirectory = collections.defaultdict(set)
+        for index, location in enumerate(locations):
+            paths = self._plainPaths(location)
+            if paths is None:
+                results[index] = self.exists(location)
+                continue
+            pending.append((index, paths))
+            for path in paths:
+                byDirectory[os.path.dirname(path)].add(path)
+        found = set()
+        for directory, paths in byDirectory.items():
+            if len(paths) == 1:
+                found.update(path for path in paths if os.path.lexists(path))
+                continue
+            try:
+                names = set(os.listdir(directory or os.curdir))
+            except OSError:
+                continue
+            found.update(path for path in paths if os.path.basename(path) in names)
+        for index, paths in pending:
+            # Like existsPosixFile, a location exists if any of its files does.
+            results[index] = any(path in found for path in paths)
+        return results
+
+    def _plainPaths(self, location):
+        """Get the paths of the files of a location that is checked with existsPosixFile, for looking them
+        up in their directories.
+
+        Parameters
+        ----------
+        location : ButlerLocation or string
+            The location to check.
+
+        Returns
+        -------
+        list of string or None
+            The paths, or None if the location must be checked with `exists`, e.g. because it uses another
+            exists formatter or has glob wildcards.
+        """
+        if not isinstance(location, ButlerLocation):
+            return None
+        if location.getFormatters(self).exists is not existsPosixFile:
+            return None
+        paths = []
+        for locationString in location.getLocations():
+            path = _logicalLocation(locationString, location).locString()
+            bracket = path.find('[')
+            if bracket != -1:
+                path = path[:bracket]
+            if _hasGlobMagic(path):
+                return None
+            path = self.locationWithRoot(path)
+            if os.path.basename(path) in ('', os.curdir, os.pardir):
+                return None
+            paths.append(path)
+        return paths
+
+    def prepareWrites(self, locations):
+        """Create the directories that a group of locations will be written
+        to, once per directory.
+
+        Parameters
+        ----------
+        locations : list of ButlerLocation
+            The locations that will be written to.
+
+        Returns
+        -------
+        list
+            For each location, None, or the OSError raised creating one of
+            its directories.
+        """
+        directories = collections.OrderedDict()  # directory: indices of the locations written to it
+        for index, location in enumerate(locations):
+            try:
+                for locationString in location.getLocations():
+                    locStringWithRoot = os.path.join(self.root, locationString)
+                    path = _logicalLocation(locStringWithRoot, location).locString()
+                    directories.setdefault(os.path.dirname(path), []).append(index)
+            except Exception:
+                # The location can not be expanded; writing it will raise the same error.
+                continue
+        errors = [None] * len(locations)
+        for directory, indices in directories.items():
+            try:
+                safeMakeDir(directory)
+            except OSError as e:
+                for index in indices:
+                    errors[index] = errors[index] or e
+        return errors
+
+    def getModificationToken(self, location):
+        """Get a value that changes when the files at a location are rewritten.
+
+        Parameters
+        ----------
+        location : ButlerLocation
+            The location of an object in this storage.
+
+        Returns
+        -------
+        tuple or None
+            The path, modification time, size and inode of each file at the
+            location, or None if a file does not exist.
+        """
+        token = []
+        for locationString in location.getLocations():
+            locStringWithRoot = os.path.join(self.root, locationString)
+            path = _logicalLocation(locStringWithRoot, location).locString()
+            # Strip off any cfitsio bracketed extension if present
+            firstBracket = path.find("[")
+            if firstBracket != -1:
+                path = path[:firstBracket]
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            token.append((path, stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        return tuple(token)
+
     def locationWithRoot(self, location):
         """Get the full path to the location.
 
@@ -474,9 +670,15 @@ class PosixStorage(StorageInterface):
             strippedPath = path[:firstBracket]
             pathStripped = path[firstBracket:]
 
+        # Only glob for paths with wildcards; an exact path is looked up with a stat.
+        hasMagic = _hasGlobMagic(strippedPath)
         dir = rootDir
         while True:
-            paths = glob.glob(os.path.join(dir, strippedPath))
+            if hasMagic:
+                paths = glob.glob(os.path.join(dir, strippedPath))
+            else:
+                joinedPath = os.path.join(dir, strippedPath)
+                paths = [joinedPath] if os.path.lexists(joinedPath) else []
             if len(paths) > 0:
                 if pathPrefix != rootDir:
                     paths = [p[len(rootDir+'/'):] for p in paths]
@@ -523,13 +725,10 @@ def readConfigStorage(butlerLocation):
     results = []
     for locationString in butlerLocation.getLocations():
         locStringWithRoot = os.path.join(butlerLocation.getStorage().root, locationString)
-        logLoc = LogicalLocation(locStringWithRoot, butlerLocation.getAdditionalData())
+        logLoc = _logicalLocation(locStringWithRoot, butlerLocation)
         if not os.path.exists(logLoc.locString()):
             raise RuntimeError("No such config file: " + logLoc.locString())
-        pythonType = butlerLocation.getPythonType()
-        if pythonType is not None:
-            if isinstance(pythonType, basestring):
-                pythonType = doImport(pythonType)
+        pythonType = butlerLocation.getResolvedPythonType()
         finalItem = pythonType()
         finalItem.load(logLoc.locString())
         results.append(finalItem)
@@ -549,7 +748,7 @@ def writeConfigStorage(butlerLocation, obj):
     """
     filename = os.path.join(butlerLocation.getStorage().root, butlerLocation.getLocations()[0])
     with SafeFilename(filename) as locationString:
-        logLoc = LogicalLocation(locationString, butlerLocation.getAdditionalData())
+        logLoc = _logicalLocation(locationString, butlerLocation)
         obj.save(logLoc.locString())
 
 
@@ -571,10 +770,7 @@ def readFitsStorage(butlerLocation):
     A list of objects as described by the butler location. One item for
     each location in butlerLocation.getLocations()
     """
-    pythonType = butlerLocation.getPythonType()
-    if pythonType is not None:
-        if isinstance(pythonType, basestring):
-            pythonType = doImport(pythonType)
+    pythonType = butlerLocation.getResolvedPythonType()
     supportsOptions = hasattr(pythonType, "readFitsWithOptions")
     if not supportsOptions:
         from lsst.daf.base import PropertySet, PropertyList
@@ -584,10 +780,10 @@ def readFitsStorage(butlerLocation):
         else:
             reader = pythonType.readFits
     results = []
-    additionalData = butlerLocation.getAdditionalData()
+    additionalData = butlerLocation.getAdditionalData() if supportsOptions else None
     for locationString in butlerLocation.getLocations():
         locStringWithRoot = os.path.join(butlerLocation.getStorage().root, locationString)
-        logLoc = LogicalLocation(locStringWithRoot, additionalData)
+        logLoc = _logicalLocation(locStringWithRoot, butlerLocation)
         # test for existence of file, ignoring trailing [...]
         # because that can specify the HDU or other information
         filePath = re.sub(r"(\.fits(.[a-zA-Z0-9]+)?)(\[.+\])$", r"\1", logLoc.locString())
@@ -626,12 +822,11 @@ def writeFitsStorage(butlerLocation, obj):
         The object to be written.
     """
     supportsOptions = hasattr(obj, "writeFitsWithOptions")
-    additionalData = butlerLocation.getAdditionalData()
     locations = butlerLocation.getLocations()
     with SafeFilename(os.path.join(butlerLocation.getStorage().root, locations[0])) as locationString:
-        logLoc = LogicalLocation(locationString, additionalData)
+        logLoc = _logicalLocation(locationString, butlerLocation)
         if supportsOptions:
-            obj.writeFitsWithOptions(logLoc.locString(), options=additionalData)
+            obj.writeFitsWithOptions(logLoc.locString(), options=butlerLocation.getAdditionalData())
         else:
             obj.writeFits(logLoc.locString())
 
@@ -654,18 +849,14 @@ def readParquetStorage(butlerLocation):
     each location in butlerLocation.getLocations()
     """
     results = []
-    additionalData = butlerLocation.getAdditionalData()
 
     for locationString in butlerLocation.getLocations():
         locStringWithRoot = os.path.join(butlerLocation.getStorage().root, locationString)
-        logLoc = LogicalLocation(locStringWithRoot, additionalData)
+        logLoc = _logicalLocation(locStringWithRoot, butlerLocation)
         if not os.path.exists(logLoc.locString()):
             raise RuntimeError("No such parquet file: " + logLoc.locString())
 
-        pythonType = butlerLocation.getPythonType()
-        if pythonType is not None:
-            if isinstance(pythonType, basestring):
-                pythonType = doImport(pythonType)
+        pythonType = butlerLocation.getResolvedPythonType()
 
         filename = logLoc.locString()
 
@@ -687,10 +878,9 @@ def writeParquetStorage(butlerLocation, obj):
         Wrapped DataFrame to write.
 
     """
-    additionalData = butlerLocation.getAdditionalData()
     locations = butlerLocation.getLocations()
     with SafeFilename(os.path.join(butlerLocation.getStorage().root, locations[0])) as locationString:
-        logLoc = LogicalLocation(locationString, additionalData)
+        logLoc = _logicalLocation(locationString, butlerLocation)
         filename = logLoc.locString()
         obj.write(filename)
 
@@ -705,10 +895,9 @@ def writeYamlStorage(butlerLocation, obj):
     obj : object instance
         The object to be written.
     """
-    additionalData = butlerLocation.getAdditionalData()
     locations = butlerLocation.getLocations()
     with SafeFilename(os.path.join(butlerLocation.getStorage().root, locations[0])) as locationString:
-        logLoc = LogicalLocation(locationString, additionalData)
+        logLoc = _logicalLocation(locationString, butlerLocation)
         with open(logLoc.locString(), "w") as outfile:
             yaml.dump(obj, outfile)
 
@@ -728,10 +917,9 @@ def readPickleStorage(butlerLocation):
     """
     # Create a list of Storages for the item.
     results = []
-    additionalData = butlerLocation.getAdditionalData()
     for locationString in butlerLocation.getLocations():
         locStringWithRoot = os.path.join(butlerLocation.getStorage().root, locationString)
-        logLoc = LogicalLocation(locStringWithRoot, additionalData)
+        logLoc = _logicalLocation(locStringWithRoot, butlerLocation)
         if not os.path.exists(logLoc.locString()):
             raise RuntimeError("No such pickle file: " + logLoc.locString())
         with open(logLoc.locString(), "rb") as infile:
@@ -756,10 +944,9 @@ def writePickleStorage(butlerLocation, obj):
     obj : object instance
         The object to be written.
     """
-    additionalData = butlerLocation.getAdditionalData()
     locations = butlerLocation.getLocations()
     with SafeFilename(os.path.join(butlerLocation.getStorage().root, locations[0])) as locationString:
-        logLoc = LogicalLocation(locationString, additionalData)
+        logLoc = _logicalLocation(locationString, butlerLocation)
         with open(logLoc.locString(), "wb") as outfile:
             pickle.dump(obj, outfile, pickle.HIGHEST_PROTOCOL)
 
@@ -777,22 +964,17 @@ def readFitsCatalogStorage(butlerLocation):
     A list of objects as described by the butler location. One item for
     each location in butlerLocation.getLocations()
     """
-    pythonType = butlerLocation.getPythonType()
-    if pythonType is not None:
-        if isinstance(pythonType, basestring):
-            pythonType = doImport(pythonType)
+    pythonType = butlerLocation.getResolvedPythonType()
     results = []
-    additionalData = butlerLocation.getAdditionalData()
+    kwds = {}
+    for name in ("hdu", "flags"):
+        if butlerLocation.hasAdditionalData(name):
+            kwds[name] = butlerLocation.getAdditionalData().getInt(name)
     for locationString in butlerLocation.getLocations():
         locStringWithRoot = os.path.join(butlerLocation.getStorage().root, locationString)
-        logLoc = LogicalLocation(locStringWithRoot, additionalData)
+        logLoc = _logicalLocation(locStringWithRoot, butlerLocation)
         if not os.path.exists(logLoc.locString()):
             raise RuntimeError("No such FITS catalog file: " + logLoc.locString())
-        kwds = {}
-        if additionalData.exists("hdu"):
-            kwds["hdu"] = additionalData.getInt("hdu")
-        if additionalData.exists("flags"):
-            kwds["flags"] = additionalData.getInt("flags")
         finalItem = pythonType.readFits(logLoc.locString(), **kwds)
         results.append(finalItem)
     return results
@@ -808,12 +990,11 @@ def writeFitsCatalogStorage(butlerLocation, obj):
     obj : object instance
         The object to be written.
     """
-    additionalData = butlerLocation.getAdditionalData()
     locations = butlerLocation.getLocations()
     with SafeFilename(os.path.join(butlerLocation.getStorage().root, locations[0])) as locationString:
-        logLoc = LogicalLocation(locationString, additionalData)
-        if additionalData.exists("flags"):
-            kwds = dict(flags=additionalData.getInt("flags"))
+        logLoc = _logicalLocation(locationString, butlerLocation)
+        if butlerLocation.hasAdditionalData("flags"):
+            kwds = dict(flags=butlerLocation.getAdditionalData().getInt("flags"))
         else:
             kwds = {}
         obj.writeFits(logLoc.locString(), **kwds)
@@ -846,10 +1027,9 @@ def writeMatplotlibStorage(butlerLocation, obj):
     obj : matplotlib.figure.Figure
         The object to be written.
     """
-    additionalData = butlerLocation.getAdditionalData()
     locations = butlerLocation.getLocations()
     with SafeFilename(os.path.join(butlerLocation.getStorage().root, locations[0])) as locationString:
-        logLoc = LogicalLocation(locationString, additionalData)
+        logLoc = _logicalLocation(locationString, butlerLocation)
         # SafeFilename appends a random suffix, which corrupts the extension
         # matplotlib uses to guess the file format.
         # Instead, we extract the extension from the original location
@@ -877,15 +1057,88 @@ def readPafStorage(butlerLocation):
     A list of objects as described by the butler location. One item for
     each location in butlerLocation.getLocations()
     """
+    import lsst.pex.policy as pexPolicy
     results = []
     for locationString in butlerLocation.getLocations():
-        logLoc = LogicalLocation(butlerLocation.getStorage().locationWithRoot(locationString),
-                                 butlerLocation.getAdditionalData())
+        logLoc = _logicalLocation(butlerLocation.getStorage().locationWithRoot(locationString),
+                                  butlerLocation)
         finalItem = pexPolicy.Policy.createPolicy(logLoc.locString())
         results.append(finalItem)
     return results
 
 
+def existsPosixFile(storage, butlerLocation):
+    """Check if any of the files of a butlerLocation exist, with one stat for each file.
+
+    A bracketed suffix of the location (e.g. the HDU of 'foo.fits[1]') is ignored and the file without it is
+    checked. Locations containing glob wildcards are searched for with PosixStorage.instanceSearch.
+
+    Parameters
+    ----------
+    storage : PosixStorage
+        The storage to look in. It is used instead of the storage of butlerLocation, which may be None.
+    butlerLocation : ButlerLocation
+        The location of the file(s) to check.
+
+    Returns
+    -------
+    bool
+        True if a file exists, else False.
+    """
+    for locationString in butlerLocation.getLocations():
+        path = _logicalLocation(locationString, butlerLocation).locString()
+        bracket = path.find('[')
+        if bracket != -1:
+            path = path[:bracket]
+        if _hasGlobMagic(path):
+            if storage.instanceSearch(path=path):
+                return True
+        elif os.path.lexists(storage.locationWithRoot(path)):
+            return True
+    return False
+
+
+def _hasGlobMagic(path):
+    """Test if a path contains glob wildcards."""
+    return '*' in path or '?' in path or '[' in path
+
+
+class _PlainLocation(object):
+    """Stands in for the LogicalLocation of a location string that has no substitutions."""
+
+    __slots__ = ('_locString',)
+
+    def __init__(self, locString):
+        self._locString = locString
+
+    def locString(self):
+        return self._locString
+
+
+def _logicalLocation(locationString, butlerLocation):
+    """Get the LogicalLocation of a location string of a butlerLocation.
+
+    Most location strings are fully expanded by the mapper, and LogicalLocation would return them unchanged;
+    for those (strings with no '%') a _PlainLocation is returned, and neither the LogicalLocation nor the
+    additionalData of the butlerLocation are made.
+
+    Parameters
+    ----------
+    locationString : string
+        The location string, which may contain '%(key)' substitutions from the additionalData.
+    butlerLocation : ButlerLocation
+        The location the string is from.
+
+    Returns
+    -------
+    LogicalLocation or _PlainLocation
+        An object whose locString method returns the expanded location string.
+    """
+    if '%' not in locationString:
+        return _PlainLocation(locationString)
+    return LogicalLocation(locationString, butlerLocation.getAdditionalData())
+
+
 def readYamlStorage(butlerLocation):
     """Read an object from a YAML file specified by a butlerLocation.
 
@@ -901,8 +1154,8 @@ def readYamlStorage(butlerLocation):
     """
     results = []
     for locationString in butlerLocation.getLocations():
-        logLoc = LogicalLocation(butlerLocation.getStorage().locationWithRoot(locationString),
-                                 butlerLocation.getAdditionalData())
+        logLoc = _logicalLocation(butlerLocation.getStorage().locationWithRoot(locationString),
+                                  butlerLocation)
         if not os.path.exists(logLoc.locString()):
             raise RuntimeError("No such YAML file: " + logLoc.locString())
         # Butler Gen2 repository configurations are handled specially
@@ -920,14 +1173,16 @@ def readYamlStorage(butlerLocation):
     return results
 
 
-PosixStorage.registerFormatters("FitsStorage", readFitsStorage, writeFitsStorage)
-PosixStorage.registerFormatters("ParquetStorage", readParquetStorage, writeParquetStorage)
-PosixStorage.registerFormatters("ConfigStorage", readConfigStorage, writeConfigStorage)
-PosixStorage.registerFormatters("PickleStorage", readPickleStorage, writePickleStorage)
-PosixStorage.registerFormatters("FitsCatalogStorage", readFitsCatalogStorage, writeFitsCatalogStorage)
-PosixStorage.registerFormatters("MatplotlibStorage", readMatplotlibStorage, writeMatplotlibStorage)
-PosixStorage.registerFormatters("PafStorage", readFormatter=readPafStorage)
-PosixStorage.registerFormatters("YamlStorage", readYamlStorage, writeYamlStorage)
+PosixStorage.registerFormatters("FitsStorage", readFitsStorage, writeFitsStorage, existsPosixFile)
+PosixStorage.registerFormatters("ParquetStorage", readParquetStorage, writeParquetStorage, existsPosixFile)
+PosixStorage.registerFormatters("ConfigStorage", readConfigStorage, writeConfigStorage, existsPosixFile)
+PosixStorage.registerFormatters("PickleStorage", readPickleStorage, writePickleStorage, existsPosixFile)
+PosixStorage.registerFormatters("FitsCatalogStorage", readFitsCatalogStorage, writeFitsCatalogStorage,
+                                existsPosixFile)
+PosixStorage.registerFormatters("MatplotlibStorage", readMatplotlibStorage, writeMatplotlibStorage,
+                                existsPosixFile)
+PosixStorage.registerFormatters("PafStorage", readFormatter=readPafStorage, existsFormatter=existsPosixFile)
+PosixStorage.registerFormatters("YamlStorage", readYamlStorage, writeYamlStorage, existsPosixFile)
 
 Storage.registerStorageClass(scheme='', cls=PosixStorage)
 Storage.registerStorageClass(scheme='file', cls=PosixStorage)
@@ -39,7 +39,6 @@ from builtins import super
 import copy
 from . import fsScanner, sequencify
 import os
-import astropy.io.fits
 import re
 import yaml
 
@@ -54,12 +53,31 @@ except ImportError:
     except ImportError:
         haveSqlite3 = False
 
-# PostgreSQL support
-try:
-    import psycopg2 as pgsql
-    havePgsql = True
-except ImportError:
-    havePgsql = False
+# PostgreSQL support. psycopg2 is imported by _importPgsql when a PgsqlRegistry is first used, not when this
+# module is imported; havePgsql (a module attribute computed on first access) tells if it can be imported.
+_pgsql = None
+
+
+def _importPgsql():
+    """Import and return the psycopg2 module, or None if it can not be imported."""
+    global _pgsql
+    if _pgsql is None:
+        try:
+            import psycopg2
+            _pgsql = psycopg2
+        except ImportError:
+            _pgsql = False
+    return _pgsql or None
+
+
+def __getattr__(name):
+    if name == 'havePgsql':
+        return _importPgsql() is not None
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+# Connections inherited from the parent process by registries reopened after a fork.
+_inheritedConnections = []
 
 
 class Registry(object):
@@ -71,6 +89,11 @@ class Registry(object):
     def __del__(self):
         pass
 
+    def afterFork(self):
+        """Make the registry usable in a child process after a fork, e.g. by reopening its database
+        connection. The base class does nothing."""
+        pass
+
     @staticmethod
     def create(location):
         """Create a registry object of an appropriate type.
@@ -265,6 +288,7 @@ class PosixRegistry(Registry):
         :param dataId:
         :return:
         """
+        import astropy.io.fits
         try:
             hdulist = astropy.io.fits.open(filepath, memmap=True)
         except IOError:
@@ -323,6 +347,25 @@ class SqlRegistry(Registry):
             self.conn.close()
         super().__del__()
 
+    def afterFork(self):
+        """Reopen the database connection in a child process after a fork.
+
+        A connection can not be used by two processes. The connection inherited from the parent is kept
+        open but not used: closing it could end the parent's database session. Registries that can not open
+        a new connection (see `_connect`) keep using the inherited one.
+        """
+        if self.conn:
+            conn = self._connect()
+            if conn is not None:
+                _inheritedConnections.append(self.conn)
+                self.conn = conn
+
+    def _connect(self):
+        """Open a new connection to the database of this registry, or return None if this registry does not
+        know how to (the base class, which is given its connection, does not).
+        """
+        return None
+
     def lookup(self, lookupProperties, reference, dataId, **kwargs):
         """Perform a lookup in the registry.
 
@@ -416,13 +459,17 @@ class SqliteRegistry(SqlRegistry):
             Path to SQLite3 file
         """
         if os.path.exists(location):
-            conn = sqlite3.connect(location)
-            conn.text_factory = str
             self.root = location
+            conn = self._connect()
         else:
             conn = None
         SqlRegistry.__init__(self, conn)
 
+    def _connect(self):
+        conn = sqlite3.connect(self.root)
+        conn.text_factory = str
+        return conn
+
 
 class PgsqlRegistry(SqlRegistry):
     """A PostgreSQL-based registry"""
@@ -436,15 +483,19 @@ class PgsqlRegistry(SqlRegistry):
         location : `str`
             Path to PostgreSQL configuration file.
         """
-        if not havePgsql:
+        if _importPgsql() is None:
             raise RuntimeError("Cannot use PgsqlRegistry: could not import psycopg2")
-        config = self.readYaml(location)
-        self._config = config
-        conn = pgsql.connect(host=config["host"], port=config["port"], database=config["database"],
-                             user=config["user"], password=config["password"])
+        self._config = self.readYaml(location)
+        conn = self._connect()
         self.root = location
         SqlRegistry.__init__(self, conn)
 
+    def _connect(self):
+        config = self._config
+        pgsql = _importPgsql()
+        return pgsql.connect(host=config["host"], port=config["port"], database=config["database"],
+                             user=config["user"], password=config["password"])
+
     @staticmethod
     def readYaml(location):
         """Read YAML configuration file
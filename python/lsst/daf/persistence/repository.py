@@ -24,11 +24,14 @@
 from past.builtins import basestring
 from builtins import object
 
+import collections
 import copy
 import inspect
 import os
+import threading
+import weakref
 
-from lsst.daf.persistence import Storage, listify, doImport, Policy
+from lsst.daf.persistence import Storage, listify, doImport, Policy, InitProfile, resetAfterFork
 
 
 class RepositoryArgs(object):
@@ -128,28 +131,48 @@ class Repository(object):
     """Represents a repository of persisted data and has methods to access that data.
     """
 
-    def __init__(self, repoData):
+    shareMappers = False
+    """If True, Repositories (in any Butler in this process) that would instantiate the same mapper class
+    with the same mapperArgs, root, parent registry and RepositoryCfg share one mapper instance, for as long
+    as any of them uses it. Mappers must not be modified after they are created for this to be safe.
+    """
+
+    _mapperMemo = weakref.WeakValueDictionary()
+    _mapperMemoLock = threading.RLock()
+
+    def __init__(self, repoData, profile=None):
         """Initialize a Repository with parameters input via RepoData.
 
         Parameters
         ----------
         repoData : RepoData
             Object that contains the parameters with which to init the Repository.
+        profile : InitProfile, optional
+            Records the time taken by each phase of initializing the Repository.
         """
-        self._storage = Storage.makeFromURI(repoData.cfg.root)
+        if profile is None:
+            profile = InitProfile(enabled=False)
+        root = repoData.cfg.root
+        with profile.timer('storage', root):
+            self._storage = Storage.makeFromURI(repoData.cfg.root)
         if repoData.cfg.dirty and not repoData.isV1Repository and repoData.cfgOrigin != 'nested':
-            self._storage.putRepositoryCfg(repoData.cfg, repoData.cfgRoot)
+            with profile.timer('cfgWrite', root):
+                self._storage.putRepositoryCfg(repoData.cfg, repoData.cfgRoot)
         self._mapperArgs = repoData.cfg.mapperArgs  # keep for reference in matchesArgs
-        self._initMapper(repoData)
+        self._initMapper(repoData, profile)
 
-    def _initMapper(self, repoData):
+    def _initMapper(self, repoData, profile=None):
         '''Initialize and keep the mapper in a member var.
 
         Parameters
         ----------
         repoData : RepoData
             The RepoData with the properties of this Repository.
+        profile : InitProfile, optional
+            Records the time taken to import and instantiate the mapper.
         '''
+        if profile is None:
+            profile = InitProfile(enabled=False)
 
         # rule: If mapper is:
         # - an object: use it as the mapper.
@@ -159,7 +182,8 @@ class Repository(object):
 
         # if mapper is a string, import it:
         if isinstance(mapper, basestring):
-            mapper = doImport(mapper)
+            with profile.timer('mapperImport', repoData.cfg.root):
+                mapper = doImport(mapper)
         # now if mapper is a class type (not instance), instantiate it:
         if inspect.isclass(mapper):
             mapperArgs = copy.copy(repoData.cfg.mapperArgs)
@@ -167,11 +191,58 @@ class Repository(object):
                 mapperArgs = {}
             if 'root' not in mapperArgs:
                 mapperArgs['root'] = repoData.cfg.root
-            mapper = mapper(parentRegistry=repoData.parentRegistry,
-                            repositoryCfg=repoData.cfg,
-                            **mapperArgs)
+            with profile.timer('mapperInit', repoData.cfg.root):
+                mapper = self._makeMapper(mapper, mapperArgs, repoData)
         self._mapper = mapper
 
+    @classmethod
+    def _makeMapper(cls, mapperClass, mapperArgs, repoData):
+        """Instantiate a mapper, or get the shared instance made with the same arguments if `shareMappers`
+        is True.
+
+        Parameters
+        ----------
+        mapperClass : class object
+            The mapper class.
+        mapperArgs : dict
+            The arguments for the mapper, including root.
+        repoData : RepoData
+            The RepoData with the properties of this Repository.
+
+        Returns
+        -------
+        Mapper
+            The mapper.
+        """
+        def make():
+            return mapperClass(parentRegistry=repoData.parentRegistry,
+                               repositoryCfg=repoData.cfg,
+                               **mapperArgs)
+        if not cls.shareMappers:
+            return make()
+        parentRegistry = repoData.parentRegistry
+        try:
+            hash(parentRegistry)
+        except TypeError:
+            parentRegistry = id(parentRegistry)
+        key = (mapperClass, repr(sorted(mapperArgs.items())), mapperArgs.get('root'), parentRegistry,
+               repr(repoData.cfg))
+        with cls._mapperMemoLock:
+            mapper = cls._mapperMemo.get(key)
+            if mapper is None:
+                mapper = make()
+                try:
+                    cls._mapperMemo[key] = mapper
+                except TypeError:
+                    pass  # the mapper can not be weakly referenced, so it is not shared.
+        return mapper
+
+    @classmethod
+    def clearMapperMemo(cls):
+        """Stop sharing the mappers that have been made so far; later Repositories make new ones."""
+        with cls._mapperMemoLock:
+            cls._mapperMemo.clear()
+
     # todo want a way to make a repository read-only
     def write(self, butlerLocation, obj):
         """Write a dataset to Storage.
@@ -306,3 +377,55 @@ class Repository(object):
             return butlerLocationStorage.exists(location)
         else:
             return self._storage.exists(location)
+
+    def existsAll(self, locations):
+        """Check if all of a group of locations exist in storage.
+
+        Locations are grouped by storage so that each storage checks its locations in one call.
+
+        Parameters
+        ----------
+        locations : list of ButlerLocation
+            Describe the locations in storage to look for.
+
+        Returns
+        -------
+        bool
+            True if every location exists, False as soon as one is found that does not.
+        """
+        byStorage = collections.OrderedDict()
+        for location in locations:
+            storage = location.getStorage() or self._storage
+            byStorage.setdefault(id(storage), (storage, []))[1].append(location)
+        for storage, storageLocations in byStorage.values():
+            if not storage.existsAll(storageLocations):
+                return False
+        return True
+
+    def existsMany(self, locations):
+        """Check which of a group of locations exist in storage.
+
+        Locations are grouped by storage so that each storage checks its locations in one call.
+
+        Parameters
+        ----------
+        locations : list of ButlerLocation
+            Describe the locations in storage to look for.
+
+        Returns
+        -------
+        list of bool
+            For each location, True if it exists, else False.
+        """
+        byStorage = collections.OrderedDict()
+        for index, location in enumerate(locations):
+            storage = location.getStorage() or self._storage
+            byStorage.setdefault(id(storage), (storage, []))[1].append(index)
+        results = [False] * len(locations)
+        for storage, indices in byStorage.values():
+            for index, exists in zip(indices, storage.existsMany([locations[i] for i in indices])):
+                results[index] = exists
+        return results
+
+
+resetAfterFork(Repository, '_mapperMemoLock', threading.RLock)
@@ -27,9 +27,30 @@ from contextlib import contextmanager
 import errno
 import fcntl
 import filecmp
+import hashlib
 import os
 import tempfile
+import sys
+import threading
 from lsst.log import Log
+from .utils import resetAfterFork
+
+_umask = None
+_umaskLock = threading.Lock()
+
+# Directories that safeMakeDir has created or found to exist.
+_knownDirectories = set()
+_knownDirectoriesLock = threading.Lock()
+
+DURABILITY_POLICIES = ("none", "file", "file+dir")
+_durability = "none"
+_batchDirectorySync = False
+# Directories with renamed files that have not been synced yet, when directory syncs are batched.
+_unsyncedDirectories = set()
+_unsyncedDirectoriesLock = threading.Lock()
+
+for _lockName in ("_umaskLock", "_knownDirectoriesLock", "_unsyncedDirectoriesLock"):
+    resetAfterFork(sys.modules[__name__], _lockName, threading.Lock)
 
 
 class DoNotWrite(RuntimeError):
@@ -37,30 +58,259 @@ class DoNotWrite(RuntimeError):
 
 
 def safeMakeDir(directory):
-    """Make a directory in a manner avoiding race conditions"""
-    if directory != "" and not os.path.exists(directory):
+    """Make a directory in a manner avoiding race conditions
+
+    The directory is remembered, so that the safe file context managers in this module do not check it
+    again before writing to it; they make it again if it turns out to have been removed.
+    """
+    if directory == "":
+        return
+    if not os.path.exists(directory):
         try:
             os.makedirs(directory)
         except OSError as e:
             # Don't fail if directory exists due to race
             if e.errno != errno.EEXIST:
                 raise e
+    with _knownDirectoriesLock:
+        _knownDirectories.add(directory)
+
+
+def forgetDirectories(directory=None):
+    """Forget that directories exist, so that they are checked again before they are written to.
+
+    Parameters
+    ----------
+    directory : string, optional
+        The directory to forget, or None to forget all directories.
+    """
+    with _knownDirectoriesLock:
+        if directory is None:
+            _knownDirectories.clear()
+        else:
+            _knownDirectories.discard(directory)
+
+
+def _createInDirectory(directory, create, *args, **kwargs):
+    """Call create(*args, **kwargs) to create or open a file for writing in directory, and return its result.
+
+    The directory is made first unless it is remembered to exist, without checking it. If it was removed
+    after it was remembered, it is made again and the file is created again.
+    """
+    if directory not in _knownDirectories:
+        safeMakeDir(directory)
+    try:
+        return create(*args, **kwargs)
+    except (IOError, OSError) as e:
+        if e.errno != errno.ENOENT:
+            raise e
+    forgetDirectories(directory)
+    safeMakeDir(directory)
+    return create(*args, **kwargs)
+
+
+def _makeTempFile(outDir, outName):
+    """Make a temporary file next to the file at outDir/outName, creating outDir if needed."""
+    return _createInDirectory(outDir, tempfile.NamedTemporaryFile, mode="w", dir=outDir, prefix=outName,
+                              delete=False)
+
+
+def getUmask():
+    """Get the process umask.
+
+    The umask can only be read by setting it and then reverting to the original, which is racy when other
+    threads create files, so it is read once and remembered. Call `resetUmask` after changing the umask.
+    """
+    global _umask
+    with _umaskLock:
+        if _umask is None:
+            _umask = os.umask(0o077)
+            os.umask(_umask)
+        return _umask
+
+
+def resetUmask():
+    """Forget the umask remembered by `getUmask`, so that it is read again."""
+    global _umask
+    with _umaskLock:
+        _umask = None
+
+
+def getFileMode():
+    """Get the mode of new files according to the user's umask"""
+    return ~getUmask() & 0o666
 
 
 def setFileMode(filename):
     """Set a file mode according to the user's umask"""
-    # Get the current umask, which we can only do by setting it and then reverting to the original.
-    umask = os.umask(0o077)
-    os.umask(umask)
     # chmod the new file to match what it would have been if it hadn't started life as a temporary
     # file (which have more restricted permissions).
-    os.chmod(filename, (~umask & 0o666))
+    os.chmod(filename, getFileMode())
+
+
+def setDurability(policy, batchDirectorySync=False):
+    """Set how the files written by the safe file context managers in this module survive crashes.
+
+    The policies are:
+
+    - "none": files are renamed into place without syncing (the default); a crash of the node may lose
+      files, or leave them empty.
+    - "file": the contents of each file are synced to storage before it is renamed into place.
+    - "file+dir": as "file", and the directory is also synced after the rename, so the file can be found
+      after a crash.
+
+    Parameters
+    ----------
+    policy : string
+        One of DURABILITY_POLICIES.
+    batchDirectorySync : bool, optional
+        With the "file+dir" policy, do not sync directories after each rename but remember them, and sync
+        each directory once when `syncDirectories` is called (e.g. by `Butler.flush`). Files are only crash
+        safe after that.
+    """
+    global _durability, _batchDirectorySync
+    if policy not in DURABILITY_POLICIES:
+        raise RuntimeError("Unknown durability policy {}, must be one of {}".format(policy,
+                                                                                    DURABILITY_POLICIES))
+    _durability = policy
+    _batchDirectorySync = batchDirectorySync
+    if policy != "file+dir" or not batchDirectorySync:
+        syncDirectories()
+
+
+def getDurability():
+    """Get the durability policy and whether directory syncs are batched, as set by `setDurability`.
+
+    Returns
+    -------
+    tuple
+        The policy and the batchDirectorySync flag.
+    """
+    return _durability, _batchDirectorySync
+
+
+def syncDirectories():
+    """Sync the directories of the files renamed into place since the last call, once each, when directory
+    syncs are batched (see `setDurability`)."""
+    with _unsyncedDirectoriesLock:
+        directories = list(_unsyncedDirectories)
+        _unsyncedDirectories.clear()
+    for directory in directories:
+        _fsyncDirectory(directory)
+
+
+def _syncFile(temp):
+    """Sync the contents of a file object, or the file at a path, if the durability policy requires it."""
+    if _durability == "none":
+        return
+    if isinstance(temp, str):
+        fd = os.open(temp, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    else:
+        temp.flush()
+        os.fsync(temp.fileno())
+
+
+def _syncDirectory(directory):
+    """Sync (or remember to sync) the directory of a file that was renamed into place, if the durability
+    policy requires it."""
+    if _durability != "file+dir":
+        return
+    if _batchDirectorySync:
+        with _unsyncedDirectoriesLock:
+            _unsyncedDirectories.add(directory)
+    else:
+        _fsyncDirectory(directory)
+
+
+def _fsyncDirectory(directory):
+    fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
 
 class FileForWriteOnceCompareSameFailure(RuntimeError):
     pass
 
 
+# The extended attribute that holds the digest of a file written by FileForWriteOnceCompareSame.
+_digestAttribute = "user.lsst.daf.persistence.sha256"
+
+
+class _DigestingFile(object):
+    """File object wrapper that computes the sha256 digest of the text written to a file while it is written.
+
+    If the file is used in any way other than writing text to it (e.g. through its name, fileno or buffer,
+    which writers that open the file themselves use), the digest can not be known, and `digest` returns None.
+    """
+
+    _passThrough = frozenset(("closed", "mode", "encoding", "flush", "close", "tell", "writable",
+                              "__enter__", "__exit__"))
+
+    def __init__(self, fileObj):
+        self._file = fileObj
+        self._hash = hashlib.sha256()
+        self._valid = True
+
+    def write(self, data):
+        self._hash.update(data.encode(self._file.encoding) if isinstance(data, str) else data)
+        return self._file.write(data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def __getattr__(self, name):
+        if name not in self._passThrough:
+            self._valid = False
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        self._valid = False
+        return iter(self._file)
+
+    def digest(self):
+        """Get the hex digest of the data written, or None if it is not known."""
+        return self._hash.hexdigest() if self._valid else None
+
+
+def _setDigest(fd, digest):
+    """Store the digest of a file in an extended attribute of the file, if the filesystem supports it."""
+    if digest is None or not hasattr(os, "setxattr"):
+        return
+    try:
+        os.setxattr(fd, _digestAttribute, digest.encode("ascii"))
+    except OSError:
+        pass
+
+
+def _getDigest(name):
+    """Get the digest of a file stored by _setDigest, or None if there is none."""
+    if not hasattr(os, "getxattr"):
+        return None
+    try:
+        return os.getxattr(name, _digestAttribute).decode("ascii")
+    except OSError:
+        return None
+
+
+def _filesMatch(tempName, digest, name):
+    """Test if the file at tempName, whose digest is digest (or None if unknown), matches the file at name.
+
+    If the file at name has a stored digest the files are compared by size and digest, without reading the
+    file at name; otherwise they are compared byte by byte.
+    """
+    existingDigest = _getDigest(name) if digest is not None else None
+    if existingDigest is not None:
+        return os.path.getsize(tempName) == os.path.getsize(name) and digest == existingDigest
+    return filecmp.cmp(tempName, name, shallow=False)
+
+
 @contextmanager
 def FileForWriteOnceCompareSame(name):
     """Context manager to get a file that can be written only once and all other writes will succeed only if
@@ -70,14 +320,29 @@ def FileForWriteOnceCompareSame(name):
     the permanent file if the file at name does not already exist. If the file at name does exist the
     temporary file is compared to the file at name. If they are the same then this is good and the temp file
     is silently thrown away. If they are not the same then a runtime error is raised.
+
+    A digest of the data is computed while it is written and stored with the file (in an extended attribute,
+    where the filesystem supports them), so that later writes of the same file can be compared with it
+    without reading it again.
     """
     outDir, outName = os.path.split(name)
-    safeMakeDir(outDir)
-    temp = tempfile.NamedTemporaryFile(mode="w", dir=outDir, prefix=outName, delete=False)
+    temp = _makeTempFile(outDir, outName)
+    digestingTemp = _DigestingFile(temp)
     try:
-        yield temp
+        yield digestingTemp
     finally:
+        digest = digestingTemp.digest()
         try:
+            # Set permissions according to the current umask before the file can be seen at name.
+            if temp.closed:
+                os.chmod(temp.name, getFileMode())
+                _setDigest(temp.name, digest)
+                _syncFile(temp.name)
+            else:
+                temp.flush()
+                os.fchmod(temp.fileno(), getFileMode())
+                _setDigest(temp.fileno(), digest)
+                _syncFile(temp)
             temp.close()
             # If the symlink cannot be created then it will raise. If it can't be created because a file at
             # 'name' already exists then we'll do a compare-same check.
@@ -85,13 +350,11 @@ def FileForWriteOnceCompareSame(name):
             # If the symlink was created then this is the process that created the first instance of the
             # file, and we know its contents match. Move the temp file over the symlink.
             os.rename(temp.name, name)
-            # At this point, we know the file has just been created. Set permissions according to the
-            # current umask.
-            setFileMode(name)
+            _syncDirectory(outDir)
         except OSError as e:
             if e.errno != errno.EEXIST:
                 raise e
-            filesMatch = filecmp.cmp(temp.name, name, shallow=False)
+            filesMatch = _filesMatch(temp.name, digest, name)
             os.remove(temp.name)
             if filesMatch:
                 # if the files match then the compare-same check succeeded and we can silently return.
@@ -111,17 +374,18 @@ def SafeFile(name):
     leakage.
     """
     outDir, outName = os.path.split(name)
-    safeMakeDir(outDir)
     doWrite = True
-    with tempfile.NamedTemporaryFile(mode="w", dir=outDir, prefix=outName, delete=False) as temp:
+    with _makeTempFile(outDir, outName) as temp:
         try:
             yield temp
         except DoNotWrite:
             doWrite = False
         finally:
             if doWrite:
+                os.fchmod(temp.fileno(), getFileMode())
+                _syncFile(temp)
                 os.rename(temp.name, name)
-                setFileMode(name)
+                _syncDirectory(outDir)
 
 
 @contextmanager
@@ -133,15 +397,18 @@ def SafeFilename(name):
     file into the desired place.
     """
     outDir, outName = os.path.split(name)
-    safeMakeDir(outDir)
-    temp = tempfile.NamedTemporaryFile(mode="w", dir=outDir, prefix=outName, delete=False)
+    temp = _makeTempFile(outDir, outName)
     tempName = temp.name
     temp.close()  # We don't use the fd, just want a filename
     try:
         yield tempName
     finally:
+        # The writer may have replaced the temporary file, so set the permissions by name, before the file
+        # can be seen at name.
+        os.chmod(tempName, getFileMode())
+        _syncFile(tempName)
         os.rename(tempName, name)
-        setFileMode(name)
+        _syncDirectory(outDir)
 
 
 @contextmanager
@@ -185,7 +452,6 @@ class SafeLockedFileForWrite:
         self.name = name
         self._readable = None
         self._writeable = None
-        safeMakeDir(os.path.split(name)[0])
 
     def __enter__(self):
         self.open()
@@ -195,7 +461,7 @@ class SafeLockedFileForWrite:
         self.close()
 
     def open(self):
-        self._fileHandle = open(self.name, 'a')
+        self._fileHandle = _createInDirectory(os.path.dirname(self.name), open, self.name, 'a')
         self.log.debug("Acquiring exclusive lock on {}".format(self.name))
         fcntl.flock(self._fileHandle, fcntl.LOCK_EX)
         self.log.debug("Acquired exclusive lock on {}".format(self.name))
@@ -227,3 +493,65 @@ class SafeLockedFileForWrite:
 
     def write(self, str):
         self.writeable.write(str)
+
+
+class SafeLockedFileForReplace:
+    """File-like object that is used to lock a file with an exclusive lock, read it, and replace it
+    atomically with new contents.
+
+    The file is replaced by renaming a new file over it, so readers that do not lock the file always see
+    either the complete old contents or the complete new contents. Because the replacement is a new file,
+    a lock holder makes sure it locked the file that is currently at the name, and not one that was replaced
+    while it waited for the lock. The file is created (empty) if it does not exist.
+
+    Contains __enter__ and __exit__ functions so this can be used by a context manager.
+    """
+    def __init__(self, name):
+        self.log = Log.getLogger("daf.persistence.butler")
+        self.name = name
+        self._fileHandle = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def open(self):
+        while True:
+            fileHandle = _createInDirectory(os.path.dirname(self.name), open, self.name, 'a')
+            self.log.debug("Acquiring exclusive lock on {}".format(self.name))
+            fcntl.flock(fileHandle, fcntl.LOCK_EX)
+            try:
+                current = os.stat(self.name).st_ino
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    fileHandle.close()
+                    raise e
+                current = None
+            if current == os.fstat(fileHandle.fileno()).st_ino:
+                break
+            # The file was replaced while this waited for the lock; lock the new one.
+            fileHandle.close()
+        self._fileHandle = fileHandle
+        self.log.debug("Acquired exclusive lock on {}".format(self.name))
+
+    def close(self):
+        self.log.debug("Releasing exclusive lock on {}".format(self.name))
+        self._fileHandle.close()
+
+    def read(self):
+        with open(self.name, 'r') as f:
+            return f.read()
+
+    def replace(self, data):
+        """Replace the file with a new file that contains data.
+
+        Parameters
+        ----------
+        data : string
+            The new contents of the file.
+        """
+        with SafeFile(self.name) as f:
+            f.write(data)
@@ -0,0 +1,270 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""This module defines the SharedCache class, a cache of read-only datasets that is shared by the processes
+running on a node.
+"""
+
+import glob
+import hashlib
+import mmap
+import os
+import pickle
+import stat
+import struct
+import tempfile
+
+from lsst.log import Log
+
+__all__ = ["SharedCache"]
+
+
+class SharedCache(object):
+    """A node-local cache of the objects read by storage formatters, shared by all the processes on the node.
+
+    Each cached object is pickled into its own file in a directory that should be on a memory-backed
+    filesystem (by default under /dev/shm). Large binary payloads (e.g. the data of numpy arrays) are stored
+    out-of-band, with pickle protocol 5 where it is available, and when the object is read the file is
+    memory mapped so those payloads are used in place: one copy of the data is shared by every process that
+    reads it. Objects read from the cache must be treated as read-only; numpy arrays are returned read-only.
+
+    Only the storages named in ``storageNames`` are cached, and by default that is only 'PickleStorage'.
+    Other storages, e.g. the 'FitsStorage' and 'FitsCatalogStorage' of afw images and catalogs, must be
+    opted in by naming them, as in ``SharedCache(storageNames=['PickleStorage', 'FitsStorage'])``. They are
+    not cached by default because the cache only saves memory for objects whose large payloads pickle
+    out-of-band with protocol 5; objects that pickle their pixels in-band (or not at all) would be copied
+    into each process that reads them, so check that the types of a storage do before naming it.
+
+    Each location has one cache file, which records the storage's modification token for the files the
+    object was read from (see `StorageInterface.getModificationToken`). When a dataset is rewritten its
+    cache file is out of date; it is replaced the next time the dataset is read. The cache files are kept
+    within a byte budget by removing the least recently used ones. Use `clear` to remove all the cache files.
+
+    The cache files are unpickled, so the directory must only be writable by the user: if it is not a
+    directory owned by the user with mode 0700 (e.g. another user created it first), the cache is disabled
+    and every object is read with its formatter.
+
+    Parameters
+    ----------
+    directory : string, optional
+        The directory to keep the cache files in. Defaults to a per-user directory in /dev/shm.
+    storageNames : list of string, optional
+        The storage names (e.g. 'PickleStorage', 'FitsStorage') of the datasets that are cached. Defaults to
+        'PickleStorage' only. Objects that can not be pickled are never cached.
+    maxObjectBytes : int, optional
+        Objects whose pickled size is larger than this are not cached.
+    maxBytes : int, optional
+        The maximum total size of the cache files, in bytes. Defaults to a quarter of the size of the
+        filesystem the directory is on; a memory-backed filesystem uses RAM.
+    """
+
+    _magic = b'DPSC\x02'
+    _alignment = 64
+
+    def __init__(self, directory=None, storageNames=('PickleStorage',), maxObjectBytes=None, maxBytes=None):
+        if directory is None:
+            directory = os.path.join('/dev/shm', 'daf_persistence-{}'.format(os.getuid()))
+        self.directory = directory
+        self.storageNames = frozenset(storageNames)
+        self.maxObjectBytes = maxObjectBytes
+        self.log = Log.getLogger("daf.persistence.butler")
+        self.enabled = self._makeDirectory()
+        if maxBytes is None and self.enabled:
+            fsStat = os.statvfs(self.directory)
+            maxBytes = fsStat.f_frsize * fsStat.f_blocks // 4
+        self.maxBytes = maxBytes
+
+    def _makeDirectory(self):
+        """Create the cache directory if needed, and check that only this user can write to it.
+
+        Returns
+        -------
+        bool
+            True if the directory can be used, else False.
+        """
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            dirStat = os.lstat(self.directory)
+        except OSError as e:
+            self.log.warn("Not using shared cache directory %s: %s", self.directory, e)
+            return False
+        if not stat.S_ISDIR(dirStat.st_mode) or dirStat.st_uid != os.getuid() or \
+                stat.S_IMODE(dirStat.st_mode) != 0o700:
+            self.log.warn("Not using shared cache directory %s: it must be a directory (not a symlink) owned "
+                          "by this user with mode 0700", self.directory)
+            return False
+        return True
+
+    def __repr__(self):
+        return "SharedCache(directory=%r, storageNames=%r)" % (self.directory, sorted(self.storageNames))
+
+    def read(self, storage, butlerLocation, readFormatter):
+        """Read the object(s) at a location from the cache, or with a formatter and add them to the cache.
+
+        Parameters
+        ----------
+        storage : StorageInterface
+            The storage the location is in.
+        butlerLocation : ButlerLocation
+            The location of the object(s) to read.
+        readFormatter : callable
+            The formatter used to read the location when it is not in the cache.
+
+        Returns
+        -------
+        object
+            The result of the formatter.
+        """
+        if not self.enabled or butlerLocation.getStorageName() not in self.storageNames:
+            return readFormatter(butlerLocation)
+        token = storage.getModificationToken(butlerLocation)
+        if token is None:
+            return readFormatter(butlerLocation)
+        key = repr((butlerLocation.getStorageName(), tuple(butlerLocation.getLocations()), str(storage),
+                    butlerLocation.describeAdditionalData()))
+        path = os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pickle')
+        tokenBytes = repr(token).encode('utf-8')
+        try:
+            return self._load(path, tokenBytes)
+        except (FileNotFoundError, _StaleCacheFile):
+            pass
+        except Exception as e:
+            self.log.warn("Could not read shared cache file %s, reading %s instead: %s",
+                          path, butlerLocation, e)
+        obj = readFormatter(butlerLocation)
+        self._save(path, tokenBytes, obj)
+        return obj
+
+    def clear(self):
+        """Remove all the cache files."""
+        for path in glob.glob(os.path.join(self.directory, '*.pickle')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _save(self, path, tokenBytes, obj):
+        buffers = []
+        try:
+            if pickle.HIGHEST_PROTOCOL >= 5:
+                data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+                buffers = [buf.raw() for buf in buffers]
+            else:
+                data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            self.log.debug("Not caching object that can not be pickled: %s", e)
+            return
+        chunks = [memoryview(data)] + buffers
+        size = sum(chunk.nbytes for chunk in chunks)
+        if self.maxObjectBytes is not None and size > self.maxObjectBytes:
+            return
+        if self.maxBytes is not None and size > self.maxBytes:
+            return
+        header = self._magic + struct.pack('<Q', len(tokenBytes)) + tokenBytes + \
+            struct.pack('<Q', len(chunks)) + \
+            struct.pack('<%dQ' % len(chunks), *[chunk.nbytes for chunk in chunks])
+        fd, tmpPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                for chunk in chunks:
+                    f.write(b'\0' * (-f.tell() % self._alignment))
+                    f.write(chunk)
+            # The rename is atomic, so other processes see either no file or the complete file.
+            os.rename(tmpPath, path)
+        except (OSError, IOError) as e:
+            self.log.debug("Could not write shared cache file %s: %s", path, e)
+            try:
+                os.remove(tmpPath)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self):
+        """Remove the least recently used cache files until the cache is within its byte budget."""
+        if self.maxBytes is None:
+            return
+        files = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.pickle'):
+                        continue
+                    try:
+                        entryStat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    files.append((entryStat.st_mtime_ns, entryStat.st_size, entry.path))
+                    total += entryStat.st_size
+        except OSError as e:
+            self.log.debug("Could not list shared cache directory %s: %s", self.directory, e)
+            return
+        if total <= self.maxBytes:
+            return
+        # Files are touched when they are read, so the oldest modification time is the least recently used.
+        for mtime, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.maxBytes:
+                break
+
+    def _load(self, path, tokenBytes):
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        offset = len(self._magic)
+        if view[:offset] != self._magic:
+            raise IOError("Not a shared cache file: {}".format(path))
+        tokenSize, = struct.unpack_from('<Q', view, offset)
+        offset += 8
+        if view[offset:offset + tokenSize] != tokenBytes:
+            raise _StaleCacheFile(path)
+        offset += tokenSize
+        count, = struct.unpack_from('<Q', view, offset)
+        offset += 8
+        sizes = struct.unpack_from('<%dQ' % count, view, offset)
+        offset += 8 * count
+        chunks = []
+        for size in sizes:
+            offset += -offset % self._alignment
+            chunks.append(view[offset:offset + size])
+            offset += size
+        if chunks[1:]:
+            obj = pickle.loads(chunks[0], buffers=chunks[1:])
+        else:
+            obj = pickle.loads(chunks[0])
+        try:
+            # Mark the file as recently used, for eviction.
+            os.utime(path)
+        except OSError:
+            pass
+        return obj
+
+
+class _StaleCacheFile(Exception):
+    """Raised when a cache file was made from an older version of its dataset's files."""
+    pass
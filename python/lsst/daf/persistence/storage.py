@@ -24,8 +24,11 @@
 from __future__ import absolute_import
 
 from future import standard_library
+import copy
+import threading
 import urllib.parse
 from . import NoRepositroyAtRoot
+from .utils import resetAfterFork
 standard_library.install_aliases()
 
 
@@ -34,6 +37,11 @@ class Storage:
 
     storages = {}
 
+    # RepositoryCfgs read by any Storage instance in this process, by uri: (token, cfg). The token (see
+    # StorageInterface.getRepositoryCfgToken) is used to tell when the cached cfg is out of date.
+    _repositoryCfgCache = {}
+    _repositoryCfgCacheLock = threading.Lock()
+
     def __init__(self):
         self.repositoryCfgs = {}
 
@@ -78,19 +86,53 @@ class Storage:
 
         RepositoryCfgs are not supposed to change once they are created so this
         should not lead to stale data.
+
+        Cfgs are also cached for the whole process, so that other Storage
+        instances (e.g. those of other Butlers) do not read them again. A cfg
+        in the process cache is used only if the storage's token for the cfg
+        (e.g. the modification time of the cfg file) has not changed, and each
+        Storage instance gets its own copy of it.
         """
         cfg = self.repositoryCfgs.get(uri, None)
         if cfg:
             return cfg
         parseRes = urllib.parse.urlparse(uri)
         if parseRes.scheme in Storage.storages:
-            cfg = Storage.storages[parseRes.scheme].getRepositoryCfg(uri)
+            storageClass = Storage.storages[parseRes.scheme]
+            token = storageClass.getRepositoryCfgToken(uri)
+            if token is not None:
+                with Storage._repositoryCfgCacheLock:
+                    cached = Storage._repositoryCfgCache.get(uri)
+                if cached is not None and cached[0] == token:
+                    cfg = copy.deepcopy(cached[1])
+            if not cfg:
+                cfg = storageClass.getRepositoryCfg(uri)
+                if cfg and token is not None:
+                    with Storage._repositoryCfgCacheLock:
+                        Storage._repositoryCfgCache[uri] = (token, copy.deepcopy(cfg))
             if cfg:
                 self.repositoryCfgs[uri] = cfg
         else:
             raise RuntimeError("No storage registered for scheme %s" % parseRes.scheme)
         return cfg
 
+    @staticmethod
+    def clearRepositoryCfgCache(uri=None):
+        """Remove RepositoryCfgs from the process-wide cache used by getRepositoryCfg.
+
+        Cfgs already cached by Storage instances are not removed.
+
+        Parameters
+        ----------
+        uri : string, optional
+            The uri of the cfg to remove, or None to remove all the cfgs.
+        """
+        with Storage._repositoryCfgCacheLock:
+            if uri is None:
+                Storage._repositoryCfgCache.clear()
+            else:
+                Storage._repositoryCfgCache.pop(uri, None)
+
     @staticmethod
     def putRepositoryCfg(cfg, uri):
         """Write a RepositoryCfg object to a location described by uri"""
@@ -98,6 +140,7 @@ class Storage:
         parseRes = urllib.parse.urlparse(uri)
         if parseRes.scheme in Storage.storages:
             ret = Storage.storages[parseRes.scheme].putRepositoryCfg(cfg, uri)
+            Storage.clearRepositoryCfgCache(uri)
         else:
             raise RuntimeError("No storage registered for scheme %s" % parseRes.scheme)
         return ret
@@ -292,3 +335,6 @@ class Storage:
         if storage:
             return storage.storageExists(uri)
         return None
+
+
+resetAfterFork(Storage, '_repositoryCfgCacheLock', threading.Lock)
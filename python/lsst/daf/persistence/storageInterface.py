@@ -22,6 +22,16 @@
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
 from abc import ABCMeta, abstractmethod
+import collections
+
+
+Formatters = collections.namedtuple('Formatters', ['read', 'write', 'exists'])
+Formatters.__doc__ = """The formatters used by a StorageInterface subclass for a storage name and python type.
+
+Each item is the formatter callable, or None if there is no formatter of that kind. An exists formatter takes
+the StorageInterface instance that is checking and a ButlerLocation, and returns True if the object(s) at the
+location exist; if there is none the StorageInterface subclass uses its default check.
+"""
 
 
 class NoRepositroyAtRoot(RuntimeError):
@@ -82,6 +92,72 @@ class StorageInterface:
             cls._writeFormattersDict = {}
             return cls._writeFormattersDict
 
+    @classmethod
+    def _existsFormatters(cls):
+        """Getter for the container of exists formatters of a StorageInterface subclass.
+
+        Returns
+        -------
+        dict
+            The exists formatters container belonging to the class type.
+        """
+        try:
+            return cls._existsFormattersDict
+        except AttributeError:
+            cls._existsFormattersDict = {}
+            return cls._existsFormattersDict
+
+    @classmethod
+    def _formatterTable(cls):
+        """Getter for the table of resolved formatters of a StorageInterface subclass. The table is replaced
+        by an empty one when formatters are registered.
+
+        Returns
+        -------
+        dict
+            Formatters for each (storageName, pythonType) looked up with `getFormatters`.
+        """
+        try:
+            return cls._formatterTableDict
+        except AttributeError:
+            cls._formatterTableDict = {}
+            return cls._formatterTableDict
+
+    @classmethod
+    def getFormatters(cls, storageName, pythonType=None):
+        """Get the read, write and exists formatters for a storage name, or for a python type if none are
+        registered for the storage name.
+
+        The formatters are looked up once for each storage name and python type, and kept until formatters
+        are registered again.
+
+        Parameters
+        ----------
+        storageName : string
+            The storage name of a ButlerLocation, e.g. 'FitsStorage'.
+        pythonType : class type or string, optional
+            The python type of a ButlerLocation, used to find the formatters that are not registered for the
+            storage name.
+
+        Returns
+        -------
+        Formatters
+            The read, write and exists formatters; None for each kind that is not registered.
+        """
+        table = cls._formatterTable()
+        key = (storageName, pythonType)
+        formatters = table.get(key)
+        if formatters is None:
+            def lookup(registered):
+                formatter = registered.get(storageName)
+                if formatter is None and pythonType is not None:
+                    formatter = registered.get(pythonType)
+                return formatter
+            formatters = Formatters(lookup(cls._readFormatters()), lookup(cls._writeFormatters()),
+                                    lookup(cls._existsFormatters()))
+            table[key] = formatters
+        return formatters
+
     @classmethod
     def getReadFormatter(cls, objType):
         """Search in the registered formatters for the objType read formatter.
@@ -115,8 +191,8 @@ class StorageInterface:
         return cls._writeFormatters().get(objType, None)
 
     @classmethod
-    def registerFormatters(cls, formatable, readFormatter=None, writeFormatter=None):
-        """Register read and/or write formatters for a storageInterface subclass
+    def registerFormatters(cls, formatable, readFormatter=None, writeFormatter=None, existsFormatter=None):
+        """Register read, write and/or exists formatters for a storageInterface subclass
 
         Parameters
         ----------
@@ -130,12 +206,18 @@ class StorageInterface:
         writeFormatter : a write formatter callable
             The formatter function that can be used by the StorageInterface instance to write the object to
             the storage.
+        existsFormatter : an exists formatter callable
+            The function that can be used by the StorageInterface instance to check if the object exists in
+            the storage. It takes the StorageInterface instance and a ButlerLocation (whose own storage may
+            be None), and returns a bool. If none is registered the StorageInterface subclass uses its
+            default check.
 
         Raises
         ------
         RuntimeError
-            For each object type and StorageInterface subclass the read and write formatters should only be
-            registered once. If a second registration occurs for either a RuntimeError is raised.
+            For each object type and StorageInterface subclass the read, write and exists formatters should
+            only be registered once. If a second registration occurs for any of them a RuntimeError is
+            raised.
         """
         def register(formatable, formatter, formatters, storageInterface):
             if formatable in formatters:
@@ -149,6 +231,11 @@ class StorageInterface:
         if writeFormatter:
             formatters = cls._writeFormatters()
             register(formatable, writeFormatter, formatters, cls)
+        if existsFormatter:
+            formatters = cls._existsFormatters()
+            register(formatable, existsFormatter, formatters, cls)
+        # Replace (rather than clear) the table, so ButlerLocations can tell their formatters are out of date.
+        cls._formatterTableDict = {}
 
     @abstractmethod
     def write(self, butlerLocation, obj):
@@ -211,6 +298,86 @@ class StorageInterface:
             True if exists, else False.
         """
 
+    def existsAll(self, locations):
+        """Check if all of a group of locations exist.
+
+        Subclasses may override this to check many locations with fewer
+        round trips to the storage than calling `exists` for each one.
+
+        Parameters
+        ----------
+        locations : list of ButlerLocation or string
+            The locations to check.
+
+        Returns
+        -------
+        bool
+            True if every location exists, False as soon as one is found that
+            does not exist.
+        """
+        for location in locations:
+            if not self.exists(location):
+                return False
+        return True
+
+    def existsMany(self, locations):
+        """Check which of a group of locations exist.
+
+        Subclasses may override this to check many locations with fewer
+        round trips to the storage than calling `exists` for each one.
+
+        Parameters
+        ----------
+        locations : list of ButlerLocation or string
+            The locations to check.
+
+        Returns
+        -------
+        list of bool
+            For each location, True if it exists, else False.
+        """
+        return [self.exists(location) for location in locations]
+
+    def prepareWrites(self, locations):
+        """Prepare this storage for writing to a group of locations, e.g.
+        by creating the directories they will be written to.
+
+        Writing to a location does not require this to be called first; it
+        lets storages do once, for many locations, work that would otherwise
+        be done for each write. This base implementation does nothing.
+
+        Parameters
+        ----------
+        locations : list of ButlerLocation
+            The locations that will be written to.
+
+        Returns
+        -------
+        list
+            For each location, None, or the exception raised preparing to
+            write it (the location can not be written).
+        """
+        return [None] * len(locations)
+
+    def getModificationToken(self, location):
+        """Get a value that changes when the object at a location is rewritten.
+
+        The token is used to tell when objects cached in memory are out of
+        date. This base implementation returns None, meaning the storage
+        can not tell and objects read from it should not be cached.
+
+        Parameters
+        ----------
+        location : ButlerLocation
+            The location of an object in this storage.
+
+        Returns
+        -------
+        hashable or None
+            The token, or None if there is no token for the location.
+        """
+        return None
+
     @abstractmethod
     def instanceSearch(self, path):
         """Search for the given path in this storage instance.
@@ -289,6 +456,27 @@ class StorageInterface:
             Absolute path to to the locaiton within the repository.
         """
 
+    @classmethod
+    def getRepositoryCfgToken(cls, uri):
+        """Get a value that changes when the RepositoryCfg at a location is
+        rewritten.
+
+        The token is used to tell when a RepositoryCfg cached in memory is out
+        of date. This base implementation returns None, meaning the storage
+        can not tell and RepositoryCfgs read from it are only cached by each
+        Storage instance.
+
+        Parameters
+        ----------
+        uri : URI or path to a RepositoryCfg
+
+        Returns
+        -------
+        hashable or None
+            The token, or None if there is no token for the location.
+        """
+        return None
+
     @classmethod
     @abstractmethod
     def getRepositoryCfg(cls, uri):
@@ -23,7 +23,9 @@
 #
 from past.builtins import basestring
 
+import collections
 from collections.abc import Sequence, Set, Mapping
+import os
 
 
 # -*- python -*-
@@ -103,25 +105,106 @@ def setify(x):
     return x
 
 
+_importCache = {}
+
+# Names that could not be imported as modules but were imported as objects when doImport looked up a member
+# function (e.g. 'path.to.Class' for 'path.to.Class.funcname'), so that other members of the same class are
+# not looked for in a module of that name again.
+# The oldest names are forgotten when there are more than _maxFailedModuleImports.
+_failedModuleImports = collections.OrderedDict()
+_maxFailedModuleImports = 1024
+
+
 def doImport(pythonType):
-    """Import a python object given an importable string"""
+    """Import a python object given an importable string.
+
+    Imported objects are cached for the life of the process; use `clearImportCache` to import them again.
+    Strings that can not be imported are tried again each time, since they may become importable (e.g. after
+    the import path changes). When a string names a member of a class, the failure to import the class as a
+    module is remembered, so the other members of the class are not looked for as modules again.
+    """
+    if not isinstance(pythonType, basestring):
+        raise TypeError("Unhandled type of pythonType, val:%s" % pythonType)
     try:
-        if not isinstance(pythonType, basestring):
-            raise TypeError("Unhandled type of pythonType, val:%s" % pythonType)
-        # import this pythonType dynamically
-        # pythonType is sometimes unicode with Python 2 and pybind11; this breaks the interpreter
-        pythonTypeTokenList = str(pythonType).split('.')
-        importClassString = pythonTypeTokenList.pop()
-        importClassString = importClassString.strip()
-        importPackage = ".".join(pythonTypeTokenList)
-        importType = __import__(importPackage, globals(), locals(), [importClassString], 0)
-        pythonType = getattr(importType, importClassString)
-        return pythonType
-    except ImportError:
+        return _importCache[pythonType]
+    except KeyError:
         pass
+    result = _doImport(pythonType)
+    _importCache[pythonType] = result
+    return result
+
+
+def clearImportCache():
+    """Forget the objects cached by `doImport`, and the names it could not import as modules."""
+    _importCache.clear()
+    _failedModuleImports.clear()
+
+
+def _doImport(pythonType):
+    # import this pythonType dynamically
+    # pythonType is sometimes unicode with Python 2 and pybind11; this breaks the interpreter
+    pythonTypeTokenList = str(pythonType).split('.')
+    importClassString = pythonTypeTokenList.pop()
+    importClassString = importClassString.strip()
+    importPackage = ".".join(pythonTypeTokenList)
+    if importPackage not in _failedModuleImports:
+        try:
+            importType = __import__(importPackage, globals(), locals(), [importClassString], 0)
+            pythonType = getattr(importType, importClassString)
+            return pythonType
+        except ImportError:
+            pass
     # maybe python type is a member function, in the form: path.to.object.Class.funcname
     pythonTypeTokenList = pythonType.split('.')
     importClassString = '.'.join(pythonTypeTokenList[0:-1])
     importedClass = doImport(importClassString)
+    # importClassString is not a module but can be imported as an object, so it will not become a module.
+    _failedModuleImports[importPackage] = True
+    while len(_failedModuleImports) > _maxFailedModuleImports:
+        _failedModuleImports.popitem(last=False)
     pythonType = getattr(importedClass, pythonTypeTokenList[-1])
     return pythonType
+
+
+# What to do in a child process after a fork: (owner, name, factory) to replace owner.name with factory(),
+# or (function, None, None) to call function().
+_afterForkActions = []
+
+
+def resetAfterFork(owner, name, factory):
+    """Replace an attribute (e.g. a lock, which another thread of the parent may have held, or a cache) with
+    a new value in a child process after a fork.
+
+    Parameters
+    ----------
+    owner : object
+        The module, class or object that has the attribute.
+    name : string
+        The name of the attribute.
+    factory : callable
+        Called with no arguments to make the new value, e.g. threading.Lock.
+    """
+    _afterForkActions.append((owner, name, factory))
+
+
+def callAfterFork(function):
+    """Call a function with no arguments in a child process after a fork.
+
+    Parameters
+    ----------
+    function : callable
+        The function to call.
+    """
+    _afterForkActions.append((function, None, None))
+
+
+def _afterForkInChild():
+    for owner, name, factory in _afterForkActions:
+        if name is None:
+            owner()
+        else:
+            setattr(owner, name, factory())
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_afterForkInChild)
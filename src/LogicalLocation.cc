@@ -42,6 +42,11 @@ static char const* SVNid __attribute__((unused)) = "$Id$";
 
 #include "lsst/daf/persistence/LogicalLocation.h"
 
+#include <mutex>
+#include <unordered_map>
+#include <utility>
+
+#include "boost/format.hpp"
 #include "boost/regex.hpp"
 #include "lsst/pex/exceptions.h"
 #include "lsst/log/Log.h"
@@ -52,75 +57,152 @@ namespace pexExcept = lsst::pex::exceptions;
 
 namespace {
 LOG_LOGGER _log = LOG_GET("daf.persistence.LogicalLocation");
-}
 
-dafBase::PropertySet::Ptr dafPersist::LogicalLocation::_map;
+/// A substitution in a location template.
+struct Substitution {
+    std::string prefix;     ///< The literal text between the previous substitution and this one.
+    std::string fmt;        ///< The format of the value, "%" for the default format.
+    std::string key;        ///< The key of the value.
+    bool hasFormat;         ///< True if format holds fmt, parsed.
+    boost::format format;   ///< Parsed format for integer values, copied for each value.
+};
 
-/** Constructor from string and additional data.
- */
-dafPersist::LogicalLocation::LogicalLocation(
-    std::string const& locString, CONST_PTR(dafBase::PropertySet) additionalData) :
-    lsst::daf::base::Citizen(typeid(*this)), _locString() {
-    boost::regex expr("(%.*?)\\((\\w+?)\\)");
+/// A location template, parsed into its substitutions and the literal text after the last one.
+struct ParsedTemplate {
+    std::vector<Substitution> substitutions;
+    std::string suffix;
+};
+
+/// The maximum number of parsed templates that are kept; the cache is emptied when it is full.
+std::size_t const maxParsedTemplates = 4096;
+
+std::shared_ptr<ParsedTemplate const> parseTemplate(std::string const& locString) {
+    static boost::regex const expr("(%.*?)\\((\\w+?)\\)");
+    auto parsed = std::make_shared<ParsedTemplate>();
     boost::sregex_iterator i = make_regex_iterator(locString, expr);
     boost::sregex_iterator last;
-    LOGLS_DEBUG(_log, "Input string: " << locString);
-    while (i != boost::sregex_iterator()) {
+    for (; i != boost::sregex_iterator(); ++i) {
         last = i;
+        Substitution sub;
         if ((*i).prefix().matched) {
-            _locString += (*i).prefix().str();
+            sub.prefix = (*i).prefix().str();
         }
-        std::string fmt = (*i).str(1);
-        std::string key = (*i).str(2);
-        LOGLS_DEBUG(_log, "Key: " << key);
-        if (_map && _map->exists(key)) {
-            if (_map->typeOf(key) == typeid(int)) {
-                int value = _map->getAsInt(key);
-                LOGLS_DEBUG(_log, "Map Val: " << value);
-                if (fmt == "%") {
-                    _locString += (boost::format("%1%") % value).str();
-                }
-                else {
-                    _locString += (boost::format(fmt) % value).str();
-                }
-            }
-            else {
-                std::string value = _map->getAsString(key);
-                LOGLS_DEBUG(_log, "Map Val: " << value);
-                _locString += value;
-            }
+        sub.fmt = (*i).str(1);
+        sub.key = (*i).str(2);
+        try {
+            sub.format = boost::format(sub.fmt == "%" ? std::string("%1%") : sub.fmt);
+            sub.hasFormat = true;
+        } catch (boost::io::format_error const&) {
+            // Report a bad format when it is used, as when templates were not parsed in advance.
+            sub.hasFormat = false;
         }
-        else if (additionalData && additionalData->exists(key)) {
-            if (additionalData->typeOf(key) == typeid(int)) {
-                int value = additionalData->getAsInt(key);
-                LOGLS_DEBUG(_log, "Map Val: " << value);
-                if (fmt == "%") {
-                    _locString += (boost::format("%1%") % value).str();
-                }
-                else {
-                    _locString += (boost::format(fmt) % value).str();
-                }
-            }
-            else {
-                std::string value = additionalData->getAsString(key);
-                LOGLS_DEBUG(_log, "Map Val: " << value);
-                _locString += value;
-            }
+        parsed->substitutions.push_back(std::move(sub));
+    }
+    if (last == boost::sregex_iterator()) {
+        parsed->suffix = locString;
+    } else {
+        parsed->suffix = (*last).suffix().str();
+    }
+    return parsed;
+}
+
+/// Get a parsed template from the cache shared by all LogicalLocations, parsing it if needed.
+std::shared_ptr<ParsedTemplate const> getParsedTemplate(std::string const& locString) {
+    static std::mutex mutex;
+    static std::unordered_map<std::string, std::shared_ptr<ParsedTemplate const>> cache;
+    {
+        std::lock_guard<std::mutex> lock(mutex);
+        auto found = cache.find(locString);
+        if (found != cache.end()) {
+            return found->second;
+        }
+    }
+    std::shared_ptr<ParsedTemplate const> parsed = parseTemplate(locString);
+    std::lock_guard<std::mutex> lock(mutex);
+    if (cache.size() >= maxParsedTemplates) {
+        cache.clear();
+    }
+    cache.emplace(locString, parsed);
+    return parsed;
+}
+
+void appendValue(std::string& result, Substitution const& sub, CONST_PTR(dafBase::PropertySet) const& data) {
+    if (data->typeOf(sub.key) == typeid(int)) {
+        int value = data->getAsInt(sub.key);
+        LOGLS_DEBUG(_log, "Map Val: " << value);
+        if (sub.hasFormat) {
+            boost::format format(sub.format);
+            result += (format % value).str();
+        } else {
+            result += (boost::format(sub.fmt) % value).str();
         }
-        else {
-            throw LSST_EXCEPT(pexExcept::RuntimeError,
-                              "Unknown substitution: " + key);
+    } else {
+        std::string value = data->getAsString(sub.key);
+        LOGLS_DEBUG(_log, "Map Val: " << value);
+        result += value;
+    }
+}
+
+std::string expandTemplate(ParsedTemplate const& parsed, CONST_PTR(dafBase::PropertySet) const& map,
+                           CONST_PTR(dafBase::PropertySet) const& additionalData) {
+    std::string result;
+    for (auto const& sub : parsed.substitutions) {
+        result += sub.prefix;
+        LOGLS_DEBUG(_log, "Key: " << sub.key);
+        if (map && map->exists(sub.key)) {
+            appendValue(result, sub, map);
+        } else if (additionalData && additionalData->exists(sub.key)) {
+            appendValue(result, sub, additionalData);
+        } else {
+            throw LSST_EXCEPT(pexExcept::RuntimeError, "Unknown substitution: " + sub.key);
         }
-        ++i;
     }
-    if (last == boost::sregex_iterator()) {
+    result += parsed.suffix;
+    return result;
+}
+
+} // namespace
+
+dafBase::PropertySet::Ptr dafPersist::LogicalLocation::_map;
+
+/** Constructor from string and additional data.
+ *
+ * Substitutions of the form %(key) or %fmt(key) (e.g. %04d(visit)) are
+ * replaced with the value of key in the location map (see setLocationMap)
+ * or, if it is not there, in additionalData.
+ */
+dafPersist::LogicalLocation::LogicalLocation(
+    std::string const& locString, CONST_PTR(dafBase::PropertySet) additionalData) :
+    lsst::daf::base::Citizen(typeid(*this)), _locString() {
+    LOGLS_DEBUG(_log, "Input string: " << locString);
+    if (locString.find('%') == std::string::npos) {
         _locString = locString;
         LOGLS_DEBUG(_log, "Copy to: " << _locString);
+        return;
+    }
+    _locString = expandTemplate(*getParsedTemplate(locString), _map, additionalData);
+    LOGLS_DEBUG(_log, "Result: " << _locString);
+}
+
+/** Expand one location template with each of a list of additional data.
+ *
+ * Equivalent to constructing a LogicalLocation from locString and each
+ * additional data and getting its locString, but the template is only
+ * parsed once.
+ */
+std::vector<std::string> dafPersist::LogicalLocation::expandBatch(
+    std::string const& locString, std::vector<CONST_PTR(dafBase::PropertySet)> const& additionalData) {
+    std::vector<std::string> result;
+    if (locString.find('%') == std::string::npos) {
+        result.assign(additionalData.size(), locString);
+        return result;
     }
-    else {
-        _locString += (*last).suffix().str();
-        LOGLS_DEBUG(_log, "Result: " << _locString);
+    std::shared_ptr<ParsedTemplate const> parsed = getParsedTemplate(locString);
+    result.reserve(additionalData.size());
+    for (auto const& data : additionalData) {
+        result.push_back(expandTemplate(*parsed, _map, data));
     }
+    return result;
 }
 
 /** Accessor.
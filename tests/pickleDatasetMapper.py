@@ -0,0 +1,83 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import os
+import lsst.daf.persistence as dafPersist
+from lsst.daf.persistence.test import TestObjectPair
+
+
+class PickleDatasetMapper(dafPersist.Mapper):
+    """Mapper that pickles the datasets 'x', 'bias', 'flat', 'calexp', 'a' and 'b' to
+    <root>/<datasetType>_<ccd>.pickle, and assembles the composites 'pair' and 'lazyPair' from 'a' and 'b'.
+
+    'lazyPair' is assembled without using its components, so that they can be read lazily.
+    """
+
+    def __init__(self, root, **kwargs):
+        self.root = root
+        self.storage = dafPersist.Storage.makeFromURI(self.root)
+
+    def _map(self, datasetType, dataId):
+        path = os.path.join(self.root, '%s_%d.pickle' % (datasetType, dataId['ccd']))
+        return dafPersist.ButlerLocation(None, None, 'PickleStorage', path, dataId, self, self.storage)
+
+    def map_x(self, dataId, write):
+        return self._map('x', dataId)
+
+    def map_bias(self, dataId, write):
+        return self._map('bias', dataId)
+
+    def map_flat(self, dataId, write):
+        return self._map('flat', dataId)
+
+    def map_calexp(self, dataId, write):
+        return self._map('calexp', dataId)
+
+    def map_a(self, dataId, write):
+        return self._map('a', dataId)
+
+    def map_b(self, dataId, write):
+        return self._map('b', dataId)
+
+    def _mapPair(self, dataId, assembler):
+        location = dafPersist.ButlerComposite(assembler=assembler,
+                                              disassembler=TestObjectPair.disassembler,
+                                              python=TestObjectPair,
+                                              dataId=dataId,
+                                              mapper=self)
+        location.add(id='a', datasetType='a', setter=None, getter=None, subset=False, inputOnly=False)
+        location.add(id='b', datasetType='b', setter=None, getter=None, subset=False, inputOnly=False)
+        return location
+
+    def map_pair(self, dataId, write):
+        return self._mapPair(dataId, TestObjectPair.assembler)
+
+    def map_lazyPair(self, dataId, write):
+        return self._mapPair(dataId, assembleLazily)
+
+
+def assembleLazily(dataId, componentInfo, cls):
+    """Assemble a TestObjectPair without using its components (the TestObjectPair constructor tests them)."""
+    pair = cls()
+    pair.objA = componentInfo['a'].obj
+    pair.objB = componentInfo['b'].obj
+    return pair
@@ -55,6 +55,22 @@ class LogicalLocationTestCase(unittest.TestCase):
         loc = LogicalLocation("%(foo)%3d(y)", ad2)
         self.assertEqual(loc.locString(), "baz2009")
 
+    def testExpandBatch(self):
+        LogicalLocation.setLocationMap(PropertySet())
+        template = "raw/%(filter)/v%07d(visit).fits"
+        additionalData = []
+        for filterName, visit in (("g", 1), ("r", 22)):
+            ad = PropertySet()
+            ad.set("filter", filterName)
+            ad.setInt("visit", visit)
+            additionalData.append(ad)
+        expected = ["raw/g/v0000001.fits", "raw/r/v0000022.fits"]
+        self.assertEqual(LogicalLocation.expandBatch(template, additionalData), expected)
+        self.assertEqual([LogicalLocation(template, ad).locString() for ad in additionalData], expected)
+        self.assertEqual(LogicalLocation.expandBatch("plain.fits", additionalData), ["plain.fits"] * 2)
+        with self.assertRaises(RuntimeError):
+            LogicalLocation.expandBatch("%(nokey)", additionalData)
+
 
 class TestMemory(lsst.utils.tests.MemoryTestCase):
     pass
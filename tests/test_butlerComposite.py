@@ -0,0 +1,119 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import lsst.daf.persistence as dp
+# can't use name TestObject, becuase it messes Pytest up. Alias it to tstObj
+from lsst.daf.persistence.test import TestObject as tstObj
+from lsst.daf.persistence.test import TestObjectPair
+import lsst.utils.tests
+from pickleDatasetMapper import PickleDatasetMapper
+
+# Define the root of the tests relative to this file
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class ButlerCompositeTestCase(unittest.TestCase):
+    """Test case for reading, writing, and checking the existence of composite datasets."""
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp(dir=ROOT, prefix='ButlerCompositeTest-')
+        self.butler = dp.Butler(outputs={'root': self.testDir, 'mapper': PickleDatasetMapper, 'mode': 'rw'})
+
+    def tearDown(self):
+        del self.butler
+        if os.path.exists(self.testDir):
+            shutil.rmtree(self.testDir)
+
+    def testPutGet(self):
+        self.butler.put(TestObjectPair(tstObj('foo'), tstObj('bar')), 'pair', ccd=1)
+        pair = self.butler.get('pair', ccd=1)
+        self.assertEqual(pair.objA, tstObj('foo'))
+        self.assertEqual(pair.objB, tstObj('bar'))
+
+    def testDatasetExists(self):
+        self.assertFalse(self.butler.datasetExists('pair', ccd=1))
+        self.butler.put(TestObjectPair(tstObj('foo'), tstObj('bar')), 'pair', ccd=1)
+        self.assertTrue(self.butler.datasetExists('pair', ccd=1))
+        os.remove(os.path.join(self.testDir, 'b_1.pickle'))
+        self.assertFalse(self.butler.datasetExists('pair', ccd=1))
+        self.assertTrue(self.butler.datasetExists('a', ccd=1))
+
+    def testDatasetExistsBatched(self):
+        self.butler.put(TestObjectPair(tstObj('foo'), tstObj('bar')), 'pair', ccd=1)
+        # The components are located together, and their files are checked with one storage call.
+        with unittest.mock.patch.object(dp.PosixStorage, 'existsMany', autospec=True,
+                                        side_effect=dp.PosixStorage.existsMany) as existsMany:
+            self.assertTrue(self.butler.datasetExists('pair', ccd=1))
+        self.assertEqual(existsMany.call_count, 1)
+        self.assertEqual(len(existsMany.call_args[0][1]), 2)
+
+    def testLazyComponents(self):
+        self.butler.put(TestObjectPair(tstObj('foo'), tstObj('bar')), 'pair', ccd=1)
+        # Replace component 'b' with a file that can not be unpickled; it must not be read unless it is used.
+        with open(os.path.join(self.testDir, 'b_1.pickle'), 'w') as f:
+            f.write('not a pickle')
+        self.butler.setLazyComponents(True)
+        pair = self.butler.get('lazyPair', ccd=1)
+        self.assertEqual(pair.objA, tstObj('foo'))
+        with self.assertRaises(pickle.UnpicklingError):
+            pair.objB.data
+
+        self.butler.setLazyComponents(False)
+        with self.assertRaises(pickle.UnpicklingError):
+            self.butler.get('lazyPair', ccd=1)
+
+    def testComponentCache(self):
+        self.butler.put(TestObjectPair(tstObj('foo'), tstObj('bar')), 'pair', ccd=1)
+        self.butler.enableComponentCache(maxBytes=1 << 20)
+        pair = self.butler.get('pair', ccd=1)
+        # The components are in the cache, so the composite can be assembled without reading the files (the
+        # files are still located, which checks that they exist).
+        for component in ('a', 'b'):
+            with open(os.path.join(self.testDir, '%s_1.pickle' % component), 'w') as f:
+                f.write('not a pickle')
+        cachedPair = self.butler.get('pair', ccd=1)
+        self.assertIs(cachedPair.objA, pair.objA)
+        self.assertIs(cachedPair.objB, pair.objB)
+
+        self.butler.disableComponentCache()
+        with self.assertRaises(pickle.UnpicklingError):
+            self.butler.get('pair', ccd=1)
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+if __name__ == '__main__':
+    lsst.utils.tests.init()
+    unittest.main()
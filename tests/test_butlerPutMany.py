@@ -0,0 +1,95 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import lsst.daf.persistence as dp
+import lsst.utils.tests
+from pickleDatasetMapper import PickleDatasetMapper
+
+# Define the root of the tests relative to this file
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class SubdirMapper(PickleDatasetMapper):
+    """Mapper that also writes the dataset 'y' to <root>/<dir>/y_<ccd>.pickle."""
+
+    def map_y(self, dataId, write):
+        path = os.path.join(self.root, dataId['dir'], 'y_%d.pickle' % dataId['ccd'])
+        return dp.ButlerLocation(None, None, 'PickleStorage', path, dataId, self, self.storage)
+
+
+class ButlerPutManyTestCase(unittest.TestCase):
+    """Test case for writing a batch of datasets with Butler.putMany."""
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp(dir=ROOT, prefix='ButlerPutManyTest-')
+        self.butler = dp.Butler(outputs={'root': self.testDir, 'mapper': SubdirMapper, 'mode': 'rw'})
+
+    def tearDown(self):
+        del self.butler
+        if os.path.exists(self.testDir):
+            shutil.rmtree(self.testDir)
+
+    def testPutMany(self):
+        items = [([ccd], 'x', {'ccd': ccd}) for ccd in range(10)]
+        items.append((threading.Lock(), 'x', {'ccd': 10}))
+        results = self.butler.putMany(items, workers=3)
+        self.assertEqual(len(results), 11)
+        self.assertEqual(results[:10], [None] * 10)
+        self.assertIsInstance(results[10], TypeError)
+        for ccd in range(10):
+            self.assertEqual(self.butler.get('x', ccd=ccd), [ccd])
+
+    def testPerItemErrors(self):
+        """Test that a malformed item, or one whose directory can not be made, fails alone."""
+        with open(os.path.join(self.testDir, 'blocker'), 'w') as f:
+            f.write('not a directory')
+        items = [([1], 'y', {'dir': 'good', 'ccd': 1}),
+                 ([2], 'y', {'dir': 'blocker/sub', 'ccd': 2}),
+                 ([3], 'y'),
+                 ([4], 'y', {'dir': 'good', 'ccd': 4})]
+        results = self.butler.putMany(items, workers=2)
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], OSError)
+        self.assertIsInstance(results[2], ValueError)
+        self.assertIsNone(results[3])
+        self.assertEqual(self.butler.get('y', dir='good', ccd=1), [1])
+        self.assertEqual(self.butler.get('y', dir='good', ccd=4), [4])
+        self.assertFalse(os.path.exists(os.path.join(self.testDir, 'blocker', 'sub')))
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+if __name__ == '__main__':
+    lsst.utils.tests.init()
+    unittest.main()
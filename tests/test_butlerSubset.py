@@ -153,6 +153,36 @@ class ButlerSubsetTestCase(unittest.TestCase):
         for fileName in inputList:
             os.unlink(os.path.join(self.tmpRoot, fileName))
 
+    def testPrefetch(self):
+        butler = dafPersist.Butler(
+            outputs={'mode': 'rw', 'root': self.tmpRoot, 'mapper': ImgMapper})
+        ButlerSubsetTestCase.registerAliases(butler)
+
+        inputList = ["calexp_v123456_R1,2_S2,1.pickle",
+                     "calexp_v123456_R1,2_S2,2.pickle",
+                     "calexp_v654321_R1,3_S1,1.pickle",
+                     "calexp_v654321_R1,3_S1,2.pickle"]
+        for fileName in inputList:
+            with open(os.path.join(self.tmpRoot, fileName), "wb") as f:
+                pickle.dump(fileName, f)
+
+        subset = butler.subset(self.calexpTypeName, skyTile=6)
+        for kwargs in (dict(depth=1, workers=1), dict(depth=3, workers=2), dict(depth=3, maxBytes=1)):
+            results = list(subset.prefetch(**kwargs))
+            self.assertEqual([dataRef.dataId for dataRef, obj in results],
+                             [dataRef.dataId for dataRef in subset])
+            for dataRef, obj in results:
+                self.assertEqual(obj, 'calexp_v%(visit)d_R%(raft)s_S%(sensor)s.pickle' % dataRef.dataId)
+
+        # A dataset that can not be read raises when the iteration reaches it.
+        with open(os.path.join(self.tmpRoot, inputList[1]), "w") as f:
+            f.write("not a pickle")
+        with self.assertRaises(pickle.UnpicklingError):
+            list(subset.prefetch())
+
+        with self.assertRaises(RuntimeError):
+            subset.prefetch(depth=0)
+
     def testNonexistentValue(self):
         butler = dafPersist.Butler(
             outputs={'mode': 'rw', 'root': self.tmpRoot, 'mapper': ImgMapper})
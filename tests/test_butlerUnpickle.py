@@ -0,0 +1,81 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import lsst.daf.persistence as dp
+import lsst.utils.tests
+from pickleDatasetMapper import PickleDatasetMapper
+
+# Define the root of the tests relative to this file
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class ButlerUnpickleTestCase(unittest.TestCase):
+    """Test case for unpickling Butlers in other processes."""
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp(dir=ROOT, prefix='ButlerUnpickleTest-')
+        self.butler = dp.Butler(root=self.testDir, mapper=PickleDatasetMapper)
+
+    def tearDown(self):
+        del self.butler
+        if os.path.exists(self.testDir):
+            shutil.rmtree(self.testDir)
+
+    def checkIO(self, butler, obj, ccd):
+        butler.put(obj, 'x', ccd=ccd)
+        self.assertEqual(butler.get('x', ccd=ccd, immediate=True), obj)
+
+    def testUnpickleMemo(self):
+        """Test that a Butler unpickled more than once in another process is only rebuilt once, without
+        reading its RepositoryCfg again, and that the old pickle form still works."""
+        pickledButler = pickle.dumps(self.butler)
+        with unittest.mock.patch.object(dp.Storage, 'getRepositoryCfg') as getRepositoryCfg:
+            # pretend to be a different process than the one that pickled the butler
+            with unittest.mock.patch('os.getpid', return_value=-1):
+                butler = pickle.loads(pickledButler)
+                self.assertIs(pickle.loads(pickledButler), butler)
+            getRepositoryCfg.assert_not_called()
+        self.assertIsNot(pickle.loads(pickledButler), butler)
+        self.checkIO(butler, [[1, 2], [8, 9]], 1)
+
+        unreduce, args = self.butler.__reduce__()
+        butler = unreduce(dict(args[0]), args[1])
+        self.checkIO(butler, [[3, 2], [8, 7]], 2)
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+if __name__ == '__main__':
+    lsst.utils.tests.init()
+    unittest.main()
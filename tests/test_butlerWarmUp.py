@@ -0,0 +1,120 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+import lsst.daf.persistence as dp
+import lsst.utils.tests
+from pickleDatasetMapper import PickleDatasetMapper
+
+# Define the root of the tests relative to this file
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class ButlerWarmUpTestCase(unittest.TestCase):
+    """Test case for preparing a Butler to be used by forked processes."""
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp(dir=ROOT, prefix='ButlerWarmUpTest-')
+        self.butler = dp.Butler(outputs={'root': self.testDir, 'mapper': PickleDatasetMapper, 'mode': 'rw'})
+
+    def tearDown(self):
+        self.butler.setWriteBehind(False)
+        del self.butler
+        if os.path.exists(self.testDir):
+            shutil.rmtree(self.testDir)
+
+    def testWarmUp(self):
+        self.butler.defineAlias('@alias', 'x')
+        with unittest.mock.patch.object(PickleDatasetMapper, 'warmUp') as warmUp:
+            self.butler.warmUp(['@alias'])
+        warmUp.assert_called_once_with(['x'])
+        self.butler.warmUp()
+
+        # What a forked child does: the butler is still usable, with new write-behind threads.
+        self.butler.setWriteBehind(workers=2, maxPending=2)
+        pool = self.butler._writePool
+        self.butler._afterFork()
+        self.assertIsNot(self.butler._writePool, pool)
+        with self.butler:
+            self.butler.put([1], 'x', ccd=1)
+        self.assertEqual(self.butler.get('x', ccd=1), [1])
+        pool.shutdown()
+
+    @unittest.skipUnless(hasattr(os, 'register_at_fork'), "fork hooks are not supported")
+    def testForkWithHeldLocks(self):
+        """Test that a forked child can use the Butler when other threads of the parent held the locks this
+        package keeps for the whole process."""
+        self.butler.warmUp()
+        dp.safeFileIo.forgetDirectories()
+        pickledButler = pickle.dumps(self.butler)
+        locks = [dp.safeFileIo._umaskLock, dp.safeFileIo._knownDirectoriesLock,
+                 dp.safeFileIo._unsyncedDirectoriesLock, dp.Storage._repositoryCfgCacheLock,
+                 dp.Repository._mapperMemoLock, dp.butler._unpickledButlersLock]
+        for lock in locks:
+            lock.acquire()
+        try:
+            pid = os.fork()
+            if pid == 0:
+                status = 1
+                try:
+                    dp.safeFileIo.resetUmask()
+                    self.butler.put([2], 'x', ccd=2)
+                    dp.Repository.shareMappers = True
+                    dp.Butler(root=self.testDir)
+                    pickle.loads(pickledButler)
+                    status = 0
+                finally:
+                    os._exit(status)
+        finally:
+            for lock in locks:
+                lock.release()
+        deadline = time.time() + 30
+        while True:
+            waited, status = os.waitpid(pid, os.WNOHANG)
+            if waited:
+                break
+            if time.time() > deadline:
+                os.kill(pid, 9)
+                os.waitpid(pid, 0)
+                self.fail("The forked child did not finish")
+            time.sleep(0.05)
+        self.assertEqual(status, 0)
+        self.assertEqual(self.butler.get('x', ccd=2), [2])
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+if __name__ == '__main__':
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,84 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import lsst.daf.persistence as dp
+import lsst.utils.tests
+from pickleDatasetMapper import PickleDatasetMapper
+
+# Define the root of the tests relative to this file
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class ButlerWriteBehindTestCase(unittest.TestCase):
+    """Test case for writing datasets in background threads with Butler.setWriteBehind."""
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp(dir=ROOT, prefix='ButlerWriteBehindTest-')
+        self.butler = dp.Butler(outputs={'root': self.testDir, 'mapper': PickleDatasetMapper, 'mode': 'rw'})
+
+    def tearDown(self):
+        self.butler.setWriteBehind(False)
+        del self.butler
+        if os.path.exists(self.testDir):
+            shutil.rmtree(self.testDir)
+
+    def testWriteBehind(self):
+        self.butler.setWriteBehind(workers=2, maxPending=2)
+        with self.butler:
+            for ccd in range(10):
+                self.butler.put([ccd], 'x', ccd=ccd)
+            # Later puts of the same dataset win.
+            self.butler.put(['last'], 'x', ccd=0)
+        for ccd in range(1, 10):
+            self.assertEqual(self.butler.get('x', ccd=ccd), [ccd])
+        self.assertEqual(self.butler.get('x', ccd=0), ['last'])
+
+    def testErrors(self):
+        # Errors are raised by flush, once.
+        self.butler.setWriteBehind(workers=2, maxPending=2)
+        self.butler.put(threading.Lock(), 'x', ccd=11)
+        with self.assertRaises(TypeError):
+            self.butler.flush()
+        self.butler.flush()
+
+        self.butler.setWriteBehind(False)
+        with self.assertRaises(TypeError):
+            self.butler.put(threading.Lock(), 'x', ccd=11)
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+if __name__ == '__main__':
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,91 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import lsst.daf.persistence as dp
+import lsst.utils.tests
+from pickleDatasetMapper import PickleDatasetMapper
+
+# Define the root of the tests relative to this file
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class InitProfileTestCase(unittest.TestCase):
+    """Test case for profiling the construction of a Butler."""
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp(dir=ROOT, prefix='InitProfileTest-')
+
+    def tearDown(self):
+        if os.path.exists(self.testDir):
+            shutil.rmtree(self.testDir)
+
+    def testInitProfile(self):
+        # Butler.profileInit is set from the environment when the module is imported, so set it here
+        # whatever the environment of the tests is.
+        with unittest.mock.patch.object(dp.Butler, 'profileInit', False):
+            butler = dp.Butler(root=self.testDir, mapper=PickleDatasetMapper)
+        self.assertIsNone(butler.getInitProfile())
+
+        with unittest.mock.patch.object(dp.Butler, 'profileInit', True):
+            butler = dp.Butler(root=self.testDir, mapper=PickleDatasetMapper)
+        profile = butler.getInitProfile()
+        totals = profile.totals()
+        for phase in ('total', 'prefetchCfgs', 'cfgPrefetch', 'getCfgs', 'cfgRead', 'addParents', 'initRepos',
+                      'mapperInit'):
+            self.assertIn(phase, totals)
+        self.assertEqual(totals['total']['calls'], 1)
+        for phase in ('cfgPrefetch', 'mapperInit'):
+            entries = [entry for entry in profile.report() if entry['phase'] == phase]
+            self.assertEqual([entry['repository'] for entry in entries], [self.testDir])
+        self.assertIn('mapperInit', str(profile))
+
+    def testTimer(self):
+        profile = dp.InitProfile()
+        with unittest.mock.patch('time.perf_counter', side_effect=[1., 3.5, 4., 5.]):
+            with profile.timer('phase', 'repo'):
+                pass
+            with profile.timer('phase', 'repo'):
+                pass
+        self.assertEqual(profile.report(), [{'phase': 'phase', 'repository': 'repo', 'calls': 2,
+                                             'seconds': 3.5}])
+        profile = dp.InitProfile(enabled=False)
+        with profile.timer('phase'):
+            pass
+        self.assertEqual(profile.report(), [])
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+if __name__ == '__main__':
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,164 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import lsst.daf.persistence as dp
+# can't use name TestObject, becuase it messes Pytest up. Alias it to tstObj
+from lsst.daf.persistence.test import TestObject as tstObj
+import lsst.utils.tests
+from pickleDatasetMapper import PickleDatasetMapper
+
+# Define the root of the tests relative to this file
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class ObjectCacheTestCase(unittest.TestCase):
+    """Test case for the size-bounded ObjectCache."""
+
+    def testGetPut(self):
+        cache = dp.ObjectCache(100, sizeFunc=len)
+        self.assertTrue(cache.put('a', 'x' * 10))
+        self.assertIn('a', cache)
+        self.assertEqual(cache.get('a'), 'x' * 10)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('b', 'default'), 'default')
+        self.assertEqual(cache.bytes, 10)
+        cache.put('a', 'x' * 20)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.bytes, 20)
+        cache.remove('a')
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.bytes, 0)
+
+    def testEviction(self):
+        cache = dp.ObjectCache(100, sizeFunc=len)
+        cache.put('a', 'x' * 40)
+        cache.put('b', 'x' * 40)
+        cache.get('a')  # 'b' is now the least recently used.
+        cache.put('c', 'x' * 40)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(cache.bytes, 80)
+
+        self.assertFalse(cache.put('d', 'x' * 101))
+        self.assertNotIn('d', cache)
+        self.assertEqual(len(cache), 2)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.bytes, 0)
+
+    def testLfuEviction(self):
+        cache = dp.ObjectCache(100, sizeFunc=len, policy='lfu')
+        cache.put('a', 'x' * 40)
+        cache.put('b', 'x' * 40)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')  # 'b' is the most recently used, but 'a' is used more often.
+        cache.put('c', 'x' * 40)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+
+        with self.assertRaises(RuntimeError):
+            dp.ObjectCache(100, policy='random')
+
+    def testToken(self):
+        cache = dp.ObjectCache(100, sizeFunc=len)
+        cache.put('a', 'x' * 10, token=1)
+        self.assertEqual(cache.get('a', token=1), 'x' * 10)
+        self.assertEqual(cache.get('a'), 'x' * 10)
+        # An object cached with another token is stale, and is removed when it is found.
+        self.assertEqual(cache.get('a', 'default', token=2), 'default')
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.bytes, 0)
+
+    def testEstimateSize(self):
+        small = dp.estimateSize([1, 2, 3])
+        large = dp.estimateSize([list(range(1000)), {'key': 'x' * 1000}])
+        self.assertGreater(large, small)
+        self.assertGreater(large, 2000)
+
+
+class ButlerObjectCacheTestCase(unittest.TestCase):
+    """Test case for the Butler.get object cache."""
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp(dir=ROOT, prefix='ButlerObjectCacheTest-')
+        self.butler = dp.Butler(outputs={'root': self.testDir, 'mapper': PickleDatasetMapper, 'mode': 'rw'})
+
+    def tearDown(self):
+        del self.butler
+        if os.path.exists(self.testDir):
+            shutil.rmtree(self.testDir)
+
+    def testCache(self):
+        self.butler.put(tstObj('bias1'), 'bias', ccd=1)
+        self.butler.enableObjectCache(maxBytes=1 << 20, sizeFunc=lambda obj: 100)
+        bias = self.butler.get('bias', ccd=1)
+        self.assertIs(self.butler.get('bias', ccd=1), bias)
+        stats = self.butler.getCacheStats()
+        self.assertEqual(stats['bias']['hits'], 1)
+        self.assertEqual(stats['bias']['misses'], 1)
+        self.assertGreater(stats['bias']['bytes'], 0)
+
+        # Rewriting the dataset changes the file, so the cached object is not used.
+        self.butler.put(tstObj('bias2'), 'bias', ccd=1)
+        os.utime(os.path.join(self.testDir, 'bias_1.pickle'), ns=(0, 0))
+        bias = self.butler.get('bias', ccd=1)
+        self.assertEqual(bias, tstObj('bias2'))
+        self.assertEqual(self.butler.getCacheStats()['bias']['misses'], 2)
+        # The stale object is no longer cached.
+        self.assertEqual(self.butler.getCacheStats()['bias']['bytes'], stats['bias']['bytes'])
+
+        self.butler.disableObjectCache()
+        self.assertIsNot(self.butler.get('bias', ccd=1), self.butler.get('bias', ccd=1))
+
+    def testRules(self):
+        for datasetType in ('bias', 'flat', 'calexp'):
+            self.butler.put(tstObj(datasetType), datasetType, ccd=1)
+        self.butler.enableObjectCache(maxBytes=1 << 20, allow=['bias', 'fl*'], deny=['flat'])
+        for datasetType in ('bias', 'flat', 'calexp'):
+            self.butler.get(datasetType, ccd=1)
+            self.butler.get(datasetType, ccd=1)
+        stats = self.butler.getCacheStats()
+        self.assertEqual(stats['bias']['hits'], 1)
+        self.assertNotIn('flat', stats)
+        self.assertNotIn('calexp', stats)
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+if __name__ == '__main__':
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,86 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+import unittest
+
+import numpy
+
+import lsst.daf.persistence as dp
+import lsst.utils.tests
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class PathTemplateTestCase(unittest.TestCase):
+    """A test case for PathTemplate."""
+
+    template = '%(visit)07d/raw_%(ccd)03d_%(filter)s.fits'
+
+    def testFormat(self):
+        pathTemplate = dp.PathTemplate(self.template)
+        self.assertEqual(pathTemplate.keys, ('visit', 'ccd', 'filter'))
+        dataId = {'visit': 12, 'ccd': 3, 'filter': 'g', 'extra': 'ignored'}
+        self.assertEqual(pathTemplate.format(dataId), self.template % dataId)
+        self.assertEqual(dp.PathTemplate('%(a)s/100%%/%(a)s').format({'a': 'x'}), 'x/100%/x')
+        with self.assertRaises(RuntimeError):
+            dp.PathTemplate('%d/%(ccd)d')
+
+    def testExpand(self):
+        pathTemplate = dp.PathTemplate(self.template)
+        columns = {'visit': [1, 2, 3], 'ccd': (10, 11, 12), 'filter': 'r'}
+        dataIds = [{'visit': visit, 'ccd': ccd, 'filter': 'r'} for visit, ccd in zip((1, 2, 3), (10, 11, 12))]
+        expected = [self.template % dataId for dataId in dataIds]
+        self.assertEqual(pathTemplate.expand(columns), expected)
+        self.assertEqual(pathTemplate.expandRows(dataIds), expected)
+        self.assertEqual(pathTemplate.expand(dataIds[0]), expected[:1])
+        with self.assertRaises(RuntimeError):
+            pathTemplate.expand({'visit': [1, 2], 'ccd': [1], 'filter': 'r'})
+
+    def testExpandArrays(self):
+        pathTemplate = dp.PathTemplate(self.template)
+        dataIds = [{'visit': visit, 'ccd': 10, 'filter': 'r'} for visit in (1, 2, 3)]
+        expected = [self.template % dataId for dataId in dataIds]
+        columns = {'visit': numpy.array([1, 2, 3]), 'ccd': numpy.array(10), 'filter': numpy.array('r')}
+        self.assertEqual(pathTemplate.expand(columns), expected)
+        columns = {'visit': numpy.array(1), 'ccd': numpy.int64(10), 'filter': 'r'}
+        self.assertEqual(pathTemplate.expand(columns), expected[:1])
+
+    def testExpandIterators(self):
+        """Iterators can not be told apart from single values by their length, so they are rejected."""
+        pathTemplate = dp.PathTemplate(self.template)
+        for visits in (iter([1, 2, 3]), (visit for visit in [1, 2, 3])):
+            with self.assertRaises(RuntimeError):
+                pathTemplate.expand({'visit': visits, 'ccd': [10, 11, 12], 'filter': 'r'})
+        self.assertEqual(pathTemplate.expand({'visit': range(1, 3), 'ccd': 10, 'filter': 'r'}),
+                         [self.template % {'visit': visit, 'ccd': 10, 'filter': 'r'} for visit in (1, 2)])
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+if __name__ == '__main__':
+    lsst.utils.tests.init()
+    unittest.main()
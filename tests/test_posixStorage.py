@@ -21,7 +21,10 @@
 #
 
 import os
+import pickle
 import unittest
+import unittest.mock
+from lsst.daf.base import PropertySet
 import lsst.daf.persistence as dp
 import lsst.utils.tests
 import shutil
@@ -142,6 +145,130 @@ class TestGetLocalFile(unittest.TestCase):
         f.close()
 
 
+class TestFormatters(unittest.TestCase):
+    """A test case for the formatters dispatch table of StorageInterface."""
+
+    def testGetFormatters(self):
+        class FormatterTestStorage(dp.StorageInterface):
+            pass
+
+        def readFoo(location):
+            pass
+
+        def writeFoo(location, obj):
+            pass
+
+        def readDict(location):
+            pass
+
+        FormatterTestStorage.registerFormatters('FooStorage', readFoo, writeFoo)
+        self.assertEqual(FormatterTestStorage.getFormatters('FooStorage', dict), (readFoo, writeFoo, None))
+        self.assertEqual(FormatterTestStorage.getFormatters('BarStorage', dict), (None, None, None))
+
+        location = dp.ButlerLocation(dict, None, 'BarStorage', 'bar', {}, None, None)
+        formatters = location.getFormatters(FormatterTestStorage)
+        self.assertIs(location.getFormatters(FormatterTestStorage), formatters)
+        # Registration replaces the formatters the location kept.
+        FormatterTestStorage.registerFormatters(dict, readFormatter=readDict)
+        self.assertEqual(location.getFormatters(FormatterTestStorage), (readDict, None, None))
+        location.storageName = 'FooStorage'
+        self.assertEqual(location.getFormatters(FormatterTestStorage), (readFoo, writeFoo, None))
+        self.assertNotIn('FooStorage', dp.PosixStorage._readFormatters())
+
+    def testExists(self):
+        testDir = tempfile.mkdtemp(dir=ROOT, prefix='TestFormatters-')
+        try:
+            storage = dp.PosixStorage(testDir, create=True)
+            with open(os.path.join(testDir, 'foo.fits'), 'w') as f:
+                f.write('foo')
+            for path, exists in (('foo.fits', True), ('foo.fits[1]', True), ('f*.fits', True),
+                                 ('bar.fits', False), ('bar.fits[1]', False)):
+                location = dp.ButlerLocation(None, None, 'FitsStorage', path, {}, None, storage)
+                self.assertEqual(storage.exists(location), exists, path)
+                # A location without a storage, as Repository.exists allows, is looked for in the storage
+                # that checks it.
+                location = dp.ButlerLocation(None, None, 'FitsStorage', path, {}, None, None)
+                self.assertEqual(storage.exists(location), exists, path)
+            self.assertEqual(storage.search(testDir, 'foo.fits[1]'), ['foo.fits[1]'])
+            self.assertIsNone(storage.search(testDir, 'bar.fits'))
+        finally:
+            shutil.rmtree(testDir, ignore_errors=True)
+
+    def testExistsMany(self):
+        testDir = tempfile.mkdtemp(dir=ROOT, prefix='TestFormatters-')
+        try:
+            storage = dp.PosixStorage(testDir, create=True)
+            os.mkdir(os.path.join(testDir, 'sub'))
+            for path in ('foo.fits', 'bar.fits', 'sub/baz.fits'):
+                with open(os.path.join(testDir, path), 'w') as f:
+                    f.write('foo')
+            paths = ['foo.fits', 'bar.fits[1]', 'missing.fits', 'sub/baz.fits', 'nodir/foo.fits', 'f*.fits']
+            locations = [dp.ButlerLocation(None, None, 'FitsStorage', path, {}, None, storage)
+                         for path in paths]
+            # The files in the root are looked up with one listing of the root; the files alone in their
+            # directories are not listed.
+            with unittest.mock.patch('os.listdir', side_effect=os.listdir) as listdir:
+                self.assertEqual(storage.existsMany(locations), [True, True, False, True, False, True])
+            self.assertEqual(listdir.call_args_list, [unittest.mock.call(testDir)])
+            self.assertTrue(storage.existsAll(locations[:2]))
+            self.assertFalse(storage.existsAll(locations))
+        finally:
+            shutil.rmtree(testDir, ignore_errors=True)
+
+    def testLocationExpansion(self):
+        """Test that locations are expanded with their additionalData only when they have substitutions, and
+        that the additionalData is made when it is first used."""
+        testDir = tempfile.mkdtemp(dir=ROOT, prefix='TestFormatters-')
+        try:
+            storage = dp.PosixStorage(testDir, create=True)
+            with open(os.path.join(testDir, 'foo3.fits'), 'w') as f:
+                f.write('foo')
+            with unittest.mock.patch('lsst.daf.base.PropertySet', side_effect=PropertySet) as makePropertySet:
+                location = dp.ButlerLocation(None, None, 'FitsStorage', 'foo3.fits', {'ccd': 3}, None,
+                                             storage)
+                self.assertTrue(storage.exists(location))
+                self.assertTrue(location.hasAdditionalData('ccd'))
+                self.assertFalse(location.hasAdditionalData('hdu'))
+                description = location.describeAdditionalData()
+                makePropertySet.assert_not_called()
+                location = dp.ButlerLocation(None, None, 'FitsStorage', 'foo%(ccd)d.fits', {'ccd': 3}, None,
+                                             storage)
+                self.assertTrue(storage.exists(location))
+                makePropertySet.assert_called_once_with()
+            self.assertEqual(location.getAdditionalData().getInt('ccd'), 3)
+            self.assertEqual(location.describeAdditionalData(), description)
+            self.assertTrue(location.hasAdditionalData('ccd'))
+            self.assertNotEqual(dp.ButlerLocation(None, None, 'FitsStorage', 'foo3.fits', {'ccd': 4}, None,
+                                                  storage).describeAdditionalData(), description)
+
+            # The given additionalData is not changed; the location's has the dataId items added to a copy.
+            additionalData = PropertySet()
+            additionalData.set('hdu', 2)
+            location = dp.ButlerLocation(None, None, 'FitsStorage', 'foo3.fits', {'ccd': 3}, None, storage,
+                                         additionalData=additionalData)
+            self.assertTrue(location.hasAdditionalData('hdu'))
+            self.assertEqual(location.getAdditionalData().getInt('hdu'), 2)
+            self.assertEqual(location.getAdditionalData().getInt('ccd'), 3)
+            self.assertFalse(additionalData.exists('ccd'))
+        finally:
+            shutil.rmtree(testDir, ignore_errors=True)
+
+    def testLocationPickle(self):
+        """Test that locations pickled by older versions, with the additionalData made, can be unpickled."""
+        additionalData = PropertySet()
+        additionalData.set('ccd', 3)
+        location = dp.ButlerLocation.__new__(dp.ButlerLocation)
+        location.__setstate__({'pythonType': None, 'cppType': None, 'storageName': 'FitsStorage',
+                               'mapper': None, 'storage': None, 'locationList': ['foo3.fits'],
+                               'additionalData': additionalData, 'dataId': {'ccd': 3}, 'usedDataId': None,
+                               'datasetType': None})
+        self.assertIs(location.getAdditionalData(), additionalData)
+        self.assertTrue(location.hasAdditionalData('ccd'))
+        location = pickle.loads(pickle.dumps(location))
+        self.assertEqual(location.getAdditionalData().getInt('ccd'), 3)
+        self.assertEqual(location.getLocations(), ['foo3.fits'])
+
+
 class MemoryTester(lsst.utils.tests.MemoryTestCase):
     pass
 
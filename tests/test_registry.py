@@ -23,6 +23,11 @@
 import collections
 import unittest
 import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
 import lsst.utils.tests
 
 import lsst.daf.persistence as dafPersist
@@ -74,6 +79,44 @@ class PosixRegistryTestCase(unittest.TestCase):
             self.assertEqual(lookups, expectedLookup)
 
 
+class SqliteRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempRoot = tempfile.mkdtemp()
+        self.location = os.path.join(self.tempRoot, 'registry.sqlite3')
+        conn = sqlite3.connect(self.location)
+        conn.execute("CREATE TABLE raw (visit INT, filter TEXT)")
+        conn.executemany("INSERT INTO raw VALUES (?, ?)", [(1, 'g'), (2, 'r')])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempRoot, ignore_errors=True)
+
+    def testAfterFork(self):
+        """Test that a registry reopens its connection after a fork, without closing the inherited one."""
+        registry = dafPersist.Registry.create(self.location)
+        inherited = registry.conn
+        registry.afterFork()
+        self.assertIsNot(registry.conn, inherited)
+        self.assertEqual(registry.lookup(('filter',), ('raw',), {'visit': 2}), [('r',)])
+        self.assertEqual(inherited.execute("SELECT COUNT(*) FROM raw").fetchall(), [(2,)])
+
+        # A registry that was given its connection can not open a new one, and keeps it.
+        registry = dafPersist.SqlRegistry(inherited)
+        registry.afterFork()
+        self.assertIs(registry.conn, inherited)
+
+
+class PgsqlImportTestCase(unittest.TestCase):
+
+    def testLazyImport(self):
+        """Test that psycopg2 is not imported with the package, and that havePgsql imports it when used."""
+        code = ("import sys; import lsst.daf.persistence as dp; assert 'psycopg2' not in sys.modules; "
+                "assert dp.havePgsql == ('psycopg2' in sys.modules)")
+        subprocess.check_call([sys.executable, "-c", code])
+
+
 class TestMemory(lsst.utils.tests.MemoryTestCase):
     pass
 
@@ -19,10 +19,14 @@
 # the GNU General Public License along with this program.  If not,
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
+import copy
 import os
 import shutil
 import tempfile
+import threading
+import time
 import unittest
+import unittest.mock
 import yaml
 
 import lsst.daf.persistence as dp
@@ -166,6 +170,73 @@ class TestCfgRelationship(unittest.TestCase):
         cfg = storage.getRepositoryCfg(os.path.join(self.testDir, 'a'))
         self.assertEqual(cfg, storage.repositoryCfgs[os.path.join(self.testDir, 'a')])
 
+    def testProcessRepoCfgCache(self):
+        """Tests that cfgs are shared by Storage instances, as copies, until the cfg file changes."""
+        root = os.path.join(self.testDir, 'a')
+        butler = dp.Butler(outputs=dp.RepositoryArgs(mode='w',
+                                                     mapper=dpTest.EmptyTestMapper,
+                                                     root=root))
+        del butler
+        dp.Storage.clearRepositoryCfgCache()
+        cfg = dp.Storage().getRepositoryCfg(root)
+        self.assertIn(root, dp.Storage._repositoryCfgCache)
+        otherCfg = dp.Storage().getRepositoryCfg(root)
+        self.assertEqual(cfg, otherCfg)
+        self.assertIsNot(cfg, otherCfg)
+
+        # A cfg file that is replaced on disk, without going through the Butler, is read again.
+        parent = os.path.join(self.testDir, 'parent')
+        cfg.extendParents([parent])
+        tempPath = os.path.join(root, 'repositoryCfg.yaml.tmp')
+        with open(tempPath, 'w') as f:
+            yaml.dump(cfg, f)
+        os.replace(tempPath, os.path.join(root, 'repositoryCfg.yaml'))
+        self.assertIn(root, dp.Storage._repositoryCfgCache)
+        self.assertEqual(dp.Storage().getRepositoryCfg(root).parents, [parent])
+
+        dp.Storage.clearRepositoryCfgCache(root)
+        self.assertNotIn(root, dp.Storage._repositoryCfgCache)
+
+    def testPrefetchCfgs(self):
+        """Tests that the cfgs of the whole parent DAG are read when a Butler is created, with and without
+        reading them concurrently."""
+        def root(name):
+            return os.path.join(self.testDir, name)
+        dp.Butler(outputs=dp.RepositoryArgs(mode='w', mapper=dpTest.EmptyTestMapper, root=root('a')))
+        dp.Butler(inputs=root('a'), outputs=root('b'))
+        dp.Butler(inputs=root('a'), outputs=root('c'))
+        dp.Butler(inputs=[root('b'), root('c')], outputs=root('d'))
+        for workers in (1, 4):
+            dp.Storage.clearRepositoryCfgCache()
+            with unittest.mock.patch.object(dp.Butler, 'cfgPrefetchWorkers', workers):
+                butler = dp.Butler(inputs=root('d'))
+            self.assertEqual(set(butler.storage.repositoryCfgs.keys()),
+                             set(root(name) for name in 'abcd'))
+
+    def testPrefetchOldButlerCfgs(self):
+        """Tests that Old Butler (V1) repositories in the parent chain are probed once each, with and without
+        probing them concurrently."""
+        def root(name):
+            return os.path.join(self.testDir, name)
+        os.makedirs(root('a'))
+        with open(os.path.join(root('a'), '_mapper'), 'w') as f:
+            f.write('lsst.daf.persistence.test.EmptyTestMapper')
+        for name, parent in (('b', 'a'), ('c', 'b')):
+            os.makedirs(root(name))
+            os.symlink(root(parent), os.path.join(root(name), '_parent'))
+        for workers in (1, 4):
+            with unittest.mock.patch.object(dp.Butler, 'cfgPrefetchWorkers', workers), \
+                    unittest.mock.patch.object(dp.Butler, '_probeOldButlerRepository',
+                                               side_effect=dp.Butler._probeOldButlerRepository) as probe, \
+                    unittest.mock.patch.object(dp.PosixStorage, 'v1RepoExists',
+                                               side_effect=dp.PosixStorage.v1RepoExists) as v1RepoExists:
+                butler = dp.Butler(inputs=root('c'))
+            self.assertEqual(probe.call_count, 3 if workers > 1 else 0)
+            self.assertEqual(sorted(call[0][0] for call in v1RepoExists.call_args_list),
+                             [root(name) for name in 'abc'])
+            self.assertEqual([repoData.cfgRoot for repoData in butler._repos.inputs()],
+                             [root(name) for name in 'cba'])
+
 
 class TestNestedCfg(unittest.TestCase):
 
@@ -264,6 +335,72 @@ class TestMapperArgsNone(unittest.TestCase):
         self.assertIsInstance(cfg.mapperArgs, dict)
 
 
+class TestCfgTrailer(unittest.TestCase):
+    """Test that cfg files are written with a trailer that lets them be read without locking.
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp(dir=ROOT, prefix="TestCfgTrailer-")
+        self.cfgFile = os.path.join(self.testDir, 'repositoryCfg.yaml')
+
+    def tearDown(self):
+        if os.path.exists(self.testDir):
+            shutil.rmtree(self.testDir)
+
+    def parent(self, name):
+        return os.path.join(self.testDir, name)
+
+    def readTrailer(self):
+        with open(self.cfgFile) as f:
+            return f.read().splitlines()[-1]
+
+    def test(self):
+        cfg = dp.RepositoryCfg(root=self.testDir, mapper='lsst.daf.persistence.SomeMapper',
+                               mapperArgs={}, parents=[self.parent('foo')], policy=None)
+        dp.PosixStorage.putRepositoryCfg(cfg)
+        self.assertTrue(self.readTrailer().startswith('# repositoryCfg generation=1 sha256='))
+        self.assertEqual(dp.PosixStorage.getRepositoryCfg(self.testDir), cfg)
+
+        # Extending the parents replaces the file with the next generation.
+        cfg = dp.RepositoryCfg(root=self.testDir, mapper='lsst.daf.persistence.SomeMapper',
+                               mapperArgs={}, parents=[self.parent('foo'), self.parent('bar')], policy=None)
+        dp.PosixStorage.putRepositoryCfg(cfg)
+        self.assertTrue(self.readTrailer().startswith('# repositoryCfg generation=2 sha256='))
+        self.assertEqual(dp.PosixStorage.getRepositoryCfg(self.testDir).parents,
+                         [self.parent('foo'), self.parent('bar')])
+        self.assertEqual(len(os.listdir(self.testDir)), 1)
+
+    def testNoTrailer(self):
+        """A file without a valid trailer (e.g. written by an older version) is read with a lock."""
+        cfg = dp.RepositoryCfg(root=self.testDir, mapper='lsst.daf.persistence.SomeMapper',
+                               mapperArgs={}, parents=None, policy=None)
+        dp.PosixStorage.putRepositoryCfg(cfg)
+        with open(self.cfgFile) as f:
+            lines = f.read().splitlines(True)
+        with open(self.cfgFile, 'w') as f:
+            f.writelines(lines[:-1])
+            f.write('# repositoryCfg generation=1 sha256=0123\n')
+        self.assertEqual(dp.PosixStorage.getRepositoryCfg(self.testDir), cfg)
+
+    def testReplacedWhileLocked(self):
+        """A reader that finds the empty file a writer creates, and waits for the writer's lock, reads the
+        file that replaced it."""
+        cfg = dp.RepositoryCfg(root=self.testDir, mapper='lsst.daf.persistence.SomeMapper',
+                               mapperArgs={}, parents=None, policy=None)
+        results = []
+        with dp.safeFileIo.SafeLockedFileForReplace(self.cfgFile) as f:
+            reader = threading.Thread(
+                target=lambda: results.append(dp.PosixStorage.getRepositoryCfg(self.testDir)))
+            reader.start()
+            # Give the reader time to open the empty file and wait for the lock.
+            time.sleep(0.2)
+            cfgToWrite = copy.copy(cfg)
+            cfgToWrite.root = None
+            f.replace(yaml.dump(cfgToWrite))
+        reader.join()
+        self.assertEqual(results, [cfg])
+
+
 class MemoryTester(lsst.utils.tests.MemoryTestCase):
     pass
 
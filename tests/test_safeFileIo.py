@@ -20,6 +20,7 @@
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
 
+import hashlib
 import multiprocessing
 import os
 import shutil
@@ -79,6 +80,58 @@ class WriteOnceCompareSameTest(unittest.TestCase):
                 f.write('fop\n')
         self.assertRaises(RuntimeError, writeNonMatchingFile)
 
+    def testCompareSameDigest(self):
+        """Check that the digest of a written file is stored with it and used for compare-same."""
+        fileName = os.path.join(self.testDir, 'test.txt')
+        with dp.safeFileIo.FileForWriteOnceCompareSame(fileName) as f:
+            f.write('bar\n')
+            f.writelines(['baz\n'])
+        if not hasattr(os, 'getxattr'):
+            self.skipTest("Extended attributes are not supported on this platform")
+        try:
+            digest = os.getxattr(fileName, 'user.lsst.daf.persistence.sha256').decode('ascii')
+        except OSError:
+            self.skipTest("Extended attributes are not supported by this filesystem")
+        self.assertEqual(digest, hashlib.sha256(b'bar\nbaz\n').hexdigest())
+
+        with dp.safeFileIo.FileForWriteOnceCompareSame(fileName) as f:
+            f.write('bar\nbaz\n')
+        self.assertEqual(len(os.listdir(self.testDir)), 1)
+        with self.assertRaises(RuntimeError):
+            with dp.safeFileIo.FileForWriteOnceCompareSame(fileName) as f:
+                f.write('bar\nbaa\n')
+
+        # Without a stored digest the files are compared byte by byte.
+        os.removexattr(fileName, 'user.lsst.daf.persistence.sha256')
+        with dp.safeFileIo.FileForWriteOnceCompareSame(fileName) as f:
+            f.write('bar\nbaz\n')
+        with self.assertRaises(RuntimeError):
+            with dp.safeFileIo.FileForWriteOnceCompareSame(fileName) as f:
+                f.write('bar\nbaa\n')
+        self.assertEqual(len(os.listdir(self.testDir)), 1)
+
+    def testCompareSameByName(self):
+        """Check that files written through the name of the temporary file are compared byte by byte."""
+        fileName = os.path.join(self.testDir, 'test.txt')
+        with dp.safeFileIo.FileForWriteOnceCompareSame(fileName) as f:
+            with open(f.name, 'w') as g:
+                g.write('bar\n')
+        if hasattr(os, 'getxattr'):
+            with self.assertRaises(OSError):
+                os.getxattr(fileName, 'user.lsst.daf.persistence.sha256')
+        with self.assertRaises(RuntimeError):
+            with dp.safeFileIo.FileForWriteOnceCompareSame(fileName) as f:
+                f.write('baz\n')
+        with dp.safeFileIo.FileForWriteOnceCompareSame(fileName) as f:
+            f.write('bar\n')
+        with self.assertRaises(RuntimeError):
+            with dp.safeFileIo.FileForWriteOnceCompareSame(fileName) as f:
+                with open(f.name, 'w') as g:
+                    g.write('baz\n')
+        with open(fileName) as f:
+            self.assertEqual(f.read(), 'bar\n')
+        self.assertEqual(len(os.listdir(self.testDir)), 1)
+
     def testPermissions(self):
         """Check that the file is created with the current umask."""
         # The only way to get the umask is to set it.
@@ -93,6 +146,85 @@ class WriteOnceCompareSameTest(unittest.TestCase):
         filePerms = stat.S_IMODE(os.lstat(fileName).st_mode)
         self.assertEqual(~umask & 0o666, filePerms)
 
+    def testUmask(self):
+        """Check that the remembered umask is used until it is reset."""
+        umask = os.umask(0o022)
+        try:
+            dp.safeFileIo.resetUmask()
+            self.assertEqual(dp.safeFileIo.getUmask(), 0o022)
+            os.umask(0o027)
+            self.assertEqual(dp.safeFileIo.getUmask(), 0o022)
+            dp.safeFileIo.resetUmask()
+            self.assertEqual(dp.safeFileIo.getUmask(), 0o027)
+        finally:
+            os.umask(umask)
+            dp.safeFileIo.resetUmask()
+
+    def testRemovedDirectory(self):
+        """Check that files can be written to a directory that was removed after it was created."""
+        fileName = os.path.join(self.testDir, 'subdir', 'test.txt')
+        for i in range(2):
+            with dp.safeFileIo.SafeFile(fileName) as f:
+                f.write('bar\n')
+            self.assertTrue(os.path.exists(fileName))
+            shutil.rmtree(os.path.dirname(fileName))
+        with dp.safeFileIo.SafeFilename(fileName) as tempName:
+            with open(tempName, 'w') as f:
+                f.write('bar\n')
+        self.assertTrue(os.path.exists(fileName))
+
+    def testRemakeDirectory(self):
+        """Check that a removed directory is made again, and that files can be written to it with every safe
+        file writer."""
+        directory = os.path.join(self.testDir, 'subdir')
+        fileName = os.path.join(directory, 'test.txt')
+        dp.safeFileIo.safeMakeDir(directory)
+        shutil.rmtree(directory)
+        dp.safeFileIo.safeMakeDir(directory)
+        self.assertTrue(os.path.isdir(directory))
+        shutil.rmtree(directory)
+        dp.PosixStorage(directory, create=True)
+        self.assertTrue(os.path.isdir(directory))
+        shutil.rmtree(directory)
+        with dp.safeFileIo.SafeLockedFileForWrite(fileName) as f:
+            f.write('foo\n')
+        with open(fileName) as f:
+            self.assertEqual(f.read(), 'foo\n')
+        shutil.rmtree(directory)
+        with dp.safeFileIo.SafeLockedFileForReplace(fileName) as f:
+            f.replace('bar\n')
+        with open(fileName) as f:
+            self.assertEqual(f.read(), 'bar\n')
+        shutil.rmtree(directory)
+        with dp.safeFileIo.FileForWriteOnceCompareSame(fileName) as f:
+            f.write('baz\n')
+        with open(fileName) as f:
+            self.assertEqual(f.read(), 'baz\n')
+
+    def testDurability(self):
+        """Check that files are written with every durability policy."""
+        with self.assertRaises(RuntimeError):
+            dp.safeFileIo.setDurability('always')
+        try:
+            for policy in dp.safeFileIo.DURABILITY_POLICIES:
+                for batch in (False, True):
+                    dp.safeFileIo.setDurability(policy, batchDirectorySync=batch)
+                    self.assertEqual(dp.safeFileIo.getDurability(), (policy, batch))
+                    fileName = os.path.join(self.testDir, '%s-%s' % (policy, batch), 'test.txt')
+                    with dp.safeFileIo.SafeFile(fileName) as f:
+                        f.write('bar\n')
+                    with dp.safeFileIo.SafeFilename(fileName + '2') as tempName:
+                        with open(tempName, 'w') as f:
+                            f.write('bar\n')
+                    with dp.safeFileIo.FileForWriteOnceCompareSame(fileName + '3') as f:
+                        f.write('bar\n')
+                    dp.safeFileIo.syncDirectories()
+                    for name in (fileName, fileName + '2', fileName + '3'):
+                        with open(name) as f:
+                            self.assertEqual(f.read(), 'bar\n')
+        finally:
+            dp.safeFileIo.setDurability('none')
+
 
 def readFile(filename, readQueue):
     readQueue.put("waiting")
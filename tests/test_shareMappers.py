@@ -0,0 +1,80 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import lsst.daf.persistence as dp
+import lsst.utils.tests
+from pickleDatasetMapper import PickleDatasetMapper
+
+# Define the root of the tests relative to this file
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+def getMapper(butler):
+    return butler._repos.all()[0].repo._mapper
+
+
+class ShareMappersTestCase(unittest.TestCase):
+    """Test case for sharing mapper instances between repositories with the same arguments."""
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp(dir=ROOT, prefix='ShareMappersTest-')
+        self.otherDir = tempfile.mkdtemp(dir=ROOT, prefix='ShareMappersTest-')
+
+    def tearDown(self):
+        dp.Repository.clearMapperMemo()
+        for directory in (self.testDir, self.otherDir):
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+
+    def testShareMappers(self):
+        self.assertIsNot(getMapper(dp.Butler(root=self.testDir, mapper=PickleDatasetMapper)),
+                         getMapper(dp.Butler(root=self.testDir, mapper=PickleDatasetMapper)))
+        with unittest.mock.patch.object(dp.Repository, 'shareMappers', True):
+            butler1 = dp.Butler(root=self.testDir, mapper=PickleDatasetMapper)
+            butler2 = dp.Butler(root=self.testDir, mapper=PickleDatasetMapper)
+            butler3 = dp.Butler(root=self.otherDir, mapper=PickleDatasetMapper)
+        self.assertIs(getMapper(butler1), getMapper(butler2))
+        self.assertIsNot(getMapper(butler1), getMapper(butler3))
+
+        # The shared mappers are forgotten when the memo is cleared.
+        dp.Repository.clearMapperMemo()
+        with unittest.mock.patch.object(dp.Repository, 'shareMappers', True):
+            self.assertIsNot(getMapper(dp.Butler(root=self.testDir, mapper=PickleDatasetMapper)),
+                             getMapper(butler1))
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+if __name__ == '__main__':
+    lsst.utils.tests.init()
+    unittest.main()
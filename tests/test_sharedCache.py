@@ -0,0 +1,127 @@
+#
+# LSST Data Management System
+# Copyright 2017 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import lsst.daf.persistence as dp
+# can't use name TestObject, becuase it messes Pytest up. Alias it to tstObj
+from lsst.daf.persistence.test import TestObject as tstObj
+import lsst.utils.tests
+from pickleDatasetMapper import PickleDatasetMapper
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Define the root of the tests relative to this file
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class SharedCacheTestCase(unittest.TestCase):
+    """Test case for the node-local SharedCache used by PosixStorage."""
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp(dir=ROOT, prefix='SharedCacheTest-')
+        self.cacheDir = os.path.join(self.testDir, 'cache')
+        self.butler = dp.Butler(outputs={'root': os.path.join(self.testDir, 'repo'),
+                                         'mapper': PickleDatasetMapper, 'mode': 'rw'})
+        dp.PosixStorage.setSharedCache(dp.SharedCache(self.cacheDir))
+
+    def tearDown(self):
+        dp.PosixStorage.setSharedCache(None)
+        del self.butler
+        if os.path.exists(self.testDir):
+            shutil.rmtree(self.testDir)
+
+    def testReadThrough(self):
+        self.butler.put(tstObj('foo'), 'x', ccd=1)
+        self.assertEqual(self.butler.get('x', ccd=1), tstObj('foo'))
+        self.assertEqual(len(os.listdir(self.cacheDir)), 1)
+        # A second butler (e.g. in another process) reads the object from the cache.
+        butler = dp.Butler(inputs=os.path.join(self.testDir, 'repo'))
+        self.assertEqual(butler.get('x', ccd=1), tstObj('foo'))
+        self.assertEqual(len(os.listdir(self.cacheDir)), 1)
+
+        # A rewritten dataset is read from its file again, and replaces the stale cache file.
+        self.butler.put(tstObj('bar'), 'x', ccd=1)
+        os.utime(os.path.join(self.testDir, 'repo', 'x_1.pickle'), ns=(0, 0))
+        self.assertEqual(self.butler.get('x', ccd=1), tstObj('bar'))
+        self.assertEqual(len(os.listdir(self.cacheDir)), 1)
+        self.assertEqual(butler.get('x', ccd=1), tstObj('bar'))
+
+        dp.PosixStorage.sharedCache.clear()
+        self.assertEqual(os.listdir(self.cacheDir), [])
+
+    def testEviction(self):
+        for ccd in range(4):
+            self.butler.put(tstObj('x' * 1000), 'x', ccd=ccd)
+        self.butler.get('x', ccd=0)
+        fileSize = os.path.getsize(os.path.join(self.cacheDir, os.listdir(self.cacheDir)[0]))
+        dp.PosixStorage.setSharedCache(dp.SharedCache(self.cacheDir, maxBytes=2 * fileSize))
+        for ccd in range(4):
+            self.assertEqual(self.butler.get('x', ccd=ccd), tstObj('x' * 1000))
+        # Only the two most recently used files are kept.
+        self.assertEqual(len(os.listdir(self.cacheDir)), 2)
+        self.assertEqual(self.butler.get('x', ccd=3), tstObj('x' * 1000))
+        self.assertEqual(len(os.listdir(self.cacheDir)), 2)
+
+    def testInsecureDirectory(self):
+        # A directory that other users could write to, or that is a symlink, is not used.
+        os.chmod(self.cacheDir, 0o755)
+        cache = dp.SharedCache(self.cacheDir)
+        self.assertFalse(cache.enabled)
+        os.chmod(self.cacheDir, 0o700)
+        self.assertTrue(dp.SharedCache(self.cacheDir).enabled)
+        link = os.path.join(self.testDir, 'link')
+        os.symlink(self.cacheDir, link)
+        self.assertFalse(dp.SharedCache(link).enabled)
+
+        dp.PosixStorage.setSharedCache(cache)
+        self.butler.put(tstObj('foo'), 'x', ccd=1)
+        self.assertEqual(self.butler.get('x', ccd=1), tstObj('foo'))
+        self.assertEqual(os.listdir(self.cacheDir), [])
+
+    @unittest.skipIf(np is None, "numpy is not available")
+    def testNumpyZeroCopy(self):
+        self.butler.put(np.arange(1000.0), 'x', ccd=2)
+        self.butler.get('x', ccd=2)
+        array = self.butler.get('x', ccd=2)
+        self.assertTrue(np.array_equal(array, np.arange(1000.0)))
+        # The array uses the memory mapped cache file, which is read-only.
+        self.assertFalse(array.flags.writeable)
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+if __name__ == '__main__':
+    lsst.utils.tests.init()
+    unittest.main()
@@ -20,7 +20,9 @@
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
 
+import collections
 import unittest
+import unittest.mock
 
 import lsst.daf.persistence as dp
 import lsst.utils.tests
@@ -45,6 +47,53 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(('a', 'b', 'c'), dp.sequencify({'a': 1, 'b': 2, 'c': 3}))
         self.assertNotEqual(('b', 'c', 'a'), dp.sequencify({'a': 1, 'b': 2, 'c': 3}))
 
+    def testDoImport(self):
+        self.assertIs(dp.doImport('collections.OrderedDict'), collections.OrderedDict)
+        self.assertEqual(dp.doImport('collections.OrderedDict.fromkeys'), collections.OrderedDict.fromkeys)
+        # Imported objects are cached.
+        with unittest.mock.patch('builtins.__import__', side_effect=AssertionError):
+            self.assertIs(dp.doImport('collections.OrderedDict'), collections.OrderedDict)
+        dp.clearImportCache()
+        with unittest.mock.patch('builtins.__import__', side_effect=__import__) as mockImport:
+            self.assertIs(dp.doImport('collections.OrderedDict'), collections.OrderedDict)
+        mockImport.assert_called()
+        # Failures are not cached: a string that could not be imported is tried again.
+        with self.assertRaises(AttributeError):
+            dp.doImport('collections.NoSuchType')
+        collections.NoSuchType = dict
+        try:
+            self.assertIs(dp.doImport('collections.NoSuchType'), dict)
+        finally:
+            del collections.NoSuchType
+            dp.clearImportCache()
+
+    def testDoImportMember(self):
+        """Test that a class that failed to import as a module, when importing one of its members, is not
+        imported as a module again."""
+        dp.clearImportCache()
+        try:
+            self.assertEqual(dp.doImport('collections.OrderedDict.fromkeys'),
+                             collections.OrderedDict.fromkeys)
+            with unittest.mock.patch('builtins.__import__', side_effect=__import__) as mockImport:
+                self.assertEqual(dp.doImport('collections.OrderedDict.copy'), collections.OrderedDict.copy)
+            self.assertNotIn('collections.OrderedDict', [call[0][0] for call in mockImport.call_args_list])
+            # A module that could not be imported is tried again.
+            with self.assertRaises(AttributeError):
+                dp.doImport('collections.noSuchModule.Foo')
+            with unittest.mock.patch('builtins.__import__', side_effect=__import__) as mockImport:
+                with self.assertRaises(AttributeError):
+                    dp.doImport('collections.noSuchModule.Foo')
+            self.assertIn('collections.noSuchModule', [call[0][0] for call in mockImport.call_args_list])
+        finally:
+            dp.clearImportCache()
+
+    def testResolvedPythonType(self):
+        location = dp.ButlerLocation('collections.OrderedDict', None, 'PickleStorage', 'foo.pickle', {},
+                                     None, None)
+        self.assertIs(location.getResolvedPythonType(), collections.OrderedDict)
+        location.pythonType = 'collections.Counter'
+        self.assertIs(location.getResolvedPythonType(), collections.Counter)
+
 
 class MemoryTester(lsst.utils.tests.MemoryTestCase):
     pass